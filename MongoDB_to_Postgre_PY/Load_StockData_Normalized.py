@@ -17,7 +17,7 @@
 # Import required libraries
 from pymongo import MongoClient  # To connect to MongoDB database
 import pandas as pd              # For data manipulation and analysis
-from sqlalchemy import create_engine  # To connect to PostgreSQL database
+from sqlalchemy import create_engine, text  # To connect to PostgreSQL database
 
 # ============================================================================
 # STEP 1: CONNECT TO MONGODB
@@ -167,6 +167,11 @@ with pg_engine.connect() as conn:
 
 print("✓ stock_data table created successfully!")
 
+# Tell any running API process that stock_data was rewritten, so it drops
+# cached query results for this table (the API LISTENs on 'table_loaded')
+with pg_engine.begin() as conn:
+    conn.execute(text("SELECT pg_notify('table_loaded', 'stock_data')"))
+
 # ============================================================================
 # STEP 7: DISPLAY SUMMARY STATISTICS
 # ============================================================================
@@ -0,0 +1,202 @@
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+# Pre-flight EXPLAIN thresholds (planner cost units / estimated rows)
+ADMISSION_MAX_COST = float(os.getenv("ADMISSION_MAX_COST", "10000000"))
+ADMISSION_MAX_ROWS = float(os.getenv("ADMISSION_MAX_ROWS", "1000000"))
+# Queries above this cost must hold one of ADMISSION_HEAVY_SLOTS slots to run
+ADMISSION_HEAVY_COST = float(os.getenv("ADMISSION_HEAVY_COST", "100000"))
+ADMISSION_HEAVY_SLOTS = int(os.getenv("ADMISSION_HEAVY_SLOTS", "2"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+# Advisory lock namespace shared by every API/Flask worker on the database
+ADMISSION_LOCK_KEY = int(os.getenv("ADMISSION_LOCK_KEY", "54000"))
+
+
+class QueryRejected(Exception):
+    """Raised when the planner estimate exceeds the admission thresholds"""
+
+    def __init__(self, message: str, estimate: Dict[str, Any]):
+        super().__init__(message)
+        self.estimate = estimate
+
+
+class AdmissionTimeout(Exception):
+    """Raised when a heavy query cannot get a slot within the queue timeout"""
+
+
+class MultipleStatements(ValueError):
+    """Raised for query text holding more than one SQL statement"""
+
+
+_stats_lock = threading.Lock()
+_stats = {"admitted": 0, "heavy": 0, "rejected": 0, "queue_timeouts": 0, "queue_wait_total_ms": 0.0}
+
+
+def _count(key: str, amount: float = 1) -> None:
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def admission_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({
+        "max_cost": ADMISSION_MAX_COST,
+        "max_rows": ADMISSION_MAX_ROWS,
+        "heavy_cost": ADMISSION_HEAVY_COST,
+        "heavy_slots": ADMISSION_HEAVY_SLOTS,
+    })
+    return stats
+
+
+def _scalar(cursor) -> Any:
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        return next(iter(row.values()))
+    return row[0]
+
+
+_DOLLAR_TAG = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$")
+
+
+def _ident_char(char: str) -> bool:
+    return char.isalnum() or char in "_$"
+
+
+def _quoted_end(query: str, start: int, quote: str, backslash_escapes: bool) -> int:
+    i = start + 1
+    while i < len(query):
+        char = query[i]
+        if backslash_escapes and char == "\\":
+            i += 2
+        elif char == quote:
+            # A doubled quote is an escaped one
+            if query.startswith(quote, i + 1):
+                i += 2
+            else:
+                return i + 1
+        else:
+            i += 1
+    return len(query)
+
+
+def _comment_end(query: str, start: int) -> int:
+    depth, i = 0, start
+    while i < len(query):
+        if query.startswith("/*", i):
+            depth += 1
+            i += 2
+        elif query.startswith("*/", i):
+            depth -= 1
+            i += 2
+            if depth == 0:
+                return i
+        else:
+            i += 1
+    return len(query)
+
+
+def check_single_statement(query: str) -> None:
+    """Raise MultipleStatements if a ';' outside literals, quoted identifiers and
+    comments is followed by more SQL (a trailing ';' is fine)
+
+    EXPLAIN only covers the first statement, while the driver would run them all.
+    """
+    i, terminated = 0, False
+    while i < len(query):
+        char = query[i]
+        if char.isspace():
+            i += 1
+        elif query.startswith("--", i):
+            end = query.find("\n", i)
+            i = len(query) if end < 0 else end + 1
+        elif query.startswith("/*", i):
+            i = _comment_end(query, i)
+        elif char == ";":
+            terminated = True
+            i += 1
+        elif terminated:
+            raise MultipleStatements("Only a single SQL statement is allowed; remove the ';' separators")
+        elif char == "'":
+            # E'...' strings take backslash escapes
+            escaped = i > 0 and query[i - 1] in "eE" and (i < 2 or not _ident_char(query[i - 2]))
+            i = _quoted_end(query, i, "'", escaped)
+        elif char == '"':
+            i = _quoted_end(query, i, '"', False)
+        elif char == "$" and (i == 0 or not _ident_char(query[i - 1])) and _DOLLAR_TAG.match(query, i):
+            tag = _DOLLAR_TAG.match(query, i).group(0)
+            end = query.find(tag, i + len(tag))
+            i = len(query) if end < 0 else end + len(tag)
+        else:
+            i += 1
+
+
+def explain_query(cursor, query: str, params: Optional[Sequence[Any]] = None) -> Dict[str, Any]:
+    """Planner cost and row estimates for a query, without running it"""
+    check_single_statement(query)
+    cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    plan = _scalar(cursor)[0]["Plan"]
+    return {
+        "total_cost": plan["Total Cost"],
+        "plan_rows": plan["Plan Rows"],
+        "node_type": plan["Node Type"],
+    }
+
+
+def _acquire_heavy_slot(cursor, timeout: float) -> int:
+    """Take one of the heavy-query slots for the rest of the current transaction"""
+    started = time.monotonic()
+    deadline = started + timeout
+    delay = 0.05
+    while True:
+        for slot in range(ADMISSION_HEAVY_SLOTS):
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", (ADMISSION_LOCK_KEY, slot))
+            if _scalar(cursor):
+                _count("queue_wait_total_ms", (time.monotonic() - started) * 1000)
+                return slot
+        if time.monotonic() >= deadline:
+            _count("queue_timeouts")
+            raise AdmissionTimeout(
+                f"All {ADMISSION_HEAVY_SLOTS} heavy-query slots stayed busy for {timeout:g}s; retry later"
+            )
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def admit_query(
+    cursor,
+    query: str,
+    params: Optional[Sequence[Any]] = None,
+    check_rows: bool = True,
+    queue_timeout: float = ADMISSION_QUEUE_TIMEOUT
+) -> Dict[str, Any]:
+    """EXPLAIN the query and reject it or wait for a heavy-query slot as needed
+
+    Must run on the connection and transaction that will execute the query:
+    slots are transaction-scoped advisory locks, released on commit/rollback.
+    """
+    estimate = explain_query(cursor, query, params)
+
+    if estimate["total_cost"] > ADMISSION_MAX_COST:
+        _count("rejected")
+        raise QueryRejected(
+            f"Estimated cost {estimate['total_cost']:,.0f} exceeds the limit of {ADMISSION_MAX_COST:,.0f}",
+            estimate
+        )
+    if check_rows and estimate["plan_rows"] > ADMISSION_MAX_ROWS:
+        _count("rejected")
+        raise QueryRejected(
+            f"Estimated {estimate['plan_rows']:,.0f} rows exceeds the limit of {ADMISSION_MAX_ROWS:,.0f}",
+            estimate
+        )
+
+    estimate["heavy"] = estimate["total_cost"] > ADMISSION_HEAVY_COST
+    if estimate["heavy"]:
+        _count("heavy")
+        estimate["slot"] = _acquire_heavy_slot(cursor, queue_timeout)
+
+    _count("admitted")
+    return estimate
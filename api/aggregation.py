@@ -0,0 +1,67 @@
+import hashlib
+import os
+from typing import Any, Dict, List
+
+from bson import json_util
+
+# Pipeline stages clients may send; anything that writes ($out, $merge), reads
+# other collections ($lookup, $unionWith, $graphLookup) or inspects the server
+# ($collStats, $currentOp, ...) is rejected
+ALLOWED_STAGES = frozenset({
+    "$match", "$project", "$addFields", "$set", "$unset", "$group", "$sort", "$limit", "$skip",
+    "$count", "$unwind", "$bucket", "$bucketAuto", "$sortByCount", "$replaceRoot", "$replaceWith",
+    "$sample", "$densify", "$fill", "$setWindowFields", "$facet",
+})
+
+# Operators that run server-side JavaScript
+FORBIDDEN_OPERATORS = frozenset({"$where", "$function", "$accumulator"})
+
+AGGREGATE_MAX_STAGES = int(os.getenv("MONGO_AGGREGATE_MAX_STAGES", "20"))
+AGGREGATE_TIMEOUT_MS = int(os.getenv("MONGO_AGGREGATE_TIMEOUT_MS", "30000"))
+AGGREGATE_MAX_TIMEOUT_MS = int(os.getenv("MONGO_AGGREGATE_MAX_TIMEOUT_MS", "300000"))
+
+
+class PipelineRejected(ValueError):
+    """Raised for malformed pipelines or stages outside the allow-list"""
+
+
+def _check_operators(value: Any) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in FORBIDDEN_OPERATORS:
+                raise PipelineRejected(f"Operator '{key}' is not allowed")
+            _check_operators(item)
+    elif isinstance(value, list):
+        for item in value:
+            _check_operators(item)
+
+
+def validate_pipeline(pipeline: Any, depth: int = 0) -> List[Dict[str, Any]]:
+    """Check a parsed pipeline against the stage allow-list; returns it unchanged"""
+    if not isinstance(pipeline, list):
+        raise PipelineRejected("Pipeline must be a JSON array of stages")
+    if not pipeline and depth == 0:
+        raise PipelineRejected("Pipeline must have at least one stage")
+    if len(pipeline) > AGGREGATE_MAX_STAGES:
+        raise PipelineRejected(f"Pipelines are limited to {AGGREGATE_MAX_STAGES} stages")
+
+    for position, stage in enumerate(pipeline):
+        if not isinstance(stage, dict) or len(stage) != 1:
+            raise PipelineRejected(f"Stage {position} must be an object with exactly one operator")
+        (name, spec), = stage.items()
+        if name not in ALLOWED_STAGES:
+            raise PipelineRejected(f"Stage '{name}' is not allowed. Allowed: {', '.join(sorted(ALLOWED_STAGES))}")
+        if name == "$facet":
+            if depth or not isinstance(spec, dict):
+                raise PipelineRejected("$facet must map names to sub-pipelines and cannot be nested")
+            for sub_pipeline in spec.values():
+                validate_pipeline(sub_pipeline, depth + 1)
+        else:
+            _check_operators(spec)
+    return pipeline
+
+
+def pipeline_hash(collection: str, pipeline: List[Dict[str, Any]]) -> str:
+    """Stable digest of a pipeline; key order is kept because it is significant for $sort"""
+    canonical = json_util.dumps([collection, pipeline], json_options=json_util.CANONICAL_JSON_OPTIONS)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Concurrent-request throughput benchmark for the FastAPI service.
+
+Keeps a few slow PostgreSQL queries (``SELECT pg_sleep(n)``) in flight while
+other clients hammer a cheap endpoint, then reports how many cheap requests
+completed and their latency. When database calls block the event loop the
+cheap endpoint stalls behind every slow query; with the executor offload it
+keeps serving.
+
+Run once against a server built from the old code and once against the
+current code, e.g.:
+
+    python run_server.py &
+    python benchmarks/bench_concurrency.py --base-url http://127.0.0.1:8002
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def slow_worker(base_url, sleep_seconds, stop, results):
+    session = httpx.Client(timeout=60.0)
+    query = f"SELECT pg_sleep({sleep_seconds})"
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            # cache=false: every slow query must reach the database (older builds ignore it)
+            response = session.post(f"{base_url}/postgresql/query", params={"query": query, "cache": "false"})
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        results.append((ok, time.perf_counter() - started))
+
+
+def fast_worker(base_url, path, stop, results):
+    session = httpx.Client(timeout=60.0)
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = session.get(f"{base_url}{path}")
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        results.append((ok, time.perf_counter() - started))
+
+
+def run(base_url, duration, slow_clients, fast_clients, sleep_seconds, fast_path):
+    stop = threading.Event()
+    slow_results, fast_results = [], []
+
+    threads = [
+        threading.Thread(target=slow_worker, args=(base_url, sleep_seconds, stop, slow_results))
+        for _ in range(slow_clients)
+    ]
+    threads += [
+        threading.Thread(target=fast_worker, args=(base_url, fast_path, stop, fast_results))
+        for _ in range(fast_clients)
+    ]
+
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    fast_latencies = [latency * 1000 for ok, latency in fast_results if ok]
+    return {
+        "base_url": base_url,
+        "duration_s": duration,
+        "slow_clients": slow_clients,
+        "fast_clients": fast_clients,
+        "slow_query_sleep_s": sleep_seconds,
+        "fast_path": fast_path,
+        "fast_requests_ok": len(fast_latencies),
+        "fast_requests_failed": len(fast_results) - len(fast_latencies),
+        "fast_throughput_rps": round(len(fast_latencies) / duration, 2),
+        "fast_p50_ms": round(statistics.median(fast_latencies), 2) if fast_latencies else None,
+        "fast_p95_ms": round(percentile(fast_latencies, 95), 2) if fast_latencies else None,
+        "fast_max_ms": round(max(fast_latencies), 2) if fast_latencies else None,
+        "slow_queries_ok": sum(1 for ok, _ in slow_results if ok),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8002")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run the workload")
+    parser.add_argument("--slow-clients", type=int, default=2, help="Clients issuing pg_sleep queries")
+    parser.add_argument("--fast-clients", type=int, default=8, help="Clients issuing cheap requests")
+    parser.add_argument("--sleep", type=float, default=1.0, help="Seconds each slow query sleeps")
+    parser.add_argument("--fast-path", default="/", help="Cheap endpoint to measure")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable output")
+    args = parser.parse_args()
+
+    report = run(args.base_url, args.duration, args.slow_clients, args.fast_clients, args.sleep, args.fast_path)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print("Concurrent request benchmark")
+        print("=" * 50)
+        for key, value in report.items():
+            print(f"  {key:24s} {value}")
+
+
+if __name__ == "__main__":
+    main()
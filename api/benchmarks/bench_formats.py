@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Payload size and client decode time: JSON vs Arrow IPC vs Parquet.
+
+Offline mode (default) encodes a CSV from ../dataset the same way the API
+does and times decoding each payload into a pandas DataFrame:
+
+    python benchmarks/bench_formats.py --csv ../dataset/rainfall.csv
+
+Live mode downloads the same query from a running server in every format:
+
+    python benchmarks/bench_formats.py --base-url http://127.0.0.1:8002 \\
+        --query "SELECT * FROM stock_data" --limit 10000
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from columnar import write_batches  # noqa: E402
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def decode_json(payload):
+    return pd.DataFrame(json.loads(payload)["results"])
+
+
+def decode_arrow(payload):
+    return pa.ipc.open_file(pa.BufferReader(payload)).read_pandas()
+
+
+def decode_arrow_mmap(path):
+    # Zero-copy: the Arrow buffers point straight into the mapped file
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def decode_parquet(payload):
+    return pq.read_table(io.BytesIO(payload)).to_pandas()
+
+
+def offline_payloads(csv_path):
+    df = pd.read_csv(csv_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    rows = json.loads(df.to_json(orient="records", date_format="iso"))
+    payloads = {"json": json.dumps({"row_count": len(rows), "results": rows}).encode("utf-8")}
+    for fmt in ("arrow", "parquet"):
+        with write_batches(fmt, table.schema, table.to_batches()) as f:
+            payloads[fmt] = f.read()
+    return df.shape, payloads
+
+
+def live_payloads(base_url, query, limit):
+    import requests
+
+    payloads = {}
+    for fmt in ("json", "arrow", "parquet"):
+        params = {"query": query, "format": fmt, "limit": limit, "cache": "false"}
+        response = requests.post(f"{base_url}/postgresql/query", params=params)
+        response.raise_for_status()
+        payloads[fmt] = response.content
+    shape = decode_arrow(payloads["arrow"]).shape
+    return shape, payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=os.path.join(os.path.dirname(__file__), "..", "..", "dataset", "rainfall.csv"))
+    parser.add_argument("--base-url", help="Benchmark a running server instead of a local CSV")
+    parser.add_argument("--query", default="SELECT * FROM stock_data")
+    parser.add_argument("--limit", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable output")
+    args = parser.parse_args()
+
+    if args.base_url:
+        shape, payloads = live_payloads(args.base_url, args.query, args.limit)
+        source = f"{args.base_url} {args.query!r}"
+    else:
+        shape, payloads = offline_payloads(args.csv)
+        source = os.path.basename(args.csv)
+
+    with tempfile.NamedTemporaryFile(suffix=".arrow", delete=False) as f:
+        f.write(payloads["arrow"])
+        arrow_path = f.name
+
+    try:
+        report = {
+            "source": source,
+            "rows": shape[0],
+            "columns": shape[1],
+            "formats": {
+                "json": {"bytes": len(payloads["json"]), "decode_ms": best_of(lambda: decode_json(payloads["json"]), args.repeat)},
+                "arrow": {"bytes": len(payloads["arrow"]), "decode_ms": best_of(lambda: decode_arrow(payloads["arrow"]), args.repeat)},
+                "arrow_mmap": {"bytes": len(payloads["arrow"]), "decode_ms": best_of(lambda: decode_arrow_mmap(arrow_path), args.repeat)},
+                "parquet": {"bytes": len(payloads["parquet"]), "decode_ms": best_of(lambda: decode_parquet(payloads["parquet"]), args.repeat)},
+            },
+        }
+    finally:
+        os.unlink(arrow_path)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Format comparison: {report['source']} ({report['rows']:,} rows x {report['columns']} columns)")
+    print("=" * 60)
+    json_bytes = report["formats"]["json"]["bytes"]
+    json_ms = report["formats"]["json"]["decode_ms"]
+    print(f"  {'format':12s} {'bytes':>12s} {'vs json':>8s} {'decode ms':>10s} {'vs json':>8s}")
+    for fmt, stats in report["formats"].items():
+        print(
+            f"  {fmt:12s} {stats['bytes']:>12,} {stats['bytes'] / json_bytes:>7.2f}x "
+            f"{stats['decode_ms']:>10.2f} {stats['decode_ms'] / json_ms:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+p50 serialization latency for JSON result payloads: FastAPI's default path
+(jsonable_encoder + JSONResponse) vs FastJSONResponse.
+
+Payloads mimic /postgresql/query rows (date, text, numeric, float, bigint,
+timestamptz) and /mongodb/query documents (ObjectId, datetime, floats), plus
+documents with the NumPy scalars and NaN values that pandas-loaded
+collections contain, which the default path cannot encode at all:
+
+    python benchmarks/bench_json.py --rows 1000 10000 --repeat 50
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import numpy as np
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import responses  # noqa: E402
+from responses import FastJSONResponse  # noqa: E402
+
+
+def postgres_rows(count):
+    start = date(2015, 1, 1)
+    return {
+        "query": "SELECT * FROM stock_data LIMIT %d" % count,
+        "columns": ["date", "ticker", "open", "close", "volume", "loaded_at"],
+        "row_count": count,
+        "results": [
+            {
+                "date": start + timedelta(days=i),
+                "ticker": random.choice(["AAPL", "MSFT", "SPY", "GOOG"]),
+                "open": Decimal("%.4f" % random.uniform(50, 500)),
+                "close": Decimal("%.4f" % random.uniform(50, 500)),
+                "volume": random.randint(10 ** 5, 10 ** 8),
+                "loaded_at": datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=i),
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def mongo_documents(count, pandas_values=False):
+    start = datetime(2015, 1, 1)
+    # Collections loaded through pandas carry NumPy scalars and NaN for missing values
+    number = np.float64 if pandas_values else float
+    return {
+        "collection": "StockData",
+        "count": count,
+        "results": [
+            {
+                "_id": ObjectId(),
+                "Date": start + timedelta(days=i),
+                "Ticker": "SPY",
+                "Close": float("nan") if pandas_values and i % 50 == 0 else random.uniform(50, 500),
+                "Volume": np.int64(random.randint(10 ** 5, 10 ** 8)) if pandas_values else random.randint(10 ** 5, 10 ** 8),
+                "Return": number(random.gauss(0, 0.01)),
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def default_mongo(payload):
+    # What /mongodb/query did before: stringify _id per document, then let FastAPI encode
+    for doc in payload["results"]:
+        doc["_id"] = str(doc["_id"])
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def default_postgres(payload):
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def fast(payload):
+    return FastJSONResponse(payload).body
+
+
+def p50(fn, make_payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        payload = make_payload()
+        started = time.perf_counter()
+        fn(payload)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable output")
+    args = parser.parse_args()
+
+    random.seed(0)
+    report = {"orjson": responses.ORJSON_AVAILABLE, "results": []}
+    for rows in args.rows:
+        payloads = {
+            "postgres": (postgres_rows(rows), default_postgres),
+            "mongo": (mongo_documents(rows), default_mongo),
+            "mongo+pandas": (mongo_documents(rows, pandas_values=True), default_mongo),
+        }
+        for payload_name, (payload, default_fn) in payloads.items():
+            # Copy documents each run: the default Mongo path rewrites _id in place
+            def make_payload(payload=payload):
+                return {**payload, "results": [dict(row) for row in payload["results"]]}
+
+            for encoder, fn in (("default", default_fn), ("fast", fast)):
+                try:
+                    ms = p50(fn, make_payload, args.repeat)
+                except (TypeError, ValueError):
+                    # The default path rejects NumPy scalars and NaN
+                    ms = None
+                report["results"].append({"payload": payload_name, "rows": rows, "encoder": encoder, "p50_ms": ms})
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"JSON serialization p50 (orjson: {report['orjson']})")
+    print("=" * 60)
+    print(f"  {'payload':12s} {'rows':>7s} {'default ms':>11s} {'fast ms':>9s} {'speedup':>8s}")
+    by_key = {(r["payload"], r["rows"], r["encoder"]): r["p50_ms"] for r in report["results"]}
+    for rows in args.rows:
+        for payload_name in ("postgres", "mongo", "mongo+pandas"):
+            default_ms, fast_ms = by_key[(payload_name, rows, "default")], by_key[(payload_name, rows, "fast")]
+            if default_ms is None:
+                print(f"  {payload_name:12s} {rows:>7,} {'fails':>11s} {fast_ms:>9.2f} {'-':>8s}")
+            else:
+                print(f"  {payload_name:12s} {rows:>7,} {default_ms:>11.2f} {fast_ms:>9.2f} {default_ms / fast_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Mixed-workload load test for the API, reporting a machine-readable baseline.
+
+By default the script starts the API itself, against local stand-ins seeded
+from ../dataset/*.csv (see local_backends.py):
+
+- PostgreSQL: a throwaway database on the server named by POSTGRES_HOST /
+  POSTGRES_PORT / POSTGRES_USER / POSTGRES_PASSWORD, dropped afterwards.
+- MongoDB: an in-process fake, or a throwaway database on --mongo-uri.
+
+The server runs in its own process so that clients and server do not share a
+GIL. Closed-loop clients then pick weighted requests from WORKLOADS for
+--duration seconds after a --warmup. The report has throughput and
+p50/p95/p99 latency per workload:
+
+    python benchmarks/bench_load.py --duration 30 --clients 16 --output baseline.json
+    python benchmarks/bench_load.py --duration 30 --clients 16 --compare baseline.json --max-regression 20
+
+--base-url drives an already running server instead. That server needs the
+same tables and collections (sp500, rainfall, depression_index).
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_backends import (  # noqa: E402
+    DATASET_DIR,
+    FakeMongoClient,
+    ephemeral_postgres_database,
+    load_datasets,
+    seed_mongo_database,
+)
+
+REPORT_VERSION = 1
+FIRST_DAY = date(2014, 1, 1)
+LAST_DAY = date(2024, 6, 30)
+
+
+def random_day(rng):
+    return (FIRST_DAY + timedelta(days=rng.randrange((LAST_DAY - FIRST_DAY).days))).isoformat()
+
+
+class Workload:
+    """One kind of request in the mix; params may be a dict or a function of the client's RNG
+
+    A "json" key in the params is sent as the request body instead of the query string.
+    """
+
+    def __init__(self, name, method, path, weight, params=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.weight = weight
+        self.params = params or {}
+
+    def request_params(self, rng):
+        return self.params(rng) if callable(self.params) else self.params
+
+
+WORKLOADS = [
+    Workload("healthz", "GET", "/healthz", 1),
+    Workload("pg_tables", "GET", "/postgresql/tables", 1),
+    Workload("pg_table_info", "GET", "/postgresql/table-info/sp500", 1),
+    Workload("pg_query_cached", "POST", "/postgresql/query", 4,
+             {"query": "SELECT * FROM sp500 ORDER BY date DESC LIMIT 100"}),
+    Workload("pg_query_range", "POST", "/postgresql/query", 3, lambda rng: {
+        "query": f"SELECT date, close_gspc, volatility_7 FROM sp500 WHERE date >= '{random_day(rng)}' ORDER BY date LIMIT 200",
+        "cache": "false",
+    }),
+    Workload("pg_query_arrow", "POST", "/postgresql/query", 1,
+             {"query": "SELECT * FROM rainfall", "format": "arrow", "limit": 2000}),
+    Workload("mongo_collections", "GET", "/mongodb/collections", 1),
+    Workload("mongo_query_latest", "GET", "/mongodb/query/sp500", 3,
+             {"sort": '{"Date": -1}', "limit": 100}),
+    Workload("mongo_query_range", "GET", "/mongodb/query/sp500", 2, lambda rng: {
+        "query": json.dumps({"Date": {"$gte": random_day(rng)}}),
+        "projection": '{"Date": 1, "Close_^GSPC": 1}',
+        "sort": '{"Date": 1}',
+        "limit": 50,
+    }),
+    Workload("mongo_ndjson", "GET", "/mongodb/query/depression_index", 1, {"format": "ndjson"}),
+    Workload("mongo_aggregate", "POST", "/mongodb/aggregate/sp500", 1, lambda rng: {
+        "pipeline": json.dumps([
+            {"$match": {"Date": {"$gte": random_day(rng)}}},
+            {"$sort": {"Date": 1}},
+            {"$limit": 500},
+        ]),
+        "cache": "false",
+    }),
+    Workload("mongo_collection_info", "GET", "/mongodb/collection-info/rainfall", 1),
+    Workload("batch_dashboard", "POST", "/batch", 1, {"json": {"reads": {
+        "latest_close": {"backend": "postgres", "query": "SELECT date, close_gspc FROM sp500 ORDER BY date DESC LIMIT 5"},
+        "rainfall_rows": {"backend": "postgres", "query": "SELECT count(*) AS n FROM rainfall"},
+        "sp500_docs": {"backend": "mongo", "collection": "sp500", "count": True},
+        "latest_index": {"backend": "mongo", "collection": "depression_index", "sort": {"date": -1}, "limit": 5},
+    }}}),
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def client_worker(base_url, workloads, seed, measure_from, stop, samples):
+    rng = random.Random(seed)
+    weights = [w.weight for w in workloads]
+    session = httpx.Client(timeout=60.0)
+    while not stop.is_set():
+        workload = rng.choices(workloads, weights)[0]
+        started = time.perf_counter()
+        try:
+            params = dict(workload.request_params(rng))
+            body = params.pop("json", None)
+            response = session.request(workload.method, base_url + workload.path, params=params, json=body)
+            status, size = response.status_code, len(response.content)
+        except httpx.HTTPError:
+            status, size = None, 0
+        if started >= measure_from:
+            samples.append((workload.name, status, time.perf_counter() - started, size))
+
+
+def run_workload(base_url, workloads, clients, duration, warmup, seed):
+    stop = threading.Event()
+    samples = []
+    measure_from = time.perf_counter() + warmup
+    threads = [
+        threading.Thread(target=client_worker, args=(base_url, workloads, seed + i, measure_from, stop, samples))
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup + duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, duration):
+    latencies = [latency * 1000 for _, status, latency, _ in samples if status is not None and status < 400]
+    errors = len(samples) - len(latencies)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+        "mean_ms": round(statistics.mean(latencies), 2) if latencies else None,
+        "max_ms": round(max(latencies), 2) if latencies else None,
+        "mean_bytes": round(statistics.mean(size for *_, size in samples)) if samples else None,
+        "status_codes": {str(code): n for code, n in sorted(Counter(status for _, status, _, _ in samples).items(), key=str)},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(samples, workloads, args, backends):
+    by_workload = defaultdict(list)
+    for sample in samples:
+        by_workload[sample[0]].append(sample)
+    return {
+        "version": REPORT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "clients": args.clients,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "seed": args.seed,
+            "backends": backends,
+        },
+        "total": summarize(samples, args.duration),
+        "workloads": {
+            w.name: dict(endpoint=f"{w.method} {w.path}", weight=w.weight, **summarize(by_workload[w.name], args.duration))
+            for w in workloads
+        },
+    }
+
+
+def compare_reports(baseline, report, max_regression):
+    """Per-workload percentage changes; a workload regresses when its p95 grows by more than max_regression percent"""
+    def change(old, new):
+        if old in (None, 0) or new is None:
+            return None
+        return round((new - old) / old * 100, 1)
+
+    rows = {}
+    for name, current in report["workloads"].items():
+        previous = baseline.get("workloads", {}).get(name)
+        if previous is None:
+            continue
+        row = {key: change(previous.get(key), current.get(key)) for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")}
+        row["regressed"] = max_regression is not None and (
+            (row["p95_ms"] is not None and row["p95_ms"] > max_regression)
+            or current["errors"] > previous.get("errors", 0)
+        )
+        rows[name] = row
+    return rows
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/readyz", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"API server not ready after {timeout:.0f}s")
+
+
+@contextlib.contextmanager
+def local_server(args):
+    """Seed the stand-ins, start the API against them and yield (base_url, backends)"""
+    frames = load_datasets(args.dataset_dir)
+    pg_kwargs = {
+        "host": os.getenv("POSTGRES_HOST", "localhost"),
+        "port": int(os.getenv("POSTGRES_PORT", "45432")),
+        "database": os.getenv("POSTGRES_DB", "db"),
+        "user": os.getenv("POSTGRES_USER", "admin"),
+        "password": os.getenv("POSTGRES_PASSWORD", "PassW0rd"),
+    }
+    mongo = seed_mongo_database(frames, args.mongo_uri) if args.mongo_uri else contextlib.nullcontext()
+    with ephemeral_postgres_database(frames, pg_kwargs) as pg_database, mongo as mongo_database:
+        env = dict(os.environ, POSTGRES_DB=pg_database, BENCH_DATASET_DIR=args.dataset_dir)
+        if args.mongo_uri:
+            env.update(MONGO_URI=args.mongo_uri, MONGO_DB=mongo_database)
+            mongo_backend = f"database {mongo_database} on {args.mongo_uri.split('@')[-1]}"
+        else:
+            # The fake cannot explain queries, so keep the index advisor quiet
+            env.update(BENCH_FAKE_MONGO_LATENCY_MS=str(args.fake_mongo_latency_ms), MONGO_EXPLAIN_SAMPLE_RATE="0")
+            mongo_backend = f"in-process fake ({args.fake_mongo_latency_ms} ms per round trip)"
+        port = free_port()
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port)], cwd=API_DIR, env=env)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_until_ready(base_url, process, args.startup_timeout)
+            yield base_url, {
+                "postgres": f"database {pg_database} on {pg_kwargs['host']}:{pg_kwargs['port']}",
+                "mongo": mongo_backend,
+            }
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def serve(port):
+    """Child process: run the API, with the fake MongoDB client installed unless MONGO_URI points at a real one"""
+    import uvicorn
+
+    import mongo
+
+    if "MONGO_URI" not in os.environ:
+        latency = float(os.environ.get("BENCH_FAKE_MONGO_LATENCY_MS", "0")) / 1000
+        mongo._client = FakeMongoClient(load_datasets(os.environ.get("BENCH_DATASET_DIR", DATASET_DIR)), latency)
+    uvicorn.run("main:app", host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def print_report(report, comparison):
+    print(f"Load test: {report['config']['clients']} clients, {report['config']['duration_s']}s "
+          f"(commit {report['git_commit'] or 'unknown'})")
+    for backend, description in report["config"]["backends"].items():
+        print(f"  {backend}: {description}")
+    print("=" * 96)
+    print(f"  {'workload':24s} {'req':>7s} {'err':>5s} {'rps':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'p95 vs base':>12s}")
+    rows = dict(report["workloads"], total=report["total"])
+    for name, stats in rows.items():
+        fmt = lambda v: f"{v:8.2f}" if v is not None else f"{'-':>8s}"  # noqa: E731
+        delta = ""
+        if name in comparison and comparison[name]["p95_ms"] is not None:
+            delta = f"{comparison[name]['p95_ms']:+.1f}%" + (" !" if comparison[name]["regressed"] else "")
+        print(f"  {name:24s} {stats['requests']:>7d} {stats['errors']:>5d} {stats['throughput_rps']:>8.1f} "
+              f"{fmt(stats['p50_ms'])} {fmt(stats['p95_ms'])} {fmt(stats['p99_ms'])} {delta:>12s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Drive an already running server instead of starting one")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent closed-loop clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before the measurement")
+    parser.add_argument("--seed", type=int, default=5400, help="Seed for the request mix")
+    parser.add_argument("--workloads", help="Comma-separated workload names to run (default: all)")
+    parser.add_argument("--dataset-dir", default=os.path.abspath(DATASET_DIR), help="CSV files used to seed the stand-ins")
+    parser.add_argument("--mongo-uri", help="Seed a throwaway database on this MongoDB server instead of using the fake")
+    parser.add_argument("--fake-mongo-latency-ms", type=float, default=0.0, help="Simulated round trip for the MongoDB fake")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, help="Exit with status 1 when a workload's p95 grows by more than this percent")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable output")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    workloads = WORKLOADS
+    if args.workloads:
+        wanted = {name.strip() for name in args.workloads.split(",")}
+        unknown = wanted - {w.name for w in WORKLOADS}
+        if unknown:
+            parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+        workloads = [w for w in WORKLOADS if w.name in wanted]
+
+    if args.base_url:
+        server = contextlib.nullcontext((args.base_url.rstrip("/"), {"server": args.base_url}))
+    else:
+        server = local_server(args)
+    with server as (base_url, backends):
+        samples = run_workload(base_url, workloads, args.clients, args.duration, args.warmup, args.seed)
+
+    report = build_report(samples, workloads, args, backends)
+    comparison = {}
+    if args.compare:
+        with open(args.compare) as f:
+            comparison = compare_reports(json.load(f), report, args.max_regression)
+        report["comparison"] = {"baseline": args.compare, "workloads": comparison}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, comparison)
+
+    if any(row["regressed"] for row in comparison.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
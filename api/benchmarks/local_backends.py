@@ -0,0 +1,334 @@
+"""
+Local stand-ins for the API's backends, seeded from ``../dataset/*.csv``.
+
+- ``ephemeral_postgres_database`` creates a throwaway database on the
+  configured PostgreSQL server, loads one table per CSV and drops the
+  database on exit.
+- ``seed_mongo_database`` loads the same CSVs into a throwaway database on a
+  real MongoDB server.
+- ``FakeMongoClient`` is an in-process stand-in for ``AsyncMongoClient`` that
+  covers what the routers call (find/sort/limit, simple aggregation stages,
+  counts, ping). It has no indexes and no wire protocol, so its latencies are
+  a floor, not a prediction.
+
+CSV columns keep their names in MongoDB (as ``flask/import_data.py`` does)
+and are normalized to snake_case in PostgreSQL (``Close_^GSPC`` ->
+``close_gspc``).
+"""
+
+import asyncio
+import contextlib
+import glob
+import io
+import os
+import random
+import re
+import uuid
+
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+from pymongo.errors import OperationFailure
+
+DATASET_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "dataset")
+
+PG_TYPES = {"i": "bigint", "f": "double precision", "b": "boolean"}
+
+
+def load_datasets(dataset_dir=DATASET_DIR):
+    """name -> DataFrame for every CSV in the dataset directory"""
+    frames = {}
+    for path in sorted(glob.glob(os.path.join(dataset_dir, "*.csv"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        frames[name] = pd.read_csv(path)
+    return frames
+
+
+def pg_column_name(column):
+    return re.sub(r"[^0-9a-z]+", "_", column.lower()).strip("_")
+
+
+def _pg_column_type(name, series):
+    if name == "date":
+        return "date"
+    return PG_TYPES.get(series.dtype.kind, "text")
+
+
+def _load_table(cursor, name, df):
+    df = df.rename(columns=pg_column_name)
+    columns = [
+        sql.SQL("{} {}").format(sql.Identifier(column), sql.SQL(_pg_column_type(column, df[column])))
+        for column in df.columns
+    ]
+    cursor.execute(sql.SQL("CREATE TABLE {} ({})").format(sql.Identifier(name), sql.SQL(", ").join(columns)))
+    buffer = io.StringIO()
+    df.to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+    cursor.copy_expert(sql.SQL("COPY {} FROM STDIN WITH (FORMAT csv)").format(sql.Identifier(name)).as_string(cursor), buffer)
+    if "date" in df.columns:
+        cursor.execute(sql.SQL("CREATE INDEX ON {} (date)").format(sql.Identifier(name)))
+    cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(name)))
+
+
+@contextlib.contextmanager
+def ephemeral_postgres_database(frames, connect_kwargs):
+    """Create and seed a throwaway database; yields its name and drops it afterwards"""
+    name = f"bench_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(**connect_kwargs)
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+        try:
+            conn = psycopg2.connect(**dict(connect_kwargs, database=name))
+            try:
+                with conn, conn.cursor() as cursor:
+                    for table, df in frames.items():
+                        _load_table(cursor, table, df)
+            finally:
+                conn.close()
+            yield name
+        finally:
+            with admin.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = %s AND pid <> pg_backend_pid()",
+                    (name,)
+                )
+                cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+    finally:
+        admin.close()
+
+
+@contextlib.contextmanager
+def seed_mongo_database(frames, uri):
+    """Seed a throwaway database on a real MongoDB server; yields its name and drops it afterwards"""
+    from pymongo import MongoClient
+
+    name = f"bench_{uuid.uuid4().hex[:12]}"
+    client = MongoClient(uri)
+    try:
+        for collection, df in frames.items():
+            client[name][collection].insert_many(_records(df))
+        yield name
+    finally:
+        client.drop_database(name)
+        client.close()
+
+
+def _records(df):
+    # NaN is not valid JSON and never comes back from a real import
+    return [{k: v for k, v in record.items() if v == v} for record in df.to_dict("records")]
+
+
+# -- In-process MongoDB fake --------------------------------------------------
+
+_MISSING = object()
+
+
+def _get(doc, path):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _compare(op, value, operand):
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if op == "$ne":
+        return value != operand
+    if op == "$eq":
+        return value == operand
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise OperationFailure(f"unknown operator: {op}")
+
+
+def matches(doc, query):
+    """Evaluate the subset of query operators the workloads use"""
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            value = _get(doc, key)
+            if not all(_compare(op, value, operand) for op, operand in condition.items()):
+                return False
+        elif _get(doc, key) != condition:
+            return False
+    return True
+
+
+def _sort_key(field):
+    def key(doc):
+        value = _get(doc, field)
+        # Missing and null sort before everything else, as in MongoDB
+        return (0, 0) if value is _MISSING or value is None else (1, value)
+    return key
+
+
+def _sort_documents(docs, keys):
+    for field, direction in reversed(keys):
+        docs.sort(key=_sort_key(field), reverse=direction == -1)
+    return docs
+
+
+def _project(doc, projection):
+    if not projection:
+        return dict(doc)
+    include = {k for k, v in projection.items() if v}
+    if include:
+        return {k: v for k, v in doc.items() if k in include or (k == "_id" and projection.get("_id", 1))}
+    return {k: v for k, v in doc.items() if k not in projection}
+
+
+class FakeCursor:
+    def __init__(self, docs, latency):
+        self._docs = docs
+        self._latency = latency
+        self._skip = 0
+        self._limit = 0
+        self._projection = None
+        self._keys = []
+
+    def sort(self, keys, direction=None):
+        self._keys = [(keys, direction or 1)] if isinstance(keys, str) else list(keys)
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def _results(self):
+        docs = _sort_documents(list(self._docs), self._keys) if self._keys else self._docs
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(self._latency)
+        results = self._results()
+        return results[:length] if length else results
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await asyncio.sleep(self._latency)
+        for doc in self._results():
+            yield doc
+
+    async def close(self):
+        pass
+
+
+class FakeCollection:
+    def __init__(self, docs, latency):
+        self._docs = docs
+        self._latency = latency
+
+    def find(self, filter=None, projection=None, **kwargs):
+        cursor = FakeCursor([doc for doc in self._docs if matches(doc, filter or {})], self._latency)
+        if isinstance(projection, (list, tuple)):
+            projection = {field: 1 for field in projection}
+        cursor._projection = projection
+        return cursor
+
+    async def estimated_document_count(self, **kwargs):
+        await asyncio.sleep(self._latency)
+        return len(self._docs)
+
+    async def count_documents(self, filter, **kwargs):
+        await asyncio.sleep(self._latency)
+        return sum(1 for doc in self._docs if matches(doc, filter))
+
+    async def aggregate(self, pipeline, **kwargs):
+        await asyncio.sleep(self._latency)
+        docs = list(self._docs)
+        for stage in pipeline:
+            (op, spec), = stage.items()
+            if op == "$match":
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif op == "$sort":
+                docs = _sort_documents(docs, list(spec.items()))
+            elif op == "$limit":
+                docs = docs[:spec]
+            elif op == "$skip":
+                docs = docs[spec:]
+            elif op == "$sample":
+                docs = random.sample(docs, min(spec["size"], len(docs)))
+            elif op == "$project":
+                docs = [_project(doc, spec) for doc in docs]
+            elif op == "$count":
+                docs = [{spec: len(docs)}]
+            else:
+                raise OperationFailure(f"{op} is not supported by the in-process fake")
+        return FakeCursor(docs, 0)
+
+
+class FakeMongoDatabase:
+    def __init__(self, client, collections, latency):
+        self.client = client
+        self._collections = collections
+        self._latency = latency
+
+    def __getitem__(self, name):
+        return FakeCollection(self._collections.get(name, []), self._latency)
+
+    async def list_collection_names(self, **kwargs):
+        await asyncio.sleep(self._latency)
+        return sorted(self._collections)
+
+    async def command(self, command, *args, **kwargs):
+        await asyncio.sleep(self._latency)
+        if command == "ping" or (isinstance(command, dict) and "ping" in command):
+            return {"ok": 1.0}
+        raise OperationFailure(f"{command!r} is not supported by the in-process fake")
+
+
+class FakeMongoClient:
+    """Stands in for AsyncMongoClient; every database holds the same seeded collections"""
+
+    def __init__(self, frames, latency=0.0):
+        from bson import ObjectId
+
+        collections = {}
+        for name, df in frames.items():
+            collections[name] = [dict(record, _id=ObjectId()) for record in _records(df)]
+        self._collections = collections
+        self._latency = latency
+        self.admin = self["admin"]
+
+    def __getitem__(self, name):
+        return FakeMongoDatabase(self, self._collections, self._latency)
+
+    async def close(self):
+        pass
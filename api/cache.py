@@ -0,0 +1,188 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Optional, Tuple
+
+# Query result cache settings
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "60"))
+
+# Table metadata (columns, sample rows, exact counts) changes only on DDL or reloads
+TABLE_INFO_CACHE_TTL = float(os.getenv("TABLE_INFO_CACHE_TTL", "3600"))
+
+# MongoDB collection counts and sampled schema summaries
+MONGO_SCHEMA_CACHE_TTL = float(os.getenv("MONGO_SCHEMA_CACHE_TTL", "600"))
+
+# MongoDB aggregation results, keyed by pipeline hash
+AGGREGATE_CACHE_TTL = float(os.getenv("MONGO_AGGREGATE_CACHE_TTL", "300"))
+
+# Entries tagged with this are dropped by any table invalidation
+ANY_TABLE = "*"
+
+_TABLE_REF = re.compile(
+    r'\b(?:FROM|JOIN)\s+((?:[\w."]+(?:\s+(?:AS\s+)?\w+)?\s*,\s*)*[\w."]+)',
+    re.IGNORECASE
+)
+_QUOTED_OR_SPACE = re.compile(r"('(?:[^']|'')*'|\"[^\"]*\")|\s+")
+_SQL_KEYWORDS = {"select", "lateral", "unnest", "only"}
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace outside string literals and drop trailing semicolons"""
+    normalized = _QUOTED_OR_SPACE.sub(lambda m: m.group(1) or " ", query.strip())
+    return normalized.rstrip("; ")
+
+
+def referenced_tables(query: str) -> FrozenSet[str]:
+    """Best-effort list of tables a SELECT reads from (FROM / JOIN clauses)"""
+    tables = set()
+    for match in _TABLE_REF.finditer(query):
+        for item in match.group(1).split(","):
+            name = item.strip().split()[0] if item.strip() else ""
+            name = name.split(".")[-1].strip('"').lower()
+            if name and name not in _SQL_KEYWORDS:
+                tables.add(name)
+    return frozenset(tables) if tables else frozenset({ANY_TABLE})
+
+
+def estimate_size(value: Any, sample: int = 50) -> int:
+    """Rough in-memory size of a result payload, extrapolated from a sample of rows"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, sample) + estimate_size(v, sample) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return sys.getsizeof(value)
+        head = value[:sample]
+        per_item = sum(estimate_size(item, sample) for item in head) / len(head)
+        return sys.getsizeof(value) + int(per_item * len(value))
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """Thread-safe LRU cache with per-entry TTL, a memory bound and table-tag invalidation"""
+
+    def __init__(
+        self,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        max_bytes: int = QUERY_CACHE_MAX_BYTES,
+        ttl: float = QUERY_CACHE_TTL
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, size, tables)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int, FrozenSet[str]]]" = OrderedDict()
+        self._bytes = 0
+        # Bumped on every invalidation so callers can detect a reload that raced their query
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tables: Iterable[str] = (ANY_TABLE,),
+        ttl: Optional[float] = None,
+        size: Optional[int] = None,
+        generation: Optional[int] = None
+    ) -> bool:
+        """Store a value; returns False if it is too large to cache or if an
+        invalidation happened after `generation` was read"""
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes or self.max_entries <= 0:
+            return False
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, expires_at, size, frozenset(t.lower() for t in tables))
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def invalidate_table(self, table: str) -> int:
+        """Drop every entry that reads from `table`; returns the number dropped"""
+        table = table.lower()
+        with self._lock:
+            self.generation += 1
+            stale = [
+                key for key, (_, _, _, tables) in self._entries.items()
+                if table in tables or ANY_TABLE in tables
+            ]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+# Process-wide cache for /postgresql/query results
+query_cache = QueryCache()
+
+# Process-wide cache for /postgresql/table-info metadata
+metadata_cache = QueryCache(max_entries=512, max_bytes=16 * 1024 * 1024, ttl=TABLE_INFO_CACHE_TTL)
+
+# Process-wide cache for /mongodb/collection-info counts and schema summaries
+schema_cache = QueryCache(max_entries=128, max_bytes=8 * 1024 * 1024, ttl=MONGO_SCHEMA_CACHE_TTL)
+
+# Process-wide cache for /mongodb/aggregate results
+aggregate_cache = QueryCache(max_entries=256, max_bytes=32 * 1024 * 1024, ttl=AGGREGATE_CACHE_TTL)
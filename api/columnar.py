@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+# pyarrow is optional; the arrow/parquet formats are disabled without it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+COLUMNAR_FORMATS = {
+    "arrow": "application/vnd.apache.arrow.file",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Results larger than this are spooled to a temporary file instead of memory
+COLUMNAR_SPOOL_BYTES = int(os.getenv("COLUMNAR_SPOOL_BYTES", str(32 * 1024 * 1024)))
+COLUMNAR_CHUNK_BYTES = 1024 * 1024
+
+
+def _arrow_types() -> Dict[int, Any]:
+    # PostgreSQL type OID -> Arrow type
+    return {
+        16: pa.bool_(),
+        20: pa.int64(),
+        21: pa.int16(),
+        23: pa.int32(),
+        26: pa.int64(),
+        700: pa.float32(),
+        701: pa.float64(),
+        1700: pa.float64(),  # numeric: float64 is what pandas users expect
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+        1184: pa.timestamp("us", tz="UTC"),
+    }
+
+
+def schema_from_description(description: Sequence[Any]) -> "pa.Schema":
+    """Arrow schema for a psycopg2 cursor.description; unknown types become strings"""
+    types = _arrow_types()
+    return pa.schema([pa.field(col.name, types.get(col.type_code, pa.string())) for col in description])
+
+
+def _converter(arrow_type: "pa.DataType") -> Optional[Callable[[Any], Any]]:
+    if pa.types.is_floating(arrow_type):
+        return lambda v: None if v is None else float(v)
+    if pa.types.is_string(arrow_type):
+        return lambda v: v if v is None or isinstance(v, str) else (
+            json.dumps(v, default=str) if isinstance(v, (dict, list)) else str(v)
+        )
+    return None
+
+
+def rows_to_batch(schema: "pa.Schema", rows: List[Sequence[Any]]) -> "pa.RecordBatch":
+    """Build a typed record batch from row tuples (one column at a time)"""
+    arrays = []
+    for index, field in enumerate(schema):
+        column = [row[index] for row in rows]
+        convert = _converter(field.type)
+        if convert is not None:
+            column = [convert(v) for v in column]
+        arrays.append(pa.array(column, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_batches(fmt: str, schema: "pa.Schema", batches: Iterable["pa.RecordBatch"]):
+    """Write record batches as an Arrow IPC file or Parquet file
+
+    Returns a rewound file object. Small results stay in memory; large ones
+    spill to disk, so memory is bounded by one batch.
+    """
+    sink = tempfile.SpooledTemporaryFile(max_size=COLUMNAR_SPOOL_BYTES)
+    output = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(output, schema)
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_file(output, schema)
+        write = writer.write_batch
+    try:
+        for batch in batches:
+            write(batch)
+    finally:
+        writer.close()
+    sink.seek(0)
+    return sink
+
+
+def file_chunks(fileobj) -> Iterator[bytes]:
+    """Stream a spooled result file and close it when done"""
+    try:
+        while True:
+            chunk = fileobj.read(COLUMNAR_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def _document_value(value: Any) -> Any:
+    if isinstance(value, (str, int, float, bool, datetime, date)) or value is None:
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def table_from_documents(documents: List[Dict[str, Any]]) -> "pa.Table":
+    """Columnar table from MongoDB documents; nested values are JSON-encoded strings"""
+    columns: Dict[str, List[Any]] = {}
+    for position, doc in enumerate(documents):
+        for key in doc:
+            if key not in columns:
+                columns[key] = [None] * position
+        for key, values in columns.items():
+            values.append(_document_value(doc.get(key)))
+
+    arrays, names = [], []
+    for key, values in columns.items():
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed types across documents
+            arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+        names.append(key)
+    return pa.Table.from_arrays(arrays, names=names)
@@ -0,0 +1,191 @@
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+# zstandard is optional; without it only gzip is offered
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Responses smaller than this are sent as-is; compressing them costs more than it saves
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+# Already-compressed payloads
+SKIP_MEDIA_TYPES = {"application/vnd.apache.parquet", "application/gzip", "application/zstd"}
+ENCODINGS = ("zstd", "gzip")
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Strong ETag of the encoded representation ("<hash>" -> "<hash>-gzip"); weak tags are kept"""
+    if etag.startswith('"') and etag.endswith('"') and len(etag) > 1:
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+def decoded_etag(etag: str) -> str:
+    """The identity representation's ETag for one produced by encoded_etag"""
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick zstd or gzip from an Accept-Encoding header, honouring q-values"""
+    offered: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        coding = parts[0].lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        offered[coding] = quality
+
+    candidates: List[Tuple[float, int, str]] = []
+    for preference, coding in enumerate(ENCODINGS):
+        if coding == "zstd" and not ZSTD_AVAILABLE:
+            continue
+        quality = offered.get(coding, offered.get("*", 0.0))
+        if quality > 0:
+            candidates.append((quality, -preference, coding))
+    return max(candidates)[2] if candidates else None
+
+
+class _Compressor:
+    """Streaming compressor with a common interface for gzip and zstd"""
+
+    def __init__(self, encoding: str):
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self._flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._flush_mode = zlib.Z_SYNC_FLUSH
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """Compress a chunk; flush=True pushes it to the client instead of buffering"""
+        out = self._obj.compress(data)
+        return out + self._obj.flush(self._flush_mode) if flush else out
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+def _with_etag(raw_headers, etag: bytes):
+    return [(name, value) for name, value in raw_headers if name.lower() != b"etag"] + [(b"etag", etag)]
+
+
+def _with_vary(raw_headers):
+    """Add Accept-Encoding to the Vary header, keeping any fields already listed"""
+    vary = b", ".join(value for name, value in raw_headers if name.lower() == b"vary")
+    fields = [field.strip().lower() for field in vary.split(b",")]
+    if b"accept-encoding" in fields or b"*" in fields:
+        return raw_headers
+    vary = vary + b", Accept-Encoding" if vary else b"Accept-Encoding"
+    return [(name, value) for name, value in raw_headers if name.lower() != b"vary"] + [(b"vary", vary)]
+
+
+class CompressionMiddleware:
+    """Negotiated zstd/gzip compression for responses above COMPRESSION_MIN_BYTES
+
+    Buffered responses are compressed in one go; streamed responses (NDJSON,
+    CSV, Arrow) are compressed chunk by chunk and flushed after every chunk so
+    clients keep receiving rows as they are produced. A compressed response
+    is a different representation, so its strong ETag gets the encoding as
+    a suffix (RFC 9110 8.8.3); etag_matches accepts both forms. Every
+    response that could have been compressed carries Vary: Accept-Encoding,
+    including the small ones sent as-is.
+    """
+
+    def __init__(self, app, min_bytes: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        if_none_match = b""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+            elif name == b"if-none-match":
+                if_none_match = value
+        encoding = choose_encoding(accept) if accept and scope["method"] != "HEAD" else None
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Hold the headers until we see the first body chunk
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+            if start is not None:
+                state["start"] = None
+                headers = {name.lower(): value for name, value in start["headers"]}
+                media_type = headers.get(b"content-type", b"").split(b";")[0].decode("latin-1")
+                compressible = b"content-encoding" not in headers and media_type not in SKIP_MEDIA_TYPES
+                skip = (
+                    encoding is None
+                    or not compressible
+                    or start["status"] < 200 or start["status"] in (204, 304)
+                    or (not more_body and len(body) < self.min_bytes)
+                )
+                if skip:
+                    state["passthrough"] = True
+                    if compressible:
+                        # Same URL may be compressed for other clients, so shared caches must key on it
+                        start = {**start, "headers": _with_vary(start["headers"])}
+                    etag = headers.get(b"etag")
+                    if encoding and start["status"] == 304 and etag:
+                        # Echo the tag the client holds: the encoded one if that is what it sent
+                        tagged = encoded_etag(etag.decode("latin-1"), encoding).encode("latin-1")
+                        if tagged in if_none_match:
+                            start = {**start, "headers": _with_etag(start["headers"], tagged)}
+                    await send(start)
+                    await send(message)
+                    return
+
+                state["compressor"] = _Compressor(encoding)
+                raw_headers = [
+                    (name, value) for name, value in _with_vary(start["headers"])
+                    if name.lower() not in (b"content-length", b"etag")
+                ]
+                if b"etag" in headers:
+                    etag = encoded_etag(headers[b"etag"].decode("latin-1"), encoding)
+                    raw_headers.append((b"etag", etag.encode("latin-1")))
+                raw_headers.append((b"content-encoding", encoding.encode("latin-1")))
+                if not more_body:
+                    compressed = state["compressor"].compress(body) + state["compressor"].finish()
+                    raw_headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    await send({**start, "headers": raw_headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": raw_headers})
+
+            compressor = state["compressor"]
+            if more_body:
+                await send({"type": "http.response.body", "body": compressor.compress(body, flush=True), "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.compress(body) + compressor.finish()})
+
+        await self.app(scope, receive, send_wrapper)
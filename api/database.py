@@ -0,0 +1,443 @@
+import asyncio
+import contextvars
+import logging
+import os
+import select
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from psycopg2 import connect, extensions, OperationalError, InterfaceError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+from metrics import add_request_time
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL connection settings (defaults match the local docker-compose port mapping)
+POSTGRES_CONFIG = {
+    "host": os.getenv("POSTGRES_HOST", "localhost"),
+    "port": int(os.getenv("POSTGRES_PORT", "45432")),
+    "database": os.getenv("POSTGRES_DB", "db"),
+    "user": os.getenv("POSTGRES_USER", "admin"),
+    "password": os.getenv("POSTGRES_PASSWORD", "PassW0rd"),
+}
+
+# Pool settings
+PG_POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", "2"))
+PG_POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "5"))
+# Idle connections older than this are pinged before being handed out
+PG_POOL_HEALTH_CHECK_AFTER = float(os.getenv("PG_POOL_HEALTH_CHECK_AFTER", "30"))
+
+# Blocking driver calls run on this many worker threads, off the event loop
+PG_EXECUTOR_WORKERS = int(os.getenv("PG_EXECUTOR_WORKERS", str(PG_POOL_MAX_SIZE)))
+# Default and upper bound for per-request statement timeouts
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "30000"))
+PG_MAX_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_MAX_STATEMENT_TIMEOUT_MS", "300000"))
+
+# Load scripts send `SELECT pg_notify('table_loaded', '<table>')` after rewriting a table
+TABLE_CHANGE_CHANNEL = os.getenv("PG_TABLE_CHANGE_CHANNEL", "table_loaded")
+
+
+class PooledConnection(extensions.connection):
+    """Connection that remembers which statements have been PREPAREd on it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available within the wait timeout"""
+
+
+class PostgresPool:
+    """Thread-safe PostgreSQL connection pool with bounded size and checkout timeout"""
+
+    def __init__(
+        self,
+        min_size: int = PG_POOL_MIN_SIZE,
+        max_size: int = PG_POOL_MAX_SIZE,
+        timeout: float = PG_POOL_TIMEOUT,
+        health_check_after: float = PG_POOL_HEALTH_CHECK_AFTER,
+        **conn_kwargs: Any
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.conn_kwargs = conn_kwargs or dict(POSTGRES_CONFIG)
+
+        self._lock = threading.Condition()
+        self._idle: List[tuple] = []  # (connection, returned_at)
+        self._in_use = 0
+        self._closed = False
+
+        # Counters reported by stats()
+        self._checkouts = 0
+        self._connections_opened = 0
+        self._connections_discarded = 0
+        self._timeouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _open(self):
+        conn = connect(connection_factory=PooledConnection, **self.conn_kwargs)
+        with self._lock:
+            self._connections_opened += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        # The lock is reentrant: some callers already hold it
+        with self._lock:
+            self._connections_discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, idle_since: float) -> bool:
+        """Check a connection before handing it out"""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (OperationalError, InterfaceError):
+            return False
+
+    def warm(self) -> int:
+        """Open connections until min_size exist; returns how many were opened
+
+        Called in the background after startup so a slow or unavailable
+        database does not delay the app coming up.
+        """
+        opened = 0
+        while True:
+            with self._lock:
+                if self._closed or len(self._idle) + self._in_use >= self.min_size:
+                    return opened
+                # Reserve the slot while connecting outside the lock
+                self._in_use += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                    self._lock.notify()
+                raise
+            # Hand the slot over to the idle connection in one step, so the
+            # pool is never seen with the slot free and the connection missing
+            with self._lock:
+                self._in_use -= 1
+                if self._closed:
+                    self._discard(conn)
+                    return opened
+                self._idle.append((conn, time.monotonic()))
+                self._lock.notify()
+            opened += 1
+
+    def getconn(self, timeout: Optional[float] = None):
+        """Check out a connection, waiting up to `timeout` seconds for one to free up"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        started = time.monotonic()
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+
+                if self._in_use < self.max_size:
+                    conn, idle_since = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Timed out after {timeout:.1f}s waiting for a PostgreSQL connection "
+                        f"(max_size={self.max_size})"
+                    )
+                waited = True
+                self._lock.wait(remaining)
+
+            # Reserve the slot before doing any network I/O outside the lock
+            self._in_use += 1
+
+        try:
+            if conn is None or not self._is_healthy(conn, idle_since):
+                if conn is not None:
+                    self._discard(conn)
+                conn = self._open()
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+        with self._lock:
+            self._checkouts += 1
+            if waited:
+                wait_time = time.monotonic() - started
+                self._waits += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+        if waited:
+            add_request_time("pool_wait", wait_time)
+
+        return conn
+
+    def putconn(self, conn, close: bool = False) -> None:
+        """Return a connection to the pool"""
+        if not close and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+
+        with self._lock:
+            self._in_use -= 1
+            if close or conn.closed or self._closed or len(self._idle) >= self.max_size:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager that checks out a connection and always returns it"""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            # Lost connections are flagged closed by the driver and discarded by putconn;
+            # query errors (including statement timeouts) leave it reusable
+            self.putconn(conn)
+
+    def close(self) -> None:
+        """Close idle connections and refuse new checkouts"""
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._lock.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return current pool usage and lifetime counters"""
+        with self._lock:
+            in_use = self._in_use
+            idle = len(self._idle)
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "timeout": self.timeout,
+                "size": in_use + idle,
+                "in_use": in_use,
+                "idle": idle,
+                "closed": self._closed,
+                "checkouts": self._checkouts,
+                "connections_opened": self._connections_opened,
+                "connections_discarded": self._connections_discarded,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 3),
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 3),
+            }
+
+
+# Process-wide pool and executor, created on application startup
+_pool: Optional[PostgresPool] = None
+_pool_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def init_pool(**kwargs: Any) -> PostgresPool:
+    """Create the process-wide pool (no-op if it already exists); no connections are opened yet"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PostgresPool(**kwargs)
+        return _pool
+
+
+def close_pool() -> None:
+    """Close the process-wide pool and its executor"""
+    global _pool, _executor
+    with _pool_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool() -> PostgresPool:
+    """Get the process-wide pool, creating it on first use"""
+    return _pool if _pool is not None else init_pool()
+
+
+def warm_pool() -> None:
+    """Open the pool's minimum connections, logging instead of raising if PostgreSQL is down"""
+    try:
+        opened = get_pool().warm()
+        logger.info("Opened %d PostgreSQL pool connections", opened)
+    except Exception as e:
+        logger.warning("PostgreSQL pool warm-up failed, connections will open on demand: %s", e)
+
+
+def pool_metrics() -> List[Tuple[str, str, str, float]]:
+    """Pool gauges and counters in the form /metrics collectors return"""
+    pool = _pool
+    if pool is None:
+        return []
+    stats = pool.stats()
+    return [
+        ("api_pg_pool_size", "gauge", "Open PostgreSQL connections", stats["size"]),
+        ("api_pg_pool_in_use", "gauge", "PostgreSQL connections checked out", stats["in_use"]),
+        ("api_pg_pool_max_size", "gauge", "Upper bound on PostgreSQL connections", stats["max_size"]),
+        ("api_pg_pool_waits_total", "counter", "Checkouts that had to wait for a connection", stats["waits"]),
+        ("api_pg_pool_timeouts_total", "counter", "Checkouts that gave up waiting", stats["timeouts"]),
+        ("api_pg_pool_wait_seconds_total", "counter", "Total time spent waiting for connections", stats["wait_time_total_ms"] / 1000),
+    ]
+
+
+@contextmanager
+def pg_connection(timeout: Optional[float] = None):
+    """Borrow a pooled PostgreSQL connection"""
+    with get_pool().connection(timeout) as conn:
+        yield conn
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the bounded thread pool used for blocking database calls"""
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=PG_EXECUTOR_WORKERS,
+                thread_name_prefix="pg-worker"
+            )
+        return _executor
+
+
+async def run_in_db_thread(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking database function on the executor without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the request context so pool waits are attributed to the request
+    context = contextvars.copy_context()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(get_executor(), partial(context.run, fn, *args, **kwargs))
+    finally:
+        add_request_time("postgres", time.perf_counter() - started)
+
+
+def set_statement_timeout(cursor, timeout_ms: Optional[int] = None) -> None:
+    """Apply a statement timeout to the current transaction only"""
+    timeout_ms = PG_STATEMENT_TIMEOUT_MS if timeout_ms is None else timeout_ms
+    timeout_ms = min(timeout_ms, PG_MAX_STATEMENT_TIMEOUT_MS)
+    cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+
+
+# ---------------------------------------------------------------------------
+# Table change notifications
+# ---------------------------------------------------------------------------
+
+_table_change_callbacks: List[Callable[[str], None]] = []
+_listener_thread: Optional[threading.Thread] = None
+_listener_stop = threading.Event()
+
+
+def on_table_change(callback: Callable[[str], None]) -> Callable[[str], None]:
+    """Register a callback invoked with the table name whenever a table changes"""
+    _table_change_callbacks.append(callback)
+    return callback
+
+
+def notify_table_changed(table: str) -> None:
+    """Run the registered callbacks for a changed table"""
+    table = table.strip().lower()
+    if not table:
+        return
+    for callback in list(_table_change_callbacks):
+        try:
+            callback(table)
+        except Exception:
+            logger.exception("Table change callback failed for %s", table)
+
+
+def _listen_for_table_changes() -> None:
+    backoff = 1.0
+    while not _listener_stop.is_set():
+        conn = None
+        try:
+            conn = connect(**POSTGRES_CONFIG)
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {TABLE_CHANGE_CHANNEL}")
+            backoff = 1.0
+            while not _listener_stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify_table_changed(conn.notifies.pop(0).payload)
+        except Exception as e:
+            logger.warning("Table change listener disconnected: %s", e)
+            _listener_stop.wait(backoff)
+            backoff = min(backoff * 2, 60.0)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def start_table_change_listener() -> None:
+    """Start the background LISTEN thread for table change notifications"""
+    global _listener_thread
+    if _listener_thread is not None and _listener_thread.is_alive():
+        return
+    _listener_stop.clear()
+    _listener_thread = threading.Thread(
+        target=_listen_for_table_changes, name="pg-table-listener", daemon=True
+    )
+    _listener_thread.start()
+
+
+def stop_table_change_listener() -> None:
+    """Stop the background LISTEN thread"""
+    global _listener_thread
+    _listener_stop.set()
+    if _listener_thread is not None:
+        _listener_thread.join(timeout=2.0)
+        _listener_thread = None
+
+
+def table_change_listener_alive() -> bool:
+    """Whether the LISTEN thread is running (it reconnects on its own after errors)"""
+    return _listener_thread is not None and _listener_thread.is_alive()
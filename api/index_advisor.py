@@ -0,0 +1,270 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Fraction of /mongodb/query requests whose plan is checked with explain("executionStats")
+EXPLAIN_SAMPLE_RATE = float(os.getenv("MONGO_EXPLAIN_SAMPLE_RATE", "0.05"))
+# Explains run in the background; at most this many at once, extra samples are skipped
+EXPLAIN_MAX_CONCURRENCY = int(os.getenv("MONGO_EXPLAIN_MAX_CONCURRENCY", "2"))
+EXPLAIN_TIMEOUT_MS = int(os.getenv("MONGO_EXPLAIN_TIMEOUT_MS", "10000"))
+# Query shapes examining this many documents per document returned are flagged
+INDEX_ADVICE_MIN_RATIO = float(os.getenv("INDEX_ADVICE_MIN_RATIO", "10"))
+# Query shapes tracked across all collections; the least recently seen is evicted
+INDEX_ADVICE_MAX_SHAPES = int(os.getenv("INDEX_ADVICE_MAX_SHAPES", "1000"))
+
+_RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$ne", "$nin"}
+_TEXT_OPERATORS = {"$regex"}
+
+
+def query_shape(query: Dict[str, Any], sort: Sequence[Tuple[str, int]]) -> Dict[str, Any]:
+    """Classify filter fields for the ESR (equality, sort, range) index rule"""
+    equality, ranges, text = [], [], []
+
+    def visit(clause: Dict[str, Any]) -> None:
+        for field, condition in clause.items():
+            if field in ("$and", "$or", "$nor") and isinstance(condition, list):
+                for sub in condition:
+                    if isinstance(sub, dict):
+                        visit(sub)
+            elif field == "$text":
+                text.append("$**")
+            elif field.startswith("$"):
+                continue
+            elif isinstance(condition, dict) and any(op.startswith("$") for op in condition):
+                operators = set(condition)
+                if operators & _TEXT_OPERATORS:
+                    text.append(field)
+                elif operators & _RANGE_OPERATORS:
+                    ranges.append(field)
+                else:
+                    # $in, $eq, $exists, ... behave like equality for index order
+                    equality.append(field)
+            elif hasattr(condition, "pattern"):
+                text.append(field)
+            else:
+                equality.append(field)
+
+    visit(query)
+    sort_fields = [(field, direction) for field, direction in sort if field != "_id"]
+    return {
+        "equality": sorted(set(equality)),
+        "sort": sort_fields,
+        "range": sorted(set(ranges) - set(equality)),
+        "text": sorted(set(text)),
+    }
+
+
+def _shape_key(shape: Dict[str, Any]) -> Tuple:
+    return (tuple(shape["equality"]), tuple(shape["sort"]), tuple(shape["range"]), tuple(shape["text"]))
+
+
+def _plan_stages(plan: Any) -> List[str]:
+    """All stage names in a winning plan tree (classic and SBE layouts)"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for key in ("inputStage", "queryPlan"):
+            stages.extend(_plan_stages(plan.get(key)))
+        for child in plan.get("inputStages", []):
+            stages.extend(_plan_stages(child))
+    return stages
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """COLLSCAN flag and examined/returned counts from explain("executionStats") output"""
+    stats = explain.get("executionStats", {})
+    stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+    returned = stats.get("nReturned", 0)
+    examined = stats.get("totalDocsExamined", 0)
+    return {
+        "collscan": "COLLSCAN" in stages,
+        "stages": stages,
+        "docs_examined": examined,
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "returned": returned,
+        "execution_ms": stats.get("executionTimeMillis", 0),
+    }
+
+
+class QueryAdvisor:
+    """Per-collection query-shape counters fed by sampled explain plans"""
+
+    def __init__(
+        self,
+        sample_rate: float = EXPLAIN_SAMPLE_RATE,
+        max_concurrency: int = EXPLAIN_MAX_CONCURRENCY,
+        max_shapes: int = INDEX_ADVICE_MAX_SHAPES
+    ):
+        self.sample_rate = sample_rate
+        self.max_concurrency = max_concurrency
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        # (collection, shape key) -> counters, least recently seen first
+        self._shapes: "OrderedDict[Tuple[str, Tuple], Dict[str, Any]]" = OrderedDict()
+        self._running = 0
+        self.skipped = 0
+        self.evictions = 0
+        # Strong references to in-flight explain tasks so they are not garbage collected
+        self.tasks: set = set()
+
+    def _entry(self, collection: str, shape: Dict[str, Any]) -> Dict[str, Any]:
+        key = (collection, _shape_key(shape))
+        if key in self._shapes:
+            self._shapes.move_to_end(key)
+            return self._shapes[key]
+        while self._shapes and len(self._shapes) >= self.max_shapes:
+            self._shapes.popitem(last=False)
+            self.evictions += 1
+        entry = self._shapes[key] = {
+            "shape": shape, "queries": 0, "explained": 0, "collscans": 0,
+            "docs_examined": 0, "returned": 0, "last_stages": [], "last_seen": None,
+        }
+        return entry
+
+    def record_query(self, collection: str, shape: Dict[str, Any]) -> bool:
+        """Count a query; returns True when it should be explained"""
+        with self._lock:
+            entry = self._entry(collection, shape)
+            entry["queries"] += 1
+            entry["last_seen"] = time.time()
+            if random.random() >= self.sample_rate:
+                return False
+            if self._running >= self.max_concurrency:
+                self.skipped += 1
+                return False
+            self._running += 1
+            return True
+
+    def record_explain(self, collection: str, shape: Dict[str, Any], summary: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._running -= 1
+            entry = self._shapes.get((collection, _shape_key(shape)))
+            # The shape may have been evicted while the explain was running
+            if summary is None or entry is None:
+                return
+            entry["explained"] += 1
+            entry["collscans"] += int(summary["collscan"])
+            entry["docs_examined"] += summary["docs_examined"]
+            entry["returned"] += summary["returned"]
+            entry["last_stages"] = summary["stages"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "skipped": self.skipped,
+                "shapes": len(self._shapes),
+                "max_shapes": self.max_shapes,
+                "evictions": self.evictions,
+            }
+
+    def shapes(self, collection: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            report: Dict[str, List[Dict[str, Any]]] = {collection: []} if collection else {}
+            for (name, _), entry in self._shapes.items():
+                if collection and name != collection:
+                    continue
+                entry = dict(entry)
+                entry["examined_per_returned"] = round(entry["docs_examined"] / max(entry["returned"], 1), 2)
+                report.setdefault(name, []).append(entry)
+            return {name: sorted(entries, key=lambda e: -e["queries"]) for name, entries in report.items()}
+
+    def reset(self, collection: Optional[str] = None) -> None:
+        with self._lock:
+            if collection:
+                for key in [key for key in self._shapes if key[0] == collection]:
+                    del self._shapes[key]
+            else:
+                self._shapes.clear()
+
+
+def recommended_index(shape: Dict[str, Any]) -> Optional[List[Tuple[str, Any]]]:
+    """Compound index keys for a query shape, in equality-sort-range order"""
+    if shape["text"]:
+        return [(field, "text") for field in shape["text"] if field != "$**"] or [("$**", "text")]
+    keys: List[Tuple[str, Any]] = [(field, 1) for field in shape["equality"]]
+    keys += [(field, direction) for field, direction in shape["sort"] if field not in shape["equality"]]
+    keys += [(field, 1) for field in shape["range"] if all(field != k for k, _ in keys)]
+    return keys or None
+
+
+def _covered(keys: List[Tuple[str, Any]], existing: Sequence[List[Tuple[str, Any]]]) -> bool:
+    """True if an existing index already starts with these keys (text indexes match on type)"""
+    if keys[0][1] == "text":
+        return any(any(value == "text" for _, value in index) for index in existing)
+    wanted = [(field, abs(direction)) for field, direction in keys]
+    for index in existing:
+        prefix = [(field, abs(direction)) for field, direction in index[:len(keys)] if direction != "text"]
+        if prefix == wanted:
+            return True
+    return False
+
+
+def advise(shapes: List[Dict[str, Any]], existing: Sequence[List[Tuple[str, Any]]]) -> List[Dict[str, Any]]:
+    """Indexes worth building for the sampled shapes of one collection"""
+    advice: Dict[Tuple, Dict[str, Any]] = {}
+    for entry in shapes:
+        keys = recommended_index(entry["shape"])
+        if not keys or _covered(keys, existing):
+            continue
+        slow = entry["collscans"] > 0 or entry["examined_per_returned"] >= INDEX_ADVICE_MIN_RATIO
+        # Text searches and sorted scans are worth an index even before an explain sample lands
+        if not slow and not (entry["explained"] == 0 and (entry["shape"]["text"] or entry["shape"]["sort"])):
+            continue
+        key = tuple(keys)
+        item = advice.setdefault(key, {
+            "keys": [[field, value] for field, value in keys],
+            "kind": "text" if keys[0][1] == "text" else "compound" if len(keys) > 1 else "single",
+            "queries": 0, "collscans": 0, "examined_per_returned": 0.0,
+        })
+        if item["kind"] == "text":
+            item["note"] = "$regex cannot use a text index; switch these queries to $text once it is built"
+        item["queries"] += entry["queries"]
+        item["collscans"] += entry["collscans"]
+        item["examined_per_returned"] = max(item["examined_per_returned"], entry["examined_per_returned"])
+    return sorted(advice.values(), key=lambda item: (-item["collscans"], -item["queries"]))
+
+
+async def explain_find(db, collection: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]],
+                       sort: Sequence[Tuple[str, int]], limit: Optional[int]) -> Dict[str, Any]:
+    find = {"find": collection, "filter": query, "sort": dict(sort), "maxTimeMS": EXPLAIN_TIMEOUT_MS}
+    if projection:
+        find["projection"] = projection
+    if limit:
+        find["limit"] = limit
+    explain = await db.command({"explain": find, "verbosity": "executionStats"})
+    return summarize_explain(explain)
+
+
+async def sample_explain(db, collection: str, shape: Dict[str, Any], *args) -> None:
+    """Background task: explain one query and record its plan"""
+    summary = None
+    try:
+        summary = await explain_find(db, collection, *args)
+    except Exception:
+        # Advice is best-effort; a failed explain must never affect the request
+        pass
+    finally:
+        advisor.record_explain(collection, shape, summary)
+
+
+def maybe_explain(db, collection: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]],
+                  sort: Sequence[Tuple[str, int]], limit: Optional[int]) -> None:
+    """Record a /mongodb/query call and sometimes schedule an explain for it"""
+    shape = query_shape(query, sort)
+    if advisor.record_query(collection, shape):
+        task = asyncio.get_running_loop().create_task(
+            sample_explain(db, collection, shape, query, projection, sort, limit)
+        )
+        advisor.tasks.add(task)
+        task.add_done_callback(advisor.tasks.discard)
+
+
+advisor = QueryAdvisor()
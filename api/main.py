@@ -1,11 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import mongodb, postgresql
+from fastapi.responses import Response
+from routers import batch, health, join, mongodb, postgresql
+from cache import query_cache
+from compression import CompressionMiddleware
+from database import (
+    init_pool, close_pool, get_executor, pool_metrics, warm_pool,
+    start_table_change_listener, stop_table_change_listener
+)
+from metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, monitor_event_loop, register_collector, render_metrics
+from mongo import close_mongo_client
+from responses import FastJSONResponse
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up shared database resources without blocking startup, release them on shutdown
+
+    The pool is created empty and filled in the background, the MongoDB client
+    is created on first use, and the table-change listener retries on its own,
+    so the app starts in milliseconds even when a backend is down.
+    """
+    init_pool()
+    get_executor().submit(warm_pool)
+    start_table_change_listener()
+    loop_monitor = asyncio.create_task(monitor_event_loop())
+    yield
+    loop_monitor.cancel()
+    stop_table_change_listener()
+    close_pool()
+    await close_mongo_client()
 
 app = FastAPI(
     title="Data Engineering API",
     description="API for querying MongoDB and PostgreSQL databases",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -17,7 +50,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
+
+def _cache_metrics():
+    stats = query_cache.stats()
+    return [
+        ("api_query_cache_hits_total", "counter", "PostgreSQL query cache hits", stats["hits"]),
+        ("api_query_cache_misses_total", "counter", "PostgreSQL query cache misses", stats["misses"]),
+        ("api_query_cache_bytes", "gauge", "Approximate memory held by cached query results", stats["bytes"]),
+    ]
+
+
+register_collector(pool_metrics)
+register_collector(_cache_metrics)
+
 # Include routers
+app.include_router(health.router, tags=["Health"])
+
 app.include_router(
     mongodb.router,
     prefix="/mongodb",
@@ -30,6 +83,15 @@ app.include_router(
     tags=["PostgreSQL"]
 )
 
+app.include_router(batch.router, tags=["Batch"])
+
+app.include_router(join.router, tags=["Join"])
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus text exposition of request, backend and pool metrics"""
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.get("/")
 def read_root():
     return {
@@ -37,6 +99,8 @@ def read_root():
         "version": "1.0.0",
         "endpoints": {
             "mongodb": "/mongodb",
-            "postgresql": "/postgresql"
+            "postgresql": "/postgresql",
+            "batch": "/batch",
+            "join": "/join"
         }
     }
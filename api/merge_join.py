@@ -0,0 +1,153 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+import os
+
+# Rows that may share one join key on one side; the merge holds one such group per side
+JOIN_MAX_GROUP_ROWS = int(os.getenv("JOIN_MAX_GROUP_ROWS", "10000"))
+
+JOIN_TYPES = ("inner", "left", "outer")
+ALIGNMENTS = ("daily", "weekly")
+WEEKLY_AGGREGATES = ("last", "mean", "sum")
+WEEKDAYS = {"monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6}
+
+Row = Dict[str, Any]
+Group = Tuple[date, List[Row]]
+
+
+class JoinError(ValueError):
+    """Raised for unsortable input or a key group that is too large to hold"""
+
+
+def to_date(value: Any) -> Optional[date]:
+    """Calendar date of a date, datetime or ISO string value (None if it has none)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def align_date(day: date, alignment: str, week_start: int = 0) -> date:
+    """Join key for a date: the date itself, or the first day of its week"""
+    if alignment == "weekly":
+        return day - timedelta(days=(day.weekday() - week_start) % 7)
+    return day
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def reduce_week(rows: List[Row], aggregate: str, value_fields: Sequence[str] = ()) -> Row:
+    """Collapse a week's rows into one
+
+    "last" keeps the week's last row. "mean" and "sum" keep the first row's
+    other fields (keys, ids) and replace each of value_fields with the float
+    mean or sum of its numeric values.
+    """
+    if aggregate == "last":
+        return dict(rows[-1])
+    reduced = dict(rows[0])
+    for field in value_fields:
+        values = [float(row[field]) for row in rows if _is_number(row.get(field))]
+        if values:
+            reduced[field] = sum(values) if aggregate == "sum" else sum(values) / len(values)
+    return reduced
+
+
+async def keyed_groups(
+    rows: AsyncIterator[Row],
+    date_field: str,
+    alignment: str = "daily",
+    week_start: int = 0,
+    weekly_aggregate: str = "last",
+    value_fields: Sequence[str] = (),
+    stats: Optional[Dict[str, int]] = None
+) -> AsyncIterator[Group]:
+    """Group a date-sorted row stream by join key
+
+    Rows without a usable date are skipped (and counted in stats["skipped"]).
+    Weekly groups are reduced to a single row (see reduce_week).
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("rows", 0)
+    stats.setdefault("skipped", 0)
+    key: Optional[date] = None
+    group: List[Row] = []
+    async for row in rows:
+        stats["rows"] += 1
+        day = to_date(row.get(date_field))
+        if day is None:
+            stats["skipped"] += 1
+            continue
+        row_key = align_date(day, alignment, week_start)
+        if key is not None and row_key < key:
+            raise JoinError(f"Rows are not sorted by '{date_field}' ({row_key} after {key}); mixed date types?")
+        if row_key != key:
+            if group:
+                yield key, [reduce_week(group, weekly_aggregate, value_fields)] if alignment == "weekly" else group
+            key, group = row_key, []
+        group.append(row)
+        if len(group) > JOIN_MAX_GROUP_ROWS:
+            raise JoinError(f"More than {JOIN_MAX_GROUP_ROWS} rows share the key {key}; filter the input first")
+    if group:
+        yield key, [reduce_week(group, weekly_aggregate, value_fields)] if alignment == "weekly" else group
+
+
+def _carried(last: Optional[Tuple[date, Row]], key: date, fill_limit_days: Optional[int]) -> Optional[List[Row]]:
+    if last is None or (fill_limit_days is not None and (key - last[0]).days > fill_limit_days):
+        return None
+    return [last[1]]
+
+
+async def merge_join(
+    left: AsyncIterator[Group],
+    right: AsyncIterator[Group],
+    how: str = "inner",
+    forward_fill: bool = False,
+    fill_limit_days: Optional[int] = None
+) -> AsyncIterator[Tuple[date, Optional[Row], Optional[Row]]]:
+    """Merge two key-sorted group streams, yielding (key, left row, right row)
+
+    Keys present on both sides produce the cross product of their groups.
+    With forward_fill, a side with no rows for a key contributes its most
+    recent row (if no older than fill_limit_days), which turns a weekly series
+    into a daily one and counts as present for an inner join.
+    """
+    left_groups, right_groups = left.__aiter__(), right.__aiter__()
+    next_left = await anext(left_groups, None)
+    next_right = await anext(right_groups, None)
+    last_left: Optional[Tuple[date, Row]] = None
+    last_right: Optional[Tuple[date, Row]] = None
+
+    while next_left is not None or next_right is not None:
+        left_rows = right_rows = None
+        if next_right is None or (next_left is not None and next_left[0] <= next_right[0]):
+            key, left_rows = next_left
+            next_left = await anext(left_groups, None)
+        if next_right is not None and (left_rows is None or next_right[0] == key):
+            key, right_rows = next_right
+            next_right = await anext(right_groups, None)
+
+        has_left, has_right = left_rows is not None, right_rows is not None
+        if has_left:
+            last_left = (key, left_rows[-1])
+        if has_right:
+            last_right = (key, right_rows[-1])
+        if forward_fill:
+            left_rows = left_rows or _carried(last_left, key, fill_limit_days)
+            right_rows = right_rows or _carried(last_right, key, fill_limit_days)
+
+        if how == "left" and not has_left:
+            continue
+        if how == "inner" and (left_rows is None or right_rows is None):
+            continue
+        for left_row in left_rows or [None]:
+            for right_row in right_rows or [None]:
+                yield key, left_row, right_row
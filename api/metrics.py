@@ -0,0 +1,234 @@
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+# Per-request time spent in each backend ("postgres", "mongo", "pool_wait", "serialize");
+# a dict rather than floats so worker threads running a copy of the context add to the same totals
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed label set"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Gauge:
+    """Gauge without labels"""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {_number(self.value)}"
+
+
+REQUEST_LATENCY = Histogram(
+    "api_http_request_duration_seconds", "Time from request start to the last response byte",
+    ["method", "route", "status"]
+)
+REQUEST_BACKEND_TIME = Histogram(
+    "api_http_request_backend_seconds", "Per-request time spent in postgres, mongo, pool_wait or serialize",
+    ["method", "route", "backend"]
+)
+RESPONSE_SIZE = Histogram(
+    "api_http_response_size_bytes", "Response body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+IN_FLIGHT = Gauge("api_http_requests_in_flight", "Requests currently being served")
+EVENT_LOOP_LAG = Gauge("api_event_loop_lag_seconds", "Delay of the last event loop lag probe beyond its scheduled wakeup")
+
+_metrics = [REQUEST_LATENCY, REQUEST_BACKEND_TIME, RESPONSE_SIZE, IN_FLIGHT, EVENT_LOOP_LAG]
+# Callables returning (name, type, help, value) tuples, read at scrape time
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, float]]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[Tuple[str, str, str, float]]]) -> None:
+    """Add values that are sampled on every scrape (e.g. pool statistics)"""
+    _collectors.append(collector)
+
+
+def add_request_time(backend: str, seconds: float) -> None:
+    """Attribute time to a backend for the current request (no-op outside a request)"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[backend] = timings.get(backend, 0.0) + seconds
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            samples = list(collector())
+        except Exception:
+            # A backend being down must not break the scrape
+            continue
+        for name, metric_type, help, value in samples:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# id(route) -> full path template, including any router prefix (routes live as long as the app)
+_route_templates: Dict[int, str] = {}
+
+
+def _route_template(scope) -> str:
+    """Path template of the matched route, e.g. /postgresql/table-info/{table}"""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    template = _route_templates.get(id(route))
+    if template is None:
+        path = scope["path"]
+        template = getattr(route, "path", path)
+        regex = getattr(route, "path_regex", None)
+        # Some FastAPI versions keep router-relative routes; recover the prefix from the request path
+        if regex is not None and not regex.match(path):
+            for index in range(1, len(path)):
+                if path[index] == "/" and regex.match(path[index:]):
+                    template = path[:index] + template
+                    break
+        _route_templates[id(route)] = template
+    return template
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, size, in-flight and backend time per route
+
+    Routes are labelled with their path template (/postgresql/table-info/{table}),
+    so label cardinality is bounded by the number of routes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        state = {"status": 500, "size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["size"] += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            _request_timings.reset(token)
+            path = _route_template(scope)
+            method = scope["method"]
+            REQUEST_LATENCY.observe(time.perf_counter() - started, method, path, str(state["status"]))
+            RESPONSE_SIZE.observe(state["size"], method, path)
+            for backend, seconds in timings.items():
+                REQUEST_BACKEND_TIME.observe(seconds, method, path, backend)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Adds MongoDB command round-trip time to the current request"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        add_request_time("mongo", event.duration_micros / 1e6)
+
+    def failed(self, event):
+        add_request_time("mongo", event.duration_micros / 1e6)
+
+
+async def monitor_event_loop(interval: float = 1.0) -> None:
+    """Measure how late the loop wakes up; sustained lag means blocking code on the loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.set(max(0.0, loop.time() - scheduled))
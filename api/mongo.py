@@ -0,0 +1,51 @@
+import os
+from typing import Optional
+
+from pymongo import AsyncMongoClient
+
+from metrics import MongoCommandTimer
+
+# MongoDB connection settings (defaults match the local docker-compose port mapping)
+MONGO_HOST = os.getenv("MONGO_HOST", "localhost")
+MONGO_PORT = os.getenv("MONGO_PORT", "37017")
+MONGO_DB = os.getenv("MONGO_DB", "db")
+MONGO_USER = os.getenv("MONGO_USER")
+MONGO_PASSWORD = os.getenv("MONGO_PASSWORD")
+
+# Only use authentication if both user and password are provided
+if MONGO_USER and MONGO_PASSWORD:
+    MONGO_URI = f"mongodb://{MONGO_USER}:{MONGO_PASSWORD}@{MONGO_HOST}:{MONGO_PORT}/{MONGO_DB}"
+else:
+    MONGO_URI = f"mongodb://{MONGO_HOST}:{MONGO_PORT}/{MONGO_DB}"
+MONGO_URI = os.getenv("MONGO_URI", MONGO_URI)
+
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+_client: Optional[AsyncMongoClient] = None
+
+
+def get_mongo_client() -> AsyncMongoClient:
+    """Get the shared async MongoDB client, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[MongoCommandTimer()]
+        )
+    return _client
+
+
+def get_mongo_db():
+    """Get the application database on the shared client"""
+    return get_mongo_client()[MONGO_DB]
+
+
+async def close_mongo_client() -> None:
+    """Close the shared client"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,96 @@
+import os
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List
+
+from bson import Decimal128, ObjectId
+
+# Documents drawn with $sample to describe a collection's schema
+SCHEMA_SAMPLE_SIZE = int(os.getenv("MONGO_SCHEMA_SAMPLE_SIZE", "1000"))
+
+# Strings like 2020-01-31 or 2020-01-31T09:30:00 sort chronologically, so min/max is meaningful
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?")
+
+
+def _type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, (Decimal, Decimal128)):
+        return "decimal"
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    return type(value).__name__
+
+
+def _flatten(document: Dict[str, Any], prefix: str = "") -> Iterable:
+    """Yield (dotted path, value) pairs, descending into embedded documents"""
+    for key, value in document.items():
+        path = f"{prefix}{key}"
+        yield path, value
+        if isinstance(value, dict):
+            yield from _flatten(value, path + ".")
+
+
+def _comparable(value: Any) -> Any:
+    if isinstance(value, Decimal128):
+        return value.to_decimal()
+    return value
+
+
+def summarize_documents(documents: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Field names, observed types, null rates and value ranges for a document sample"""
+    fields: Dict[str, Dict[str, Any]] = {}
+    for doc in documents:
+        for path, value in _flatten(doc):
+            field = fields.setdefault(path, {"present": 0, "types": {}, "min": None, "max": None, "date_strings": True})
+            field["present"] += 1
+            type_name = _type_name(value)
+            field["types"][type_name] = field["types"].get(type_name, 0) + 1
+
+            if type_name == "string" and not _ISO_DATE.match(value):
+                field["date_strings"] = False
+            if type_name in ("int", "double", "decimal", "date", "string"):
+                value = _comparable(value)
+                if field["min"] is None:
+                    field["min"] = field["max"] = value
+                else:
+                    try:
+                        field["min"] = min(field["min"], value)
+                        field["max"] = max(field["max"], value)
+                    except TypeError:
+                        # Mixed numeric/date/string values have no common order
+                        field["min"] = field["max"] = None
+                        field["date_strings"] = False
+
+    sampled = len(documents)
+    summary = {}
+    for path, field in sorted(fields.items()):
+        types = field["types"]
+        nulls = types.get("null", 0) + sampled - field["present"]
+        entry: Dict[str, Any] = {
+            "types": dict(sorted(types.items(), key=lambda item: -item[1])),
+            "null_rate": round(nulls / sampled, 4) if sampled else 0.0,
+        }
+        numeric = set(types) - {"null"} <= {"int", "double", "decimal"}
+        dates = set(types) - {"null"} == {"date"}
+        iso_strings = set(types) - {"null"} == {"string"} and field["date_strings"]
+        if field["min"] is not None and (numeric or dates or iso_strings):
+            entry["min"] = float(field["min"]) if isinstance(field["min"], Decimal) else field["min"]
+            entry["max"] = float(field["max"]) if isinstance(field["max"], Decimal) else field["max"]
+        summary[path] = entry
+    return summary
@@ -0,0 +1,141 @@
+from datetime import date
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from psycopg2.errors import FeatureNotSupported, InvalidSqlStatementName
+
+from database import set_statement_timeout
+
+
+class NamedQueryError(ValueError):
+    """Raised for unknown templates or missing/invalid template parameters"""
+
+
+# Parameter types: name -> (PostgreSQL type, parser for the query-string value)
+PARAM_TYPES: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    "date": ("date", date.fromisoformat),
+    "int": ("integer", int),
+    "float": ("double precision", float),
+    "text": ("text", str),
+}
+
+
+class NamedQuery:
+    """A vetted, parameterized SELECT that is PREPAREd once per pooled connection"""
+
+    def __init__(
+        self,
+        name: str,
+        sql: str,
+        params: Sequence[Tuple[str, str, Any]],
+        tables: Sequence[str],
+        description: str = ""
+    ):
+        self.name = name
+        self.sql = sql
+        # (parameter name, PARAM_TYPES key, default or ... when required), in $n order
+        self.params = list(params)
+        self.tables = list(tables)
+        self.description = description
+        self.statement = f"api_named_{name}"
+
+    def bind(self, values: Mapping[str, str]) -> List[Any]:
+        """Parse and order query-string values for EXECUTE"""
+        bound = []
+        for param, type_name, default in self.params:
+            raw = values.get(param)
+            if raw is None:
+                if default is ...:
+                    raise NamedQueryError(f"Missing required parameter '{param}' for '{self.name}'")
+                bound.append(default)
+                continue
+            try:
+                bound.append(PARAM_TYPES[type_name][1](raw))
+            except ValueError:
+                raise NamedQueryError(f"Parameter '{param}' must be a {type_name}, got '{raw}'")
+        return bound
+
+    def prepare_sql(self) -> str:
+        types = ", ".join(PARAM_TYPES[type_name][0] for _, type_name, _ in self.params)
+        return f"PREPARE {self.statement} ({types}) AS {self.sql}"
+
+    def execute_sql(self) -> str:
+        placeholders = ", ".join(["%s"] * len(self.params))
+        return f"EXECUTE {self.statement} ({placeholders})"
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "sql": self.sql,
+            "tables": self.tables,
+            "params": [
+                {"name": param, "type": type_name, "required": default is ..., "default": None if default is ... else default}
+                for param, type_name, default in self.params
+            ],
+        }
+
+
+NAMED_QUERIES: Dict[str, NamedQuery] = {
+    query.name: query for query in [
+        NamedQuery(
+            "daily_merged_range",
+            "SELECT * FROM daily_merged_data WHERE date >= $1 AND date <= $2 ORDER BY date LIMIT $3",
+            [("start", "date", ...), ("end", "date", ...), ("limit", "int", 1000)],
+            ["daily_merged_data"],
+            "Daily merged analysis rows between two dates"
+        ),
+        NamedQuery(
+            "ticker_history",
+            "SELECT * FROM stock_data WHERE ticker = $1 AND date >= $2 AND date <= $3 ORDER BY date LIMIT $4",
+            [("ticker", "text", ...), ("start", "date", date(1900, 1, 1)), ("end", "date", date(2100, 1, 1)), ("limit", "int", 5000)],
+            ["stock_data"],
+            "Price history for one ticker"
+        ),
+        NamedQuery(
+            "top_correlations",
+            "SELECT * FROM correlation_statistics WHERE p_value < $1 "
+            "ORDER BY importance_score DESC, ABS(correlation) DESC LIMIT $2",
+            [("max_p_value", "float", 0.05), ("limit", "int", 20)],
+            ["correlation_statistics"],
+            "Most important significant correlations"
+        ),
+    ]
+}
+
+
+def get_named_query(name: str) -> NamedQuery:
+    if name not in NAMED_QUERIES:
+        raise NamedQueryError(f"Unknown named query '{name}'. Available: {', '.join(sorted(NAMED_QUERIES))}")
+    return NAMED_QUERIES[name]
+
+
+def execute_named(conn, cursor, query: NamedQuery, params: Sequence[Any], timeout_ms: Optional[int] = None) -> List[Any]:
+    """Run a template on a pooled connection, preparing it on first use
+
+    Prepared statements live for the connection's session, so each template is
+    parsed and planned once per connection. If the underlying table was dropped
+    or replaced with different columns the statement is re-prepared once.
+    """
+    prepared = conn.prepared
+    for attempt in range(2):
+        set_statement_timeout(cursor, timeout_ms)
+        if query.statement not in prepared:
+            cursor.execute(query.prepare_sql())
+            prepared.add(query.statement)
+        try:
+            cursor.execute(query.execute_sql(), list(params))
+            return cursor.fetchall()
+        except InvalidSqlStatementName:
+            # Prepared statement is gone from the session
+            if attempt:
+                raise
+            conn.rollback()
+            prepared.discard(query.statement)
+        except FeatureNotSupported:
+            # Stale plan, e.g. "cached plan must not change result type" after a reload
+            if attempt:
+                raise
+            conn.rollback()
+            cursor.execute(f"DEALLOCATE {query.statement}")
+            prepared.discard(query.statement)
+    return []
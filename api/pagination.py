@@ -0,0 +1,227 @@
+import base64
+import binascii
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import json_util
+
+from cache import normalize_sql
+
+
+class PaginationError(ValueError):
+    """Raised when a query or continuation token cannot be used for keyset paging"""
+
+
+_IDENTIFIER = re.compile(r'^(?:(?:"[^"]+"|\w+)\.)?("[^"]+"|\w+)$')
+_DIRECTION = re.compile(r'^(.*?)\s+(ASC|DESC)$', re.IGNORECASE | re.DOTALL)
+_TAIL_CLAUSE = re.compile(r'\b(LIMIT|OFFSET|FETCH|FOR\s+UPDATE|FOR\s+SHARE)\b', re.IGNORECASE)
+
+
+def _top_level_positions(query: str, pattern: "re.Pattern") -> List[Tuple[int, int]]:
+    """Spans of `pattern` matches that are outside parentheses and string literals"""
+    spans = []
+    depth = 0
+    i = 0
+    while i < len(query):
+        ch = query[i]
+        if ch in ("'", '"'):
+            end = query.find(ch, i + 1)
+            while end != -1 and ch == "'" and query[end + 1:end + 2] == "'":
+                end = query.find(ch, end + 2)
+            i = len(query) if end == -1 else end + 1
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0:
+            match = pattern.match(query, i)
+            if match and (i == 0 or not (query[i - 1].isalnum() or query[i - 1] == "_")):
+                spans.append(match.span())
+                i = match.end()
+                continue
+        i += 1
+    return spans
+
+
+def _split_top_level(text: str, sep: str = ",") -> List[str]:
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts]
+
+
+def split_order_by(query: str) -> Tuple[str, List[Tuple[str, bool]]]:
+    """Split a SELECT into its body and final ORDER BY keys as (column, descending)"""
+    query = normalize_sql(query)
+    spans = _top_level_positions(query, re.compile(r'ORDER\s+BY\b', re.IGNORECASE))
+    if not spans:
+        raise PaginationError("Keyset pagination needs an ORDER BY on unique sort columns, e.g. ORDER BY date, ticker")
+
+    start, end = spans[-1]
+    body, order_clause = query[:start].rstrip(), query[end:].strip()
+    if _top_level_positions(order_clause, _TAIL_CLAUSE):
+        raise PaginationError("Remove LIMIT/OFFSET/FETCH from paginated queries; use page_size instead")
+
+    keys = []
+    for item in _split_top_level(order_clause):
+        descending = False
+        match = _DIRECTION.match(item)
+        if match:
+            item, descending = match.group(1).strip(), match.group(2).upper() == "DESC"
+        ident = _IDENTIFIER.match(item)
+        if not ident:
+            raise PaginationError(
+                f"ORDER BY item '{item}' must be a plain column name (optionally ASC/DESC) "
+                "that appears in the select list"
+            )
+        keys.append((ident.group(1), descending))
+    return body, keys
+
+
+def _keyset_predicate(keys: Sequence[Tuple[str, bool]]) -> str:
+    """WHERE clause selecting rows strictly after the bound key values"""
+    if all(not desc for _, desc in keys) or all(desc for _, desc in keys):
+        op = "<" if keys[0][1] else ">"
+        columns = ", ".join(col for col, _ in keys)
+        placeholders = ", ".join(["%s"] * len(keys))
+        # A row comparison lets PostgreSQL use a matching composite index
+        return f"({columns}) {op} ({placeholders})"
+
+    # Mixed directions: (a > x) OR (a = x AND b < y) OR ...
+    terms = []
+    for i, (col, desc) in enumerate(keys):
+        equal = [f"{prev} = %s" for prev, _ in keys[:i]]
+        terms.append("(" + " AND ".join(equal + [f"{col} {'<' if desc else '>'} %s"]) + ")")
+    return " OR ".join(terms)
+
+
+def _predicate_params(keys: Sequence[Tuple[str, bool]], values: Sequence[Any]) -> List[Any]:
+    if all(not desc for _, desc in keys) or all(desc for _, desc in keys):
+        return list(values)
+    params = []
+    for i in range(len(keys)):
+        params.extend(values[:i])
+        params.append(values[i])
+    return params
+
+
+def query_fingerprint(query: str) -> str:
+    return hashlib.sha1(normalize_sql(query).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(query: str, values: Sequence[Any]) -> str:
+    """Opaque continuation token carrying the last row's sort key"""
+    payload = {"q": query_fingerprint(query), "k": [None if v is None else str(v) for v in values]}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(query: str, token: str, key_count: int) -> List[Optional[str]]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload["k"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise PaginationError("Malformed cursor token")
+    if payload.get("q") != query_fingerprint(query) or len(values) != key_count:
+        raise PaginationError("Cursor token does not belong to this query")
+    if any(v is None for v in values):
+        raise PaginationError("Cannot resume after a NULL sort key; sort columns must be NOT NULL")
+    return values
+
+
+def build_page_query(query: str, page_size: int, token: Optional[str] = None) -> Dict[str, Any]:
+    """Rewrite a SELECT ... ORDER BY into a keyset-paginated query
+
+    Returns the SQL, bound parameters and the sort key column names. One extra
+    row is fetched to tell whether another page exists.
+    """
+    body, keys = split_order_by(query)
+    order_by = ", ".join(f"{col} {'DESC' if desc else 'ASC'}" for col, desc in keys)
+
+    params: Optional[List[Any]] = None
+    where = ""
+    if token:
+        values = decode_cursor(query, token, len(keys))
+        where = f" WHERE {_keyset_predicate(keys)}"
+        params = _predicate_params(keys, values)
+        # The driver applies %-formatting once parameters are bound
+        body = body.replace("%", "%%")
+
+    page_sql = f"SELECT * FROM ({body}) AS _page{where} ORDER BY {order_by} LIMIT {int(page_size) + 1}"
+    return {
+        "sql": page_sql,
+        "params": params,
+        # Unquoted identifiers are folded to lower case by PostgreSQL
+        "key_columns": [col.strip('"') if col.startswith('"') else col.lower() for col, _ in keys],
+    }
+
+
+# ---------------------------------------------------------------------------
+# MongoDB keyset paging
+# ---------------------------------------------------------------------------
+
+def parse_mongo_sort(sort: Optional[str]) -> List[Tuple[str, int]]:
+    """Parse a JSON sort spec like {"date": -1}; _id is appended as the tiebreaker"""
+    keys: List[Tuple[str, int]] = []
+    if sort and sort.strip():
+        try:
+            spec = json.loads(sort)
+        except ValueError as e:
+            raise PaginationError(f"Invalid JSON sort: {e}")
+        if not isinstance(spec, dict):
+            raise PaginationError('Sort must be a JSON object, e.g. {"date": -1}')
+        for field, direction in spec.items():
+            if direction not in (1, -1):
+                raise PaginationError(f"Sort direction for '{field}' must be 1 or -1")
+            keys.append((field, direction))
+    if not any(field == "_id" for field, _ in keys):
+        keys.append(("_id", keys[-1][1] if keys else 1))
+    return keys
+
+
+def mongo_keyset_filter(keys: Sequence[Tuple[str, int]], values: Sequence[Any]) -> Dict[str, Any]:
+    """Filter selecting documents strictly after `values` in `keys` order"""
+    terms = []
+    for i, (field, direction) in enumerate(keys):
+        term = {prev: values[j] for j, (prev, _) in enumerate(keys[:i])}
+        term[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        terms.append(term)
+    return terms[0] if len(terms) == 1 else {"$or": terms}
+
+
+def _lookup(document: Dict[str, Any], field: str) -> Any:
+    value: Any = document
+    for part in field.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def encode_mongo_token(scope: str, keys: Sequence[Tuple[str, int]], document: Dict[str, Any]) -> str:
+    """Opaque continuation token with the last document's sort key (types preserved)"""
+    values = [_lookup(document, field) for field, _ in keys]
+    payload = {"q": query_fingerprint(scope), "k": values}
+    raw = json_util.dumps(payload, json_options=json_util.CANONICAL_JSON_OPTIONS).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_mongo_token(scope: str, token: str, key_count: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json_util.loads(raw)
+        values = payload["k"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise PaginationError("Malformed continuation token")
+    if payload.get("q") != query_fingerprint(scope) or len(values) != key_count:
+        raise PaginationError("Continuation token does not belong to this query")
+    return values
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import math
+from datetime import date, datetime, time
+from decimal import Decimal
+from time import perf_counter
+from typing import Any, Dict, NamedTuple, Optional
+from uuid import UUID
+
+from bson import Decimal128, ObjectId, Regex, Timestamp
+from fastapi.responses import JSONResponse, Response
+
+from compression import decoded_etag
+from metrics import add_request_time
+
+# orjson is optional; without it responses fall back to the standard library encoder
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# numpy is optional here; it is only needed to recognise NumPy scalars and arrays
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+def _default(value: Any) -> Any:
+    """Encode types the JSON serializers do not handle natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal):
+        return _finite(float(value))
+    if isinstance(value, Decimal128):
+        return _finite(float(value.to_decimal()))
+    if NUMPY_AVAILABLE and isinstance(value, np.generic):
+        return _finite(value.item())
+    if NUMPY_AVAILABLE and isinstance(value, np.ndarray):
+        return _sanitize(value.tolist())
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, bytes)):
+        return value.hex() if isinstance(value, bytes) else str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Regex):
+        return value.pattern
+    if isinstance(value, Timestamp):
+        return value.as_datetime().isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _finite(value: Any) -> Any:
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _sanitize(value: Any) -> Any:
+    """NaN/Infinity -> null for the standard library fallback (orjson does this itself)"""
+    if isinstance(value, float):
+        return _finite(value)
+    if isinstance(value, dict):
+        return {k if isinstance(k, str) else str(k): _sanitize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_sanitize(v) for v in value]
+    return value
+
+
+if ORJSON_AVAILABLE:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(content: Any) -> bytes:
+        """Serialize API content to JSON bytes"""
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(content: Any) -> bytes:
+        """Serialize API content to JSON bytes"""
+        return json.dumps(
+            _sanitize(content), default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response that understands ObjectId, Decimal, datetime, NumPy scalars and NaN
+
+    Routes that return result sets should return this directly: a plain dict
+    return value is first walked by FastAPI's jsonable_encoder, which costs
+    more than the serialization itself.
+    """
+
+    def render(self, content: Any) -> bytes:
+        started = perf_counter()
+        body = dumps(content)
+        add_request_time("serialize", perf_counter() - started)
+        return body
+
+
+class RenderedJSON(NamedTuple):
+    """A serialized JSON body and its strong ETag, as kept in the result caches"""
+    body: bytes
+    etag: str
+
+
+def render_json(content: Any) -> RenderedJSON:
+    """Serialize once; the ETag is a hash of the exact bytes sent"""
+    started = perf_counter()
+    body = dumps(content)
+    add_request_time("serialize", perf_counter() - started)
+    return RenderedJSON(body, '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET/HEAD)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # Tags of compressed representations ("<hash>-gzip") name the same body
+        if candidate == "*" or decoded_etag(candidate.removeprefix("W/")) == etag:
+            return True
+    return False
+
+
+def conditional_json(if_none_match: Optional[str], rendered: RenderedJSON, headers: Optional[Dict[str, str]] = None) -> Response:
+    """200 with the rendered body, or 304 when the client already has it"""
+    headers = {**(headers or {}), "ETag": rendered.etag}
+    if etag_matches(if_none_match, rendered.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(rendered.body, media_type="application/json", headers=headers)
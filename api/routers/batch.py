@@ -0,0 +1,210 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+from typing import Annotated, Any, Dict, List, Literal, Optional, Tuple, Union
+import asyncio
+import json
+import os
+import time
+
+from bson import json_util
+from psycopg2.errors import OperationalError, QueryCanceled
+from pymongo.errors import ExecutionTimeout, OperationFailure
+
+from admission import AdmissionTimeout, QueryRejected
+from aggregation import PipelineRejected, validate_pipeline
+from cache import normalize_sql, query_cache, referenced_tables
+from database import PoolTimeout, run_in_db_thread
+from mongo import get_mongo_db
+from named_queries import NAMED_QUERIES, NamedQueryError, get_named_query
+from pagination import PaginationError, parse_mongo_sort
+from responses import dumps, render_json
+from routers.mongodb import JSON_MAX_LIMIT
+from routers.postgresql import _run_named, _run_select, validate_select
+
+router = APIRouter()
+
+BATCH_MAX_READS = int(os.getenv("BATCH_MAX_READS", "20"))
+BATCH_DEADLINE_MS = int(os.getenv("BATCH_DEADLINE_MS", "10000"))
+BATCH_MAX_DEADLINE_MS = int(os.getenv("BATCH_MAX_DEADLINE_MS", "60000"))
+# PostgreSQL reads one batch may run at once, so a single page cannot take the whole pool
+BATCH_PG_CONCURRENCY = int(os.getenv("BATCH_PG_CONCURRENCY", "4"))
+
+
+class PostgresRead(BaseModel):
+    """A SELECT (query) or a registered template (named + params)"""
+    backend: Literal["postgres"]
+    query: Optional[str] = None
+    named: Optional[str] = None
+    params: Dict[str, Any] = Field(default_factory=dict)
+    limit: int = Field(100, ge=1, le=10000)
+    cache: bool = True
+
+
+class MongoRead(BaseModel):
+    """A find (filter/projection/sort), an aggregation (pipeline) or a count"""
+    backend: Literal["mongo"]
+    collection: str
+    filter: Dict[str, Any] = Field(default_factory=dict)
+    projection: Optional[Dict[str, Any]] = None
+    sort: Optional[Dict[str, int]] = None
+    pipeline: Optional[List[Dict[str, Any]]] = None
+    count: bool = False
+    limit: int = Field(10, ge=1, le=JSON_MAX_LIMIT)
+
+
+class BatchRequest(BaseModel):
+    reads: Dict[str, Annotated[Union[PostgresRead, MongoRead], Field(discriminator="backend")]]
+    deadline_ms: int = Field(BATCH_DEADLINE_MS, ge=1, le=BATCH_MAX_DEADLINE_MS)
+
+
+class ReadFailed(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _extended_json(value: Any) -> Any:
+    """Decode Extended JSON ({"$date": ...}, {"$oid": ...}) inside a parsed body"""
+    return json_util.loads(json.dumps(value))
+
+
+async def _postgres_read(read: PostgresRead, timeout_ms: int, slots: asyncio.Semaphore):
+    if bool(read.query) == bool(read.named):
+        raise ReadFailed(400, "A postgres read needs exactly one of 'query' or 'named'")
+
+    # Same cache keys as /postgresql/query and /postgresql/named, so the dashboard shares their entries
+    if read.named:
+        named = get_named_query(read.named)
+        params = named.bind({key: str(value) for key, value in read.params.items()})
+        cache_key = ("named", read.named, tuple(params))
+        tables = named.tables
+        run = lambda timeout: _run_named(named, params, timeout)  # noqa: E731
+    else:
+        query_upper = validate_select(read.query)
+        cache_key = ("query", normalize_sql(read.query), read.limit)
+        tables = referenced_tables(read.query)
+        query = read.query if "LIMIT" in query_upper else f"{read.query} LIMIT {read.limit}"
+        run = lambda timeout: _run_select(query, timeout)  # noqa: E731
+
+    if read.cache:
+        cached = query_cache.get(cache_key)
+        if cached is not None:
+            return cached, "HIT"
+
+    generation = query_cache.generation
+    started = time.perf_counter()
+    async with slots:
+        # Time spent queued for a slot comes out of this read's statement timeout
+        remaining_ms = timeout_ms - int((time.perf_counter() - started) * 1000)
+        if remaining_ms <= 0:
+            raise asyncio.TimeoutError
+        result = render_json(await run_in_db_thread(run, remaining_ms))
+    if read.cache:
+        query_cache.set(cache_key, result, tables, size=len(result.body), generation=generation)
+    return result, "MISS" if read.cache else None
+
+
+async def _mongo_read(read: MongoRead, timeout_ms: int):
+    coll = get_mongo_db()[read.collection]
+    query = _extended_json(read.filter)
+
+    if read.count:
+        if query:
+            count = await coll.count_documents(query, maxTimeMS=timeout_ms)
+        else:
+            count = await coll.estimated_document_count(maxTimeMS=timeout_ms)
+        return render_json({"collection": read.collection, "count": count}), None
+
+    if read.pipeline is not None:
+        stages = validate_pipeline(_extended_json(read.pipeline)) + [{"$limit": read.limit}]
+        cursor = await coll.aggregate(stages, allowDiskUse=True, maxTimeMS=timeout_ms)
+    else:
+        keys = parse_mongo_sort(json.dumps(read.sort) if read.sort else None)
+        projection = _extended_json(read.projection) if read.projection else None
+        cursor = coll.find(query, projection, max_time_ms=timeout_ms).sort(keys).limit(read.limit)
+    results = await cursor.to_list()
+    return render_json({"collection": read.collection, "count": len(results), "results": results}), None
+
+
+async def _run_read(read, timeout_ms: int, slots: asyncio.Semaphore) -> Tuple[bool, bytes]:
+    """(ok, serialized entry of the results object); failures are reported, not raised"""
+    started = time.perf_counter()
+    try:
+        if isinstance(read, PostgresRead):
+            rendered, cache = await _postgres_read(read, timeout_ms, slots)
+        else:
+            rendered, cache = await _mongo_read(read, timeout_ms)
+    except ReadFailed as e:
+        return _failure(e.status_code, e.detail, started)
+    except HTTPException as e:
+        return _failure(e.status_code, str(e.detail), started)
+    except NamedQueryError as e:
+        return _failure(404 if read.named not in NAMED_QUERIES else 400, str(e), started)
+    except (PaginationError, PipelineRejected) as e:
+        return _failure(400, str(e), started)
+    except QueryRejected as e:
+        return _failure(422, str(e), started)
+    except (AdmissionTimeout, PoolTimeout) as e:
+        return _failure(503, str(e), started)
+    except (QueryCanceled, ExecutionTimeout, asyncio.TimeoutError):
+        return _failure(504, "Deadline exceeded", started)
+    except OperationalError as e:
+        return _failure(503, f"PostgreSQL is unavailable: {str(e)}", started)
+    except OperationFailure as e:
+        return _failure(400, str(e), started)
+    except Exception as e:
+        return _failure(500, str(e), started)
+
+    head = {"status": "ok", "elapsed_ms": _elapsed_ms(started)}
+    if cache:
+        head["cache"] = cache
+    # Splice the (possibly cached) body in as-is instead of decoding and re-encoding it
+    return True, dumps(head)[:-1] + b',"data":' + rendered.body + b"}"
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def _failure(status_code: int, detail: str, started: float) -> Tuple[bool, bytes]:
+    return False, dumps({"status": "error", "code": status_code, "error": detail, "elapsed_ms": _elapsed_ms(started)})
+
+
+@router.post("/batch")
+async def run_batch(batch: BatchRequest):
+    """Run several named PostgreSQL and MongoDB reads concurrently
+
+    All reads share one deadline: each gets the remaining time as its
+    statement timeout / maxTimeMS, and reads still running when it passes are
+    reported as 504. One failed read does not fail the batch; results are
+    keyed by read name, each with its own status. PostgreSQL reads share the
+    result cache with /postgresql/query and /postgresql/named.
+    """
+    if not batch.reads:
+        raise HTTPException(status_code=400, detail="A batch needs at least one read")
+    if len(batch.reads) > BATCH_MAX_READS:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_READS} reads")
+
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(BATCH_PG_CONCURRENCY)
+    tasks = {
+        name: asyncio.ensure_future(_run_read(read, batch.deadline_ms, slots))
+        for name, read in batch.reads.items()
+    }
+    done, pending = await asyncio.wait(tasks.values(), timeout=batch.deadline_ms / 1000)
+    for task in pending:
+        # PostgreSQL statements stop on their own statement timeout
+        task.cancel()
+
+    entries = []
+    failed = 0
+    for name, task in tasks.items():
+        ok, entry = task.result() if task in done else _failure(504, "Deadline exceeded", started)
+        failed += not ok
+        entries.append(dumps(name) + b":" + entry)
+
+    head = dumps({"deadline_ms": batch.deadline_ms, "elapsed_ms": _elapsed_ms(started), "failed": failed})
+    body = head[:-1] + b',"results":{' + b",".join(entries) + b"}}"
+    return Response(body, media_type="application/json")
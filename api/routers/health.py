@@ -0,0 +1,75 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from typing import Dict, Any
+import asyncio
+import os
+import time
+
+from database import get_pool, pg_connection, run_in_db_thread, table_change_listener_alive
+from mongo import get_mongo_client
+
+router = APIRouter()
+
+# Per-backend time budget for readiness checks
+READY_CHECK_TIMEOUT = float(os.getenv("READY_CHECK_TIMEOUT", "2"))
+# Backends that must be reachable for /readyz to return 200
+READY_REQUIRED_BACKENDS = [b.strip() for b in os.getenv("READY_REQUIRED_BACKENDS", "postgres,mongo").split(",") if b.strip()]
+
+_started_at = time.time()
+
+
+def _ping_postgres() -> None:
+    with pg_connection(timeout=READY_CHECK_TIMEOUT) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+
+
+async def _check(name: str, check) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), READY_CHECK_TIMEOUT)
+        status = {"status": "ok"}
+    except asyncio.TimeoutError:
+        status = {"status": "down", "error": f"no response within {READY_CHECK_TIMEOUT:g}s"}
+    except Exception as e:
+        status = {"status": "down", "error": str(e).strip()}
+    status["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return status
+
+
+def _pool_saturation() -> Dict[str, Any]:
+    stats = get_pool().stats()
+    return {
+        "size": stats["size"],
+        "in_use": stats["in_use"],
+        "max_size": stats["max_size"],
+        "saturation": round(stats["in_use"] / stats["max_size"], 3),
+        "waits": stats["waits"],
+        "timeouts": stats["timeouts"],
+    }
+
+@router.get("/healthz")
+async def healthz() -> Dict[str, Any]:
+    """Liveness: the process is up and serving; never touches a backend"""
+    return {"status": "ok", "uptime_s": round(time.time() - _started_at, 1)}
+
+@router.get("/readyz")
+async def readyz():
+    """Readiness: per-backend reachability and PostgreSQL pool saturation
+
+    Returns 503 when a backend listed in READY_REQUIRED_BACKENDS is down.
+    """
+    postgres, mongo = await asyncio.gather(
+        _check("postgres", lambda: run_in_db_thread(_ping_postgres)),
+        _check("mongo", lambda: get_mongo_client().admin.command("ping")),
+    )
+    postgres["pool"] = _pool_saturation()
+    postgres["table_change_listener"] = table_change_listener_alive()
+
+    backends = {"postgres": postgres, "mongo": mongo}
+    ready = all(backends[name]["status"] == "ok" for name in READY_REQUIRED_BACKENDS if name in backends)
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready", "backends": backends},
+        status_code=200 if ready else 503
+    )
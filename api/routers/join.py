@@ -0,0 +1,278 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+
+from psycopg2 import Error as PostgresError
+from psycopg2.errors import OperationalError, QueryCanceled, UndefinedColumn, UndefinedTable
+from pymongo.errors import ExecutionTimeout, OperationFailure
+
+from admission import AdmissionTimeout, QueryRejected
+from database import PG_MAX_STATEMENT_TIMEOUT_MS, PoolTimeout, run_in_db_thread
+from merge_join import (
+    ALIGNMENTS, JOIN_TYPES, WEEKDAYS, WEEKLY_AGGREGATES, JoinError, keyed_groups, merge_join
+)
+from mongo import get_mongo_db
+from responses import FastJSONResponse, dumps
+from routers.mongodb import MONGO_BATCH_SIZE, _parse_json_object
+from routers.postgresql import _open_stream
+from streaming import NDJSON_MEDIA_TYPE
+
+router = APIRouter()
+
+STORES = ("postgres", "mongo")
+# JSON responses are buffered, so they are capped; ndjson streams without a cap
+JOIN_JSON_MAX_ROWS = 10000
+
+
+class Source:
+    """One side of the join, parsed from "<store>:<table or collection>" plus its options"""
+
+    def __init__(self, spec: str, date_field: str, fields: Optional[str], filter: Optional[str], side: str):
+        store, _, name = spec.partition(":")
+        if store not in STORES or not name:
+            raise HTTPException(status_code=400, detail=f"{side} must look like 'postgres:<table>' or 'mongo:<collection>', got '{spec}'")
+        self.store = store
+        self.name = name
+        self.date_field = date_field
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        self.filter = _parse_json_object(filter, f"{side}_filter")
+        self.stats: Dict[str, int] = {}
+
+    def value_fields(self) -> List[str]:
+        """Fields a weekly mean/sum aggregates: the requested fields, less the date and filter keys"""
+        return [f for f in self.fields or [] if f != self.date_field and f not in self.filter]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"store": self.store, "name": self.name, "date_field": self.date_field, **self.stats}
+
+
+def _quote_ident(name: str) -> str:
+    """Double-quote an identifier; unknown names then fail in PostgreSQL instead of being injected"""
+    if not name or "\x00" in name:
+        raise HTTPException(status_code=400, detail=f"Invalid identifier '{name}'")
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _postgres_query(source: Source, start: Optional[date], end: Optional[date]) -> Tuple[str, List[Any]]:
+    """SELECT ordered by the date column, with equality filters and the date range as parameters"""
+    columns = "*"
+    if source.fields:
+        columns = ", ".join(_quote_ident(f) for f in dict.fromkeys([source.date_field, *source.fields]))
+    date_column = _quote_ident(source.date_field)
+    conditions, params = [f"{date_column} IS NOT NULL"], []
+    for column, value in source.filter.items():
+        if isinstance(value, (dict, list)):
+            raise HTTPException(status_code=400, detail="PostgreSQL filters are equality only, e.g. {\"ticker\": \"AAPL\"}")
+        conditions.append(f"{_quote_ident(column)} IS NULL" if value is None else f"{_quote_ident(column)} = %s")
+        if value is not None:
+            params.append(value)
+    if start:
+        conditions.append(f"{date_column} >= %s")
+        params.append(start)
+    if end:
+        conditions.append(f"{date_column} < %s")
+        params.append(end + timedelta(days=1))
+    query = f"SELECT {columns} FROM {_quote_ident(source.name)} WHERE {' AND '.join(conditions)} ORDER BY {date_column}"
+    return query, params
+
+
+async def _postgres_rows(source: Source, start: Optional[date], end: Optional[date], batch_size: int, timeout_ms: Optional[int]) -> AsyncIterator[Dict[str, Any]]:
+    query, params = _postgres_query(source, start, end)
+    columns, batches = await run_in_db_thread(_open_stream, query, batch_size, timeout_ms, params)
+    try:
+        while True:
+            rows = await run_in_db_thread(next, batches, None)
+            if rows is None:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
+    finally:
+        batches.close()
+
+
+def _mongo_date_range(field: str, start: Optional[date], end: Optional[date]) -> Dict[str, Any]:
+    """Range on a date field stored either as BSON dates or as ISO strings"""
+    as_string: Dict[str, Any] = {}
+    as_datetime: Dict[str, Any] = {}
+    if start:
+        as_string["$gte"] = start.isoformat()
+        as_datetime["$gte"] = datetime.combine(start, datetime.min.time())
+    if end:
+        as_string["$lt"] = (end + timedelta(days=1)).isoformat()
+        as_datetime["$lt"] = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    # Comparisons only match values of the same BSON type, so each branch selects one representation
+    return {"$or": [{field: as_string}, {field: as_datetime}]}
+
+
+async def _mongo_rows(source: Source, start: Optional[date], end: Optional[date], batch_size: int, timeout_ms: Optional[int]) -> AsyncIterator[Dict[str, Any]]:
+    query = source.filter
+    if start or end:
+        date_range = _mongo_date_range(source.date_field, start, end)
+        query = {"$and": [query, date_range]} if query else date_range
+    projection = {field: 1 for field in [source.date_field, *source.fields]} if source.fields else {"_id": 0}
+    if source.fields:
+        projection["_id"] = 0
+    cursor = get_mongo_db()[source.name].find(query, projection, max_time_ms=timeout_ms).sort(source.date_field, 1).batch_size(batch_size)
+    try:
+        async for document in cursor:
+            yield document
+    finally:
+        await cursor.close()
+
+
+def _rows(source: Source, start, end, batch_size, timeout_ms) -> AsyncIterator[Dict[str, Any]]:
+    if source.store == "postgres":
+        return _postgres_rows(source, start, end, batch_size, timeout_ms)
+    return _mongo_rows(source, start, end, batch_size, timeout_ms)
+
+
+def _prefixed(prefix: str, row: Optional[Dict[str, Any]], out: Dict[str, Any]) -> None:
+    if row:
+        for field, value in row.items():
+            out[f"{prefix}.{field}"] = value
+
+
+async def _joined_rows(merged, left_prefix: str, right_prefix: str, limit: Optional[int]) -> AsyncIterator[Dict[str, Any]]:
+    count = 0
+    async for key, left_row, right_row in merged:
+        if limit is not None and count >= limit:
+            break
+        row = {"date": key}
+        _prefixed(left_prefix, left_row, row)
+        _prefixed(right_prefix, right_row, row)
+        count += 1
+        yield row
+
+
+async def _ndjson_lines(first: Optional[Dict[str, Any]], rows: AsyncIterator[Dict[str, Any]], closers, batch_size: int):
+    """Encode joined rows as JSON lines, one chunk per batch_size rows"""
+    try:
+        if first is None:
+            return
+        chunk = [dumps(first)]
+        async for row in rows:
+            chunk.append(dumps(row))
+            if len(chunk) >= batch_size:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+    finally:
+        for close in closers:
+            await close()
+
+
+@router.get("/join")
+async def join_sources(
+    left: str = Query(..., description="Left side, e.g. postgres:stock_data or mongo:sp500"),
+    right: str = Query(..., description="Right side, e.g. mongo:depression_index"),
+    left_date: str = Query("date", description="Date column/field on the left side"),
+    right_date: str = Query("date", description="Date column/field on the right side"),
+    left_fields: Optional[str] = Query(None, description="Comma-separated fields to keep from the left side (default: all)"),
+    right_fields: Optional[str] = Query(None, description="Comma-separated fields to keep from the right side (default: all)"),
+    left_filter: Optional[str] = Query(None, description='Filter as JSON; equality only for PostgreSQL, e.g. {"ticker": "AAPL"}'),
+    right_filter: Optional[str] = Query(None, description="Filter as JSON; any MongoDB query for a mongo side"),
+    start: Optional[date] = Query(None, description="First date to include"),
+    end: Optional[date] = Query(None, description="Last date to include"),
+    how: str = Query("inner", description="Join type: inner, left or outer"),
+    align: str = Query("daily", description="Join key: daily (the date) or weekly (first day of the week)"),
+    week_start: str = Query("monday", description="First day of a week for align=weekly"),
+    weekly_agg: str = Query("last", description="How a week's rows become one: last, or the mean or sum of the numeric fields in left_fields/right_fields"),
+    fill: str = Query("none", description="none, or forward to carry a side's last row over dates it has no rows for"),
+    fill_limit_days: Optional[int] = Query(None, description="Do not carry a row forward more than this many days", ge=0),
+    limit: Optional[int] = Query(None, description=f"Maximum joined rows (json: default 1000, max {JOIN_JSON_MAX_ROWS})", ge=1),
+    format: str = Query("json", description="Response format: json or ndjson"),
+    batch_size: int = Query(MONGO_BATCH_SIZE, description="Rows fetched per round trip on each side", ge=100, le=10000),
+    timeout_ms: Optional[int] = Query(None, description="Statement timeout / maxTimeMS for each side", ge=1, le=PG_MAX_STATEMENT_TIMEOUT_MS)
+):
+    """Join a PostgreSQL table and a MongoDB collection (or any two sources) on date
+
+    Both sides are read sorted by date from a server-side cursor and merged as
+    they stream, so memory holds one fetch batch plus one date's rows per
+    side, whatever the size of the inputs. With align=weekly both sides are
+    bucketed by week first; with fill=forward a weekly series is carried
+    forward onto the daily dates of the other side. Output columns are
+    prefixed with the table/collection name (e.g. stock_data.close).
+    """
+    for value, allowed, name in (
+        (how, JOIN_TYPES, "how"), (align, ALIGNMENTS, "align"), (weekly_agg, WEEKLY_AGGREGATES, "weekly_agg"),
+        (fill, ("none", "forward"), "fill"), (format, ("json", "ndjson"), "format"), (week_start, tuple(WEEKDAYS), "week_start")
+    ):
+        if value not in allowed:
+            raise HTTPException(status_code=400, detail=f"{name} must be one of {', '.join(allowed)}")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if format == "json":
+        limit = limit or 1000
+        if limit > JOIN_JSON_MAX_ROWS:
+            raise HTTPException(status_code=400, detail=f"JSON responses are limited to {JOIN_JSON_MAX_ROWS} rows; use format=ndjson")
+
+    left_source = Source(left, left_date, left_fields, left_filter, "left")
+    right_source = Source(right, right_date, right_fields, right_filter, "right")
+    if align == "weekly" and weekly_agg != "last":
+        for source, side in ((left_source, "left"), (right_source, "right")):
+            if not source.value_fields():
+                raise HTTPException(status_code=400, detail=f"weekly_agg={weekly_agg} needs {side}_fields naming the values to aggregate")
+    left_prefix, right_prefix = left_source.name, right_source.name
+    if left_prefix == right_prefix:
+        left_prefix, right_prefix = "left", "right"
+
+    left_rows = _rows(left_source, start, end, batch_size, timeout_ms)
+    right_rows = _rows(right_source, start, end, batch_size, timeout_ms)
+    grouping = {"alignment": align, "week_start": WEEKDAYS[week_start], "weekly_aggregate": weekly_agg}
+    merged = merge_join(
+        keyed_groups(left_rows, left_date, value_fields=left_source.value_fields(), stats=left_source.stats, **grouping),
+        keyed_groups(right_rows, right_date, value_fields=right_source.value_fields(), stats=right_source.stats, **grouping),
+        how=how,
+        forward_fill=fill == "forward",
+        fill_limit_days=fill_limit_days
+    )
+    rows = _joined_rows(merged, left_prefix, right_prefix, limit)
+    closers = [rows.aclose, left_rows.aclose, right_rows.aclose]
+
+    streaming = False
+    try:
+        # Pull the first row here so that bad tables, fields and filters fail with a status code
+        first = await anext(rows, None)
+        if format == "ndjson":
+            streaming = True
+            return StreamingResponse(_ndjson_lines(first, rows, closers, batch_size), media_type=NDJSON_MEDIA_TYPE)
+        results = [first] if first is not None else []
+        results += [row async for row in rows]
+    except HTTPException:
+        raise
+    except JoinError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (UndefinedTable, UndefinedColumn) as e:
+        raise HTTPException(status_code=400, detail=e.diag.message_primary)
+    except QueryRejected as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "estimate": e.estimate})
+    except AdmissionTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except (QueryCanceled, ExecutionTimeout) as e:
+        raise HTTPException(status_code=504, detail=f"Join cancelled by timeout: {str(e).strip()}")
+    except OperationalError as e:
+        raise HTTPException(status_code=503, detail=f"PostgreSQL is unavailable: {str(e).strip()}")
+    except (OperationFailure, PostgresError) as e:
+        raise HTTPException(status_code=400, detail=f"Join failed: {str(e).strip()}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Join failed: {str(e)}")
+    finally:
+        # A streaming response closes both cursors when it finishes or the client goes away
+        if not streaming:
+            for close in closers:
+                await close()
+
+    return FastJSONResponse({
+        "left": left_source.describe(),
+        "right": right_source.describe(),
+        "how": how,
+        "align": align,
+        "fill": fill,
+        "limit": limit,
+        "count": len(results),
+        "results": results
+    })
@@ -1,26 +1,105 @@
-from fastapi import APIRouter, HTTPException, Query
-from pymongo import MongoClient
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Tuple
 import json
-from bson import ObjectId
+from bson import json_util
+from pymongo.errors import ExecutionTimeout, OperationFailure
+
+from aggregation import AGGREGATE_MAX_TIMEOUT_MS, AGGREGATE_TIMEOUT_MS, pipeline_hash, validate_pipeline
+from cache import aggregate_cache, schema_cache
+from columnar import ARROW_AVAILABLE, COLUMNAR_FORMATS, file_chunks, table_from_documents, write_batches
+from index_advisor import advise, advisor, maybe_explain
+from mongo import get_mongo_db
+from mongo_schema import SCHEMA_SAMPLE_SIZE, summarize_documents
+from pagination import (
+    PaginationError, decode_mongo_token, encode_mongo_token, mongo_keyset_filter, parse_mongo_sort
+)
+from responses import FastJSONResponse, conditional_json, render_json
+from streaming import NDJSON_MEDIA_TYPE
 
 router = APIRouter()
 
-# MongoDB connection
-mongo_client = MongoClient('mongodb://localhost:37017/db')
-mongo_db = mongo_client['db']
+# Server-side cursor batch size used when the client does not pass one
+MONGO_BATCH_SIZE = 1000
+# Upper bounds on `limit` per response format; ndjson is unbounded unless a limit is given
+JSON_MAX_LIMIT = 1000
+COLUMNAR_MAX_LIMIT = 100000
+# Aggregation results larger than this must be streamed with format=ndjson
+AGGREGATE_JSON_MAX_DOCS = 10000
+# Streamed aggregation results are cached only when they fit in this many bytes
+AGGREGATE_STREAM_CACHE_BYTES = 4 * 1024 * 1024
+
+def _parse_json_object(value: Optional[str], name: str) -> Dict[str, Any]:
+    """Parse an Extended JSON query-string parameter into a dict"""
+    if not value or not value.strip():
+        return {}
+    try:
+        parsed = json_util.loads(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON {name}: {str(e)}")
+    if not isinstance(parsed, dict):
+        raise HTTPException(status_code=400, detail=f"{name.capitalize()} must be a JSON object")
+    return parsed
+
+
+def _with_sort_fields(projection: Dict[str, Any], keys: List[Tuple[str, int]]) -> Optional[Dict[str, Any]]:
+    """Make sure the sort keys survive the projection so continuation tokens can be built"""
+    if not projection:
+        return None
+    projection = dict(projection)
+    inclusive = any(v for k, v in projection.items() if k != "_id")
+    for field, _ in keys:
+        if inclusive:
+            # Forced even when excluded explicitly ({"_id": 0}): a missing key would end paging silently
+            projection[field] = 1
+        elif field in projection and not projection[field]:
+            raise HTTPException(status_code=400, detail=f"Projection cannot exclude sort field '{field}'")
+    return projection
+
 
-class JSONEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, ObjectId):
-            return str(o)
-        return json.JSONEncoder.default(self, o)
+async def _ndjson_documents(cursor, batch_size: int):
+    """Stream documents as Extended JSON lines, one chunk per cursor batch"""
+    lines = []
+    try:
+        async for doc in cursor:
+            lines.append(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n")
+            if len(lines) >= batch_size:
+                yield "".join(lines).encode("utf-8")
+                lines = []
+        if lines:
+            yield "".join(lines).encode("utf-8")
+    finally:
+        await cursor.close()
+
+async def _ndjson_cached(cursor, batch_size: int, cache_key, collection: str, generation: int):
+    """Stream aggregation output and keep a copy for the cache while it stays small"""
+    lines, size, cacheable, chunk = [], 0, True, []
+    try:
+        async for doc in cursor:
+            line = json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n"
+            chunk.append(line)
+            if cacheable:
+                size += len(line)
+                cacheable = size <= AGGREGATE_STREAM_CACHE_BYTES
+                if cacheable:
+                    lines.append(line)
+                else:
+                    lines = []
+            if len(chunk) >= batch_size:
+                yield "".join(chunk).encode("utf-8")
+                chunk = []
+        if chunk:
+            yield "".join(chunk).encode("utf-8")
+        if cacheable:
+            aggregate_cache.set(cache_key, "".join(lines), [collection], size=size, generation=generation)
+    finally:
+        await cursor.close()
 
 @router.get("/collections")
 async def get_collections() -> List[str]:
     """Get list of available collections in MongoDB"""
     try:
-        collections = mongo_db.list_collection_names()
+        collections = await get_mongo_db().list_collection_names()
         return collections
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get collections: {str(e)}")
@@ -29,53 +108,279 @@ async def get_collections() -> List[str]:
 async def query_collection(
     collection: str,
     query: str = Query("{}", description="MongoDB query as JSON string"),
-    limit: int = Query(10, description="Maximum number of documents to return", ge=1, le=1000)
-) -> Dict[str, Any]:
-    """Query a MongoDB collection"""
+    limit: Optional[int] = Query(None, description="Maximum number of documents to return (json: default 10, max 1000)", ge=1),
+    projection: Optional[str] = Query(None, description='Fields to return as JSON, e.g. {"date": 1, "close": 1}'),
+    sort: Optional[str] = Query(None, description='Sort order as JSON, e.g. {"date": -1}; _id breaks ties'),
+    batch_size: int = Query(MONGO_BATCH_SIZE, description="Documents fetched per server round trip", ge=1, le=10000),
+    after: Optional[str] = Query(None, description="Continuation token from a previous page's next_token"),
+    format: str = Query("json", description="Response format: json, ndjson, arrow or parquet"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Query a MongoDB collection
+
+    Pages are read with an _id-based continuation token rather than skip, so
+    every page costs the same regardless of depth. With format=ndjson the
+    documents are streamed from the cursor as they arrive. JSON results are
+    not cached (collections carry no cheap change marker to fingerprint), so
+    a request matching If-None-Match still runs the whole query and the 304
+    only saves the response body.
+    """
     try:
+        if format not in ("json", "ndjson") and format not in COLUMNAR_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'. Use json, ndjson, {', '.join(COLUMNAR_FORMATS)}")
+        if format in COLUMNAR_FORMATS and not ARROW_AVAILABLE:
+            raise HTTPException(status_code=501, detail="pyarrow is not installed on the server")
+
+        if format == "json":
+            limit = limit or 10
+            if limit > JSON_MAX_LIMIT:
+                raise HTTPException(status_code=400, detail=f"JSON responses are limited to {JSON_MAX_LIMIT} documents; use format=ndjson")
+        elif format in COLUMNAR_FORMATS:
+            limit = min(limit or COLUMNAR_MAX_LIMIT, COLUMNAR_MAX_LIMIT)
+
         # Parse query
-        query_dict = json.loads(query) if query.strip() else {}
+        query_dict = _parse_json_object(query, "query")
+        projection_dict = _parse_json_object(projection, "projection")
+        keys = parse_mongo_sort(sort)
+        fields = _with_sort_fields(projection_dict, keys)
+
+        # Continuation tokens are only valid for the same collection, filter and sort
+        scope = json.dumps([collection, json_util.dumps(query_dict), keys], sort_keys=True)
+        find_filter = query_dict
+        if after:
+            keyset = mongo_keyset_filter(keys, decode_mongo_token(scope, after, len(keys)))
+            find_filter = {"$and": [query_dict, keyset]} if query_dict else keyset
 
         # Get collection
-        coll = mongo_db[collection]
+        db = get_mongo_db()
+        coll = db[collection]
+        maybe_explain(db, collection, query_dict, fields, keys, limit)
+
+        if format == "ndjson":
+            cursor = coll.find(find_filter, fields).sort(keys).batch_size(min(batch_size, limit or batch_size))
+            if limit:
+                cursor = cursor.limit(limit)
+            return StreamingResponse(_ndjson_documents(cursor, batch_size), media_type=NDJSON_MEDIA_TYPE)
 
-        # Execute query
-        cursor = coll.find(query_dict).limit(limit)
-        results = list(cursor)
+        # One extra document tells whether another page follows, so the last page carries no token
+        cursor = coll.find(find_filter, fields).sort(keys).batch_size(min(batch_size, limit + 1)).limit(limit + 1)
+        results = await cursor.to_list()
+        has_more = len(results) > limit
+        results = results[:limit]
+        next_token = encode_mongo_token(scope, keys, results[-1]) if has_more else None
 
-        # Convert ObjectId to string for JSON serialization
-        for doc in results:
-            if '_id' in doc:
-                doc['_id'] = str(doc['_id'])
+        if format in COLUMNAR_FORMATS:
+            table = table_from_documents(results)
+            result_file = write_batches(format, table.schema, table.to_batches())
+            headers = {"Content-Disposition": f"attachment; filename={collection}.{format}"}
+            if next_token:
+                headers["X-Next-Token"] = next_token
+            return StreamingResponse(file_chunks(result_file), media_type=COLUMNAR_FORMATS[format], headers=headers)
 
-        return {
+        return conditional_json(if_none_match, render_json({
             "collection": collection,
-            "query": query_dict,
+            "query": json.loads(json_util.dumps(query_dict)),
             "limit": limit,
             "count": len(results),
+            "next_token": next_token,
             "results": results
-        }
+        }))
 
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=400, detail=f"Invalid JSON query: {str(e)}")
+    except HTTPException:
+        raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
+@router.post("/aggregate/{collection}")
+async def aggregate_collection(
+    collection: str,
+    pipeline: str = Query(..., description='Aggregation pipeline as a JSON array, e.g. [{"$group": {"_id": "$Date", "n": {"$sum": 1}}}]'),
+    timeout_ms: int = Query(AGGREGATE_TIMEOUT_MS, description="Server-side time limit (maxTimeMS)", ge=1, le=AGGREGATE_MAX_TIMEOUT_MS),
+    batch_size: int = Query(MONGO_BATCH_SIZE, description="Documents fetched per server round trip", ge=1, le=10000),
+    format: str = Query("json", description="Response format: json or ndjson"),
+    cache: bool = Query(True, description="Serve and store results in the aggregation cache")
+):
+    """Run a vetted aggregation pipeline inside MongoDB
+
+    Stages are checked against an allow-list, the pipeline runs with
+    allowDiskUse and maxTimeMS, and results are cached by pipeline hash.
+    """
+    try:
+        if format not in ("json", "ndjson"):
+            raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'. Use json or ndjson")
+        try:
+            stages = validate_pipeline(json_util.loads(pipeline))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid pipeline: {str(e)}")
+
+        cache_key = ("aggregate", format, pipeline_hash(collection, stages))
+        if cache:
+            cached = aggregate_cache.get(cache_key)
+            if cached is not None:
+                if format == "ndjson":
+                    return StreamingResponse(iter([cached.encode("utf-8")]), media_type=NDJSON_MEDIA_TYPE, headers={"X-Cache": "HIT"})
+                return FastJSONResponse(cached, headers={"X-Cache": "HIT"})
+        generation = aggregate_cache.generation
+
+        coll = get_mongo_db()[collection]
+        if format == "ndjson":
+            cursor = await coll.aggregate(stages, allowDiskUse=True, maxTimeMS=timeout_ms, batchSize=batch_size)
+            if not cache:
+                return StreamingResponse(_ndjson_documents(cursor, batch_size), media_type=NDJSON_MEDIA_TYPE)
+            return StreamingResponse(
+                _ndjson_cached(cursor, batch_size, cache_key, collection, generation),
+                media_type=NDJSON_MEDIA_TYPE,
+                headers={"X-Cache": "MISS"}
+            )
+
+        # One extra document tells us the result is too large for a JSON body
+        cursor = await coll.aggregate(
+            stages + [{"$limit": AGGREGATE_JSON_MAX_DOCS + 1}],
+            allowDiskUse=True, maxTimeMS=timeout_ms, batchSize=batch_size
+        )
+        results = await cursor.to_list()
+        if len(results) > AGGREGATE_JSON_MAX_DOCS:
+            raise HTTPException(status_code=400, detail=f"JSON responses are limited to {AGGREGATE_JSON_MAX_DOCS} documents; use format=ndjson")
+
+        result = {
+            "collection": collection,
+            "pipeline_hash": cache_key[2],
+            "count": len(results),
+            "results": results
+        }
+        if cache:
+            aggregate_cache.set(cache_key, result, [collection], generation=generation)
+        return FastJSONResponse(result, headers={"X-Cache": "MISS"} if cache else None)
+
+    except HTTPException:
+        raise
+    except ExecutionTimeout:
+        raise HTTPException(status_code=504, detail=f"Aggregation exceeded maxTimeMS={timeout_ms}")
+    except OperationFailure as e:
+        raise HTTPException(status_code=400, detail=f"Aggregation failed: {e.details.get('errmsg', str(e)) if e.details else str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Aggregation failed: {str(e)}")
+
 @router.get("/collection-info/{collection}")
-async def get_collection_info(collection: str) -> Dict[str, Any]:
-    """Get information about a collection"""
+async def get_collection_info(
+    collection: str,
+    exact: bool = Query(False, description="Count documents exactly (scans the collection) instead of using collection metadata"),
+    sample_size: int = Query(SCHEMA_SAMPLE_SIZE, description="Documents drawn with $sample for the schema summary", ge=1, le=10000),
+    refresh: bool = Query(False, description="Ignore the cached summary and rebuild it")
+) -> Dict[str, Any]:
+    """Get information about a collection
+
+    The document count comes from collection metadata unless exact=true, and
+    the schema is summarized from a random $sample. Both are cached per
+    collection for MONGO_SCHEMA_CACHE_TTL seconds.
+    """
     try:
-        coll = mongo_db[collection]
-        count = coll.count_documents({})
-        sample_doc = coll.find_one()
+        coll = get_mongo_db()[collection]
+        cache_key = ("mongo-info", collection, sample_size, exact)
+        info = None if refresh else schema_cache.get(cache_key)
+        if info is not None:
+            return FastJSONResponse(info)
 
-        if sample_doc and '_id' in sample_doc:
-            sample_doc['_id'] = str(sample_doc['_id'])
+        generation = schema_cache.generation
+        if exact:
+            count = await coll.count_documents({})
+        else:
+            count = await coll.estimated_document_count()
+        sample = await (await coll.aggregate([{"$sample": {"size": sample_size}}])).to_list()
+        sample_doc = sample[0] if sample else None
 
-        return {
+        info = {
             "collection": collection,
             "document_count": count,
+            "count_is_estimate": not exact,
+            "sampled_documents": len(sample),
+            "fields": summarize_documents(sample),
             "sample_document": sample_doc
         }
+        schema_cache.set(cache_key, info, [collection], generation=generation)
+        return FastJSONResponse(info)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get collection info: {str(e)}")
+
+@router.get("/cache/stats")
+async def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the collection-info and aggregation caches"""
+    return {"collection_info": schema_cache.stats(), "aggregate": aggregate_cache.stats()}
+
+@router.post("/cache/invalidate")
+async def invalidate_cache(
+    collection: Optional[str] = Query(None, description="Collection whose cached info should be dropped; omit to clear everything")
+) -> Dict[str, Any]:
+    """Invalidate cached collection info and aggregation results, e.g. after a reload"""
+    if collection is None:
+        schema_cache.clear()
+        aggregate_cache.clear()
+        return {"invalidated": "all"}
+    schema_cache.invalidate_table(collection)
+    aggregate_cache.invalidate_table(collection)
+    return {"invalidated": collection}
+
+
+def _index_keys(spec: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """Key list from index_information(); text indexes are reported as their weighted fields"""
+    if any(value == "text" for _, value in spec["key"]):
+        return [(field, "text") for field in spec.get("weights", {})] or list(spec["key"])
+    return list(spec["key"])
+
+@router.get("/index-advice")
+async def get_index_advice(
+    collection: Optional[str] = Query(None, description="Only report this collection")
+) -> Dict[str, Any]:
+    """Sampled query plans and the indexes that would help them
+
+    A fraction of /mongodb/query requests are explained with executionStats
+    in the background; shapes that hit COLLSCAN or examine many documents per
+    document returned get an equality-sort-range compound (or text) index
+    recommendation.
+    """
+    try:
+        db = get_mongo_db()
+        report = {}
+        for name, shapes in advisor.shapes(collection).items():
+            indexes = await db[name].index_information()
+            existing = [_index_keys(spec) for spec in indexes.values()]
+            report[name] = {
+                "indexes": {index_name: [list(key) for key in keys] for index_name, keys in zip(indexes, existing)},
+                "shapes": shapes,
+                "recommendations": advise(shapes, existing),
+            }
+        return {"sampling": advisor.stats(), "collections": report}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build index advice: {str(e)}")
+
+@router.post("/index-advice/build")
+async def build_index(
+    collection: str = Query(..., description="Collection to index"),
+    keys: Optional[str] = Query(None, description='Index keys as JSON, e.g. {"Ticker": 1, "Date": 1} or {"text": "text"}; omit to build every current recommendation')
+) -> Dict[str, Any]:
+    """Build a recommended (or explicitly given) index"""
+    try:
+        coll = get_mongo_db()[collection]
+        if keys:
+            spec = _parse_json_object(keys, "keys")
+            if not spec or any(value not in (1, -1, "text") for value in spec.values()):
+                raise HTTPException(status_code=400, detail='Index keys must map field names to 1, -1 or "text"')
+            wanted = [list(spec.items())]
+        else:
+            indexes = await coll.index_information()
+            existing = [_index_keys(index) for index in indexes.values()]
+            shapes = advisor.shapes(collection)[collection]
+            wanted = [[tuple(key) for key in item["keys"]] for item in advise(shapes, existing)]
+
+        built = []
+        for index_keys in wanted:
+            built.append(await coll.create_index(index_keys))
+        return {"collection": collection, "built": built}
+    except HTTPException:
+        raise
+    except OperationFailure as e:
+        raise HTTPException(status_code=400, detail=f"Index build failed: {e.details.get('errmsg', str(e)) if e.details else str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get collection info: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Index build failed: {str(e)}")
@@ -1,26 +1,71 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from psycopg2 import connect
+from psycopg2.errors import OperationalError, QueryCanceled, UndefinedColumn
+from psycopg2 import sql
 from psycopg2.extras import RealDictCursor
 from typing import List, Dict, Any, Optional
 import re
+import uuid
+
+from admission import (
+    AdmissionTimeout, MultipleStatements, QueryRejected, admission_stats, admit_query,
+    check_single_statement
+)
+from columnar import (
+    ARROW_AVAILABLE, COLUMNAR_FORMATS, file_chunks, rows_to_batch,
+    schema_from_description, write_batches
+)
+from cache import metadata_cache, normalize_sql, query_cache, referenced_tables
+from database import (
+    POSTGRES_CONFIG, PG_MAX_STATEMENT_TIMEOUT_MS, PoolTimeout,
+    get_pool, notify_table_changed, on_table_change, pg_connection,
+    run_in_db_thread, set_statement_timeout
+)
+from named_queries import NAMED_QUERIES, NamedQuery, NamedQueryError, execute_named, get_named_query
+from pagination import PaginationError, build_page_query, encode_cursor, split_order_by
+from responses import conditional_json, render_json
+from streaming import STREAM_FORMATS, encode_stream
 
 router = APIRouter()
 
+# Drop cached results whenever a load script reports that a table was rewritten
+on_table_change(query_cache.invalidate_table)
+on_table_change(metadata_cache.invalidate_table)
+
 def get_postgres_connection():
-    """Get PostgreSQL database connection"""
-    return connect(
-        host="localhost",
-        port=45432,
-        database="db",
-        user="admin",
-        password="PassW0rd"
-    )
+    """Get a dedicated (unpooled) PostgreSQL database connection"""
+    return connect(**POSTGRES_CONFIG)
 
-@router.get("/tables")
-async def get_tables() -> List[str]:
-    """Get list of available tables in PostgreSQL"""
+def validate_select(query: str) -> str:
+    """Reject anything other than a read-only SELECT; returns the upper-cased query"""
+    # Security check - only allow SELECT queries
+    query_upper = query.strip().upper()
+    if not query_upper.startswith('SELECT'):
+        raise HTTPException(
+            status_code=400,
+            detail="Only SELECT queries are allowed for security reasons"
+        )
+
+    # EXPLAIN would only check the first of several statements
     try:
-        conn = get_postgres_connection()
+        check_single_statement(query)
+    except MultipleStatements as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Additional safety checks
+    dangerous_keywords = ['DROP', 'DELETE', 'INSERT', 'UPDATE', 'ALTER', 'CREATE', 'TRUNCATE']
+    for keyword in dangerous_keywords:
+        if re.search(r'\b' + keyword + r'\b', query_upper):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Query contains forbidden keyword: {keyword}"
+            )
+
+    return query_upper
+
+def _fetch_tables() -> List[str]:
+    with pg_connection() as conn:
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -32,98 +77,470 @@ async def get_tables() -> List[str]:
 
         tables = [row[0] for row in cursor.fetchall()]
         cursor.close()
-        conn.close()
 
-        return tables
+    return tables
+
+def _run_select(query: str, timeout_ms: Optional[int]) -> Dict[str, Any]:
+    with pg_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        set_statement_timeout(cursor, timeout_ms)
+        admit_query(cursor, query)
+        cursor.execute(query)
+        results = cursor.fetchall()
+
+        # Get column names
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+
+        cursor.close()
+
+    # RealDictRow is already a dict, so rows are returned without another copy
+    return {
+        "query": query,
+        "columns": columns,
+        "row_count": len(results),
+        "results": results
+    }
+
+def _check_key_columns(key_columns: List[str], columns: List[str]) -> None:
+    missing = [col for col in key_columns if col not in columns]
+    if missing:
+        raise PaginationError(f"ORDER BY columns must appear in the select list: {', '.join(missing)}")
+
+def _undefined_column(
+    cursor, query: str, key_columns: List[str], error: UndefinedColumn, timeout_ms: Optional[int]
+) -> PaginationError:
+    """PaginationError for an UndefinedColumn raised by a page query"""
+    # The page query orders the subquery's output, so a sort column left out
+    # of the select list is undefined there; read the select list to tell
+    cursor.connection.rollback()
+    # The rollback ended the guarded transaction; the probe gets the same timeout
+    set_statement_timeout(cursor, timeout_ms)
+    body, _ = split_order_by(query)
+    try:
+        cursor.execute(f"SELECT * FROM ({body}) AS _page LIMIT 0")
+    except UndefinedColumn:
+        # The column is missing from the query itself
+        return PaginationError(error.diag.message_primary)
+    try:
+        _check_key_columns(key_columns, [desc[0] for desc in cursor.description])
+    except PaginationError as e:
+        return e
+    return PaginationError(error.diag.message_primary)
+
+def _run_page(query: str, page_size: int, token: Optional[str], timeout_ms: Optional[int]) -> Dict[str, Any]:
+    """Fetch one keyset page and the token for the next one"""
+    page = build_page_query(query, page_size, token)
+
+    with pg_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        set_statement_timeout(cursor, timeout_ms)
+        try:
+            admit_query(cursor, page["sql"], page["params"])
+            cursor.execute(page["sql"], page["params"])
+        except UndefinedColumn as e:
+            raise _undefined_column(cursor, query, page["key_columns"], e, timeout_ms)
+        results = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        cursor.close()
+
+    has_more = len(results) > page_size
+    results = results[:page_size]
+    next_cursor = None
+    if has_more:
+        _check_key_columns(page["key_columns"], columns)
+        next_cursor = encode_cursor(query, [results[-1][col] for col in page["key_columns"]])
+
+    return {
+        "query": query,
+        "columns": columns,
+        "row_count": len(results),
+        "results": results,
+        "page_size": page_size,
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }
+
+def _run_named(query: NamedQuery, params: List[Any], timeout_ms: Optional[int]) -> Dict[str, Any]:
+    with pg_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        results = execute_named(conn, cursor, query, params, timeout_ms)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        cursor.close()
+
+    return {
+        "name": query.name,
+        "params": {param: value for (param, _, _), value in zip(query.params, params)},
+        "columns": columns,
+        "row_count": len(results),
+        "results": results
+    }
+
+class _CursorBatches:
+    """Iterates a named (server-side) cursor in fixed-size batches and returns
+    the pooled connection when exhausted, closed or garbage collected"""
+
+    def __init__(self, pool, conn, cursor, first_batch, itersize: int):
+        self.pool = pool
+        self.conn = conn
+        self.cursor = cursor
+        self.itersize = itersize
+        self._pending = first_batch
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            if self._pending is not None:
+                rows, self._pending = self._pending, None
+            else:
+                rows = self.cursor.fetchmany(self.itersize)
+        except Exception:
+            self.close(broken=True)
+            raise
+        if not rows:
+            self.close()
+            raise StopIteration
+        return rows
+
+    def close(self, broken: bool = False) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.cursor.close()
+        except Exception:
+            broken = True
+        self.pool.putconn(self.conn, close=broken)
+
+    def __del__(self):
+        self.close()
+
+def _open_stream(query: str, itersize: int, timeout_ms: Optional[int], params: Optional[List[Any]] = None):
+    """Declare a server-side cursor for the query and fetch the first batch"""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as setup:
+            set_statement_timeout(setup, timeout_ms)
+            # Streams may legitimately return millions of rows, so only cost is checked
+            admit_query(setup, query, params, check_rows=False)
+        cursor = conn.cursor(name=f"api_stream_{uuid.uuid4().hex}")
+        cursor.itersize = itersize
+        cursor.execute(query, params)
+        first_batch = cursor.fetchmany(itersize)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+    except Exception:
+        pool.putconn(conn)
+        raise
+    return columns, _CursorBatches(pool, conn, cursor, first_batch, itersize)
+
+class TableNotFound(Exception):
+    """Raised when a table does not exist in the public schema"""
+
+def _load_table_metadata(cursor, table: str) -> Dict[str, Any]:
+    """Columns and sample rows for a table (cached until the table changes)"""
+    # Get column information
+    cursor.execute("""
+        SELECT column_name, data_type, is_nullable, column_default
+        FROM information_schema.columns
+        WHERE table_name = %s AND table_schema = 'public'
+        ORDER BY ordinal_position
+    """, (table,))
+
+    columns = cursor.fetchall()
+    if not columns:
+        raise TableNotFound(table)
+
+    # Get sample data
+    cursor.execute(sql.SQL("SELECT * FROM {} LIMIT 5").format(sql.Identifier(table)))
+    sample_data = cursor.fetchall()
+
+    return {
+        "columns": [dict(col) for col in columns],
+        "sample_data": [dict(row) for row in sample_data]
+    }
+
+def _estimate_row_count(cursor, table: str) -> Dict[str, Any]:
+    """Row count estimate from planner statistics instead of a full scan"""
+    cursor.execute("""
+        SELECT c.reltuples::bigint AS reltuples,
+               s.n_live_tup,
+               GREATEST(s.last_analyze, s.last_autoanalyze) AS last_analyzed
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE n.nspname = 'public' AND c.relname = %s
+    """, (table,))
+    row = cursor.fetchone()
+    if row is None:
+        raise TableNotFound(table)
+
+    # reltuples is -1 (or 0 before PostgreSQL 14) until the table is first analyzed
+    if row["reltuples"] is not None and row["reltuples"] > 0:
+        return {"row_count": row["reltuples"], "row_count_source": "pg_class.reltuples", "last_analyzed": row["last_analyzed"]}
+    return {"row_count": row["n_live_tup"] or 0, "row_count_source": "pg_stat_user_tables.n_live_tup", "last_analyzed": row["last_analyzed"]}
+
+def _write_columnar(query: str, fmt: str, itersize: int, timeout_ms: Optional[int]):
+    """Build an Arrow IPC or Parquet file from a server-side cursor, one batch at a time"""
+    _, batches = _open_stream(query, itersize, timeout_ms)
+    try:
+        schema = schema_from_description(batches.cursor.description)
+        return write_batches(fmt, schema, (rows_to_batch(schema, rows) for rows in batches))
+    finally:
+        batches.close()
+
+def _fetch_table_info(table: str, exact: bool, timeout_ms: Optional[int]) -> Dict[str, Any]:
+    generation = metadata_cache.generation
+    metadata = metadata_cache.get(("table-meta", table))
+    exact_count = metadata_cache.get(("table-count", table)) if exact else None
+    cached = metadata is not None and (not exact or exact_count is not None)
+
+    if exact and cached:
+        count_info = {"row_count": exact_count, "row_count_source": "count"}
+    else:
+        with pg_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            set_statement_timeout(cursor, timeout_ms)
+
+            if metadata is None:
+                metadata = _load_table_metadata(cursor, table)
+                metadata_cache.set(("table-meta", table), metadata, [table], generation=generation)
+
+            if exact:
+                if exact_count is None:
+                    # Full scan, only on request; cached until the table is reloaded
+                    cursor.execute(sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(table)))
+                    exact_count = cursor.fetchone()['count']
+                    metadata_cache.set(("table-count", table), exact_count, [table], generation=generation)
+                count_info = {"row_count": exact_count, "row_count_source": "count"}
+            else:
+                count_info = _estimate_row_count(cursor, table)
+
+            cursor.close()
+
+    return {
+        "table": table,
+        **count_info,
+        "row_count_exact": exact,
+        "columns": metadata["columns"],
+        "sample_data": metadata["sample_data"]
+    }
+
+@router.get("/pool-stats")
+async def get_pool_stats() -> Dict[str, Any]:
+    """Get connection pool usage statistics"""
+    return get_pool().stats()
+
+@router.get("/admission/stats")
+async def get_admission_stats() -> Dict[str, Any]:
+    """Get admission control thresholds and counters"""
+    return admission_stats()
+
+@router.get("/cache/stats")
+async def get_cache_stats() -> Dict[str, Any]:
+    """Get query result cache hit/miss counters"""
+    return query_cache.stats()
+
+@router.post("/cache/invalidate")
+async def invalidate_cache(
+    table: Optional[str] = Query(None, description="Table whose cached results should be dropped; omit to clear everything")
+) -> Dict[str, Any]:
+    """Invalidate cached query results"""
+    if table is None:
+        query_cache.clear()
+        return {"invalidated": "all"}
+    notify_table_changed(table)
+    return {"invalidated": table.lower()}
+
+@router.get("/tables")
+async def get_tables() -> List[str]:
+    """Get list of available tables in PostgreSQL"""
+    try:
+        return await run_in_db_thread(_fetch_tables)
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=503, detail=f"PostgreSQL is unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get tables: {str(e)}")
 
 @router.post("/query")
 async def execute_query(
     query: str = Query(..., description="SQL query to execute"),
-    limit: int = Query(100, description="Maximum number of rows to return", ge=1, le=10000)
-) -> Dict[str, Any]:
-    """Execute a SQL query (SELECT only for security)"""
+    limit: Optional[int] = Query(None, description="Maximum number of rows to return (JSON defaults to 100; streaming formats are unlimited by default)", ge=1),
+    timeout_ms: Optional[int] = Query(None, description="Statement timeout in milliseconds", ge=1, le=PG_MAX_STATEMENT_TIMEOUT_MS),
+    format: str = Query("json", description="Response format: json, ndjson, csv, arrow or parquet"),
+    itersize: int = Query(2000, description="Rows fetched per round trip when streaming", ge=100, le=50000),
+    cache: bool = Query(True, description="Serve JSON results from the result cache when possible"),
+    page_size: Optional[int] = Query(None, description="Rows per page for keyset pagination (query needs ORDER BY on unique columns)", ge=1, le=10000),
+    cursor: Optional[str] = Query(None, description="Continuation token from a previous page's next_cursor"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Execute a SQL query (SELECT only for security)
+
+    With format=ndjson or format=csv the rows are streamed from a server-side
+    cursor in chunks of `itersize`, so memory stays constant regardless of the
+    result size. format=arrow (Arrow IPC file) and format=parquet return typed
+    columnar files built from the same cursor. JSON results are cached by normalized SQL and limit until
+    their TTL expires or a referenced table is reported as reloaded.
+
+    With page_size (and later cursor) the query is paged by keyset: the
+    token carries the last row's ORDER BY values and the next page resumes
+    with a WHERE predicate, so deep pages cost the same as the first.
+
+    JSON responses carry a strong ETag (hash of the body). A cached result
+    whose ETag matches If-None-Match is answered with 304 without touching
+    the database; paged and cache=false requests still run the query first.
+    """
     try:
-        # Security check - only allow SELECT queries
-        query_upper = query.strip().upper()
-        if not query_upper.startswith('SELECT'):
+        query_upper = validate_select(query)
+
+        if format != "json" and format not in STREAM_FORMATS and format not in COLUMNAR_FORMATS:
             raise HTTPException(
                 status_code=400,
-                detail="Only SELECT queries are allowed for security reasons"
+                detail=f"Unsupported format '{format}'. Use json, {', '.join(STREAM_FORMATS)}, {', '.join(COLUMNAR_FORMATS)}"
             )
 
-        # Additional safety checks
-        dangerous_keywords = ['DROP', 'DELETE', 'INSERT', 'UPDATE', 'ALTER', 'CREATE', 'TRUNCATE']
-        for keyword in dangerous_keywords:
-            if re.search(r'\b' + keyword + r'\b', query_upper):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Query contains forbidden keyword: {keyword}"
-                )
+        if format in COLUMNAR_FORMATS:
+            if not ARROW_AVAILABLE:
+                raise HTTPException(status_code=501, detail="pyarrow is not installed on the server")
+            if limit is not None and 'LIMIT' not in query_upper:
+                query += f" LIMIT {limit}"
+            result_file = await run_in_db_thread(_write_columnar, query, format, itersize, timeout_ms)
+            return StreamingResponse(
+                file_chunks(result_file),
+                media_type=COLUMNAR_FORMATS[format],
+                headers={"Content-Disposition": f"attachment; filename=query.{format}"}
+            )
 
-        conn = get_postgres_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        if format in STREAM_FORMATS:
+            if limit is not None and 'LIMIT' not in query_upper:
+                query += f" LIMIT {limit}"
+            columns, batches = await run_in_db_thread(_open_stream, query, itersize, timeout_ms)
+            return StreamingResponse(
+                encode_stream(format, columns, batches),
+                media_type=STREAM_FORMATS[format]
+            )
 
-        # Add LIMIT if not present
-        if 'LIMIT' not in query_upper:
-            query += f" LIMIT {limit}"
+        if page_size is not None or cursor is not None:
+            page = await run_in_db_thread(_run_page, query, page_size or 100, cursor, timeout_ms)
+            return conditional_json(if_none_match, render_json(page))
 
-        cursor.execute(query)
-        results = cursor.fetchall()
+        if limit is None:
+            limit = 100
+        elif limit > 10000:
+            raise HTTPException(status_code=400, detail="JSON responses are limited to 10000 rows; use format=ndjson or format=csv")
 
-        # Get column names
-        columns = list(results[0].keys()) if results else []
+        cache_key = ("query", normalize_sql(query), limit)
+        if cache:
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                return conditional_json(if_none_match, cached, {"X-Cache": "HIT"})
 
-        cursor.close()
-        conn.close()
+        tables = referenced_tables(query)
+        generation = query_cache.generation
 
-        return {
-            "query": query,
-            "columns": columns,
-            "row_count": len(results),
-            "results": [dict(row) for row in results]
-        }
+        # Add LIMIT if not present
+        if 'LIMIT' not in query_upper:
+            query += f" LIMIT {limit}"
+
+        result = render_json(await run_in_db_thread(_run_select, query, timeout_ms))
+        if cache:
+            query_cache.set(cache_key, result, tables, size=len(result.body), generation=generation)
+        return conditional_json(if_none_match, result, {"X-Cache": "MISS"} if cache else None)
 
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueryRejected as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "estimate": e.estimate})
+    except AdmissionTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except QueryCanceled as e:
+        raise HTTPException(status_code=504, detail=f"Query cancelled by statement timeout: {str(e)}")
+    except OperationalError as e:
+        # Connection refused or dropped: the database is unavailable, not the query wrong
+        raise HTTPException(status_code=503, detail=f"PostgreSQL is unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query execution failed: {str(e)}")
 
-@router.get("/table-info/{table}")
-async def get_table_info(table: str) -> Dict[str, Any]:
-    """Get information about a table"""
-    try:
-        conn = get_postgres_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+@router.get("/named")
+async def list_named_queries() -> List[Dict[str, Any]]:
+    """List the registered query templates and their parameters"""
+    return [query.describe() for query in NAMED_QUERIES.values()]
 
-        # Get column information
-        cursor.execute("""
-            SELECT column_name, data_type, is_nullable, column_default
-            FROM information_schema.columns
-            WHERE table_name = %s AND table_schema = 'public'
-            ORDER BY ordinal_position
-        """, (table,))
+@router.get("/named/{name}")
+async def run_named_query(
+    name: str,
+    request: Request,
+    timeout_ms: Optional[int] = Query(None, description="Statement timeout in milliseconds", ge=1, le=PG_MAX_STATEMENT_TIMEOUT_MS),
+    cache: bool = Query(True, description="Serve results from the result cache when possible"),
+    if_none_match: Optional[str] = Header(None)
+) -> Dict[str, Any]:
+    """Run a registered query template with bound parameters
 
-        columns = cursor.fetchall()
+    Template parameters are passed as query-string values (see /postgresql/named).
+    Each template is prepared once per pooled connection and then only executed.
+    """
+    try:
+        query = get_named_query(name)
+        params = query.bind(request.query_params)
 
-        # Get row count
-        cursor.execute(f"SELECT COUNT(*) FROM {table}")
-        row_count = cursor.fetchone()['count']
+        cache_key = ("named", name, tuple(params))
+        if cache:
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                return conditional_json(if_none_match, cached, {"X-Cache": "HIT"})
 
-        # Get sample data
-        cursor.execute(f"SELECT * FROM {table} LIMIT 5")
-        sample_data = cursor.fetchall()
+        generation = query_cache.generation
+        result = render_json(await run_in_db_thread(_run_named, query, params, timeout_ms))
+        if cache:
+            query_cache.set(cache_key, result, query.tables, size=len(result.body), generation=generation)
+        return conditional_json(if_none_match, result, {"X-Cache": "MISS"} if cache else None)
 
-        cursor.close()
-        conn.close()
+    except NamedQueryError as e:
+        status_code = 404 if name not in NAMED_QUERIES else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except QueryCanceled as e:
+        raise HTTPException(status_code=504, detail=f"Query cancelled by statement timeout: {str(e)}")
+    except OperationalError as e:
+        # Connection refused or dropped: the database is unavailable, not the query wrong
+        raise HTTPException(status_code=503, detail=f"PostgreSQL is unavailable: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Named query failed: {str(e)}")
 
-        return {
-            "table": table,
-            "row_count": row_count,
-            "columns": [dict(col) for col in columns],
-            "sample_data": [dict(row) for row in sample_data]
-        }
+@router.get("/table-info/{table}")
+async def get_table_info(
+    table: str,
+    exact: bool = Query(False, description="Run COUNT(*) instead of using the planner's row estimate"),
+    timeout_ms: Optional[int] = Query(None, description="Statement timeout in milliseconds", ge=1, le=PG_MAX_STATEMENT_TIMEOUT_MS),
+    if_none_match: Optional[str] = Header(None)
+) -> Dict[str, Any]:
+    """Get information about a table
 
+    The row count is a catalog estimate unless exact=true. Columns, sample rows
+    and exact counts are cached until the table is reported as changed.
+    """
+    try:
+        info = await run_in_db_thread(_fetch_table_info, table, exact, timeout_ms)
+        return conditional_json(if_none_match, render_json(info))
+    except TableNotFound:
+        raise HTTPException(status_code=404, detail=f"Table not found: {table}")
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except QueryCanceled as e:
+        raise HTTPException(status_code=504, detail=f"Query cancelled by statement timeout: {str(e)}")
+    except OperationalError as e:
+        # Connection refused or dropped: the database is unavailable, not the query wrong
+        raise HTTPException(status_code=503, detail=f"PostgreSQL is unavailable: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get table info: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to get table info: {str(e)}")
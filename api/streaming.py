@@ -0,0 +1,43 @@
+import csv
+import io
+from typing import Any, Iterable, Iterator, List, Sequence
+
+from responses import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+STREAM_FORMATS = {"ndjson": NDJSON_MEDIA_TYPE, "csv": CSV_MEDIA_TYPE}
+
+
+def ndjson_chunks(columns: Sequence[str], batches: Iterable[List[Sequence[Any]]]) -> Iterator[bytes]:
+    """Encode batches of row tuples as newline-delimited JSON, one chunk per batch
+
+    Rows go through responses.dumps, so values are encoded as in format=json
+    (numeric as numbers, ISO 8601 datetimes, NaN as null).
+    """
+    for rows in batches:
+        if not rows:
+            continue
+        yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def csv_chunks(columns: Sequence[str], batches: Iterable[List[Sequence[Any]]]) -> Iterator[bytes]:
+    """Encode batches of row tuples as CSV with a header line, one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def encode_stream(fmt: str, columns: Sequence[str], batches: Iterable[List[Sequence[Any]]]) -> Iterator[bytes]:
+    """Encode row batches in one of STREAM_FORMATS"""
+    if fmt == "csv":
+        return csv_chunks(columns, batches)
+    return ndjson_chunks(columns, batches)
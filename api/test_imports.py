@@ -5,9 +5,10 @@ import os
 sys.path.append('/Users/nsls/Documents/Github/Fundamentals-of-Data-Engineering/api')
 
 try:
-    from routers.mongodb import mongo_client, mongo_db
+    import asyncio
+    from mongo import get_mongo_db
     print("✓ MongoDB connection imported successfully")
-    collections = mongo_db.list_collection_names()
+    collections = asyncio.run(get_mongo_db().list_collection_names())
     print(f"✓ MongoDB collections: {collections}")
 except Exception as e:
     print(f"✗ MongoDB connection failed: {e}")
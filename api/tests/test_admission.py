@@ -0,0 +1,91 @@
+import pytest
+
+import admission
+from admission import AdmissionTimeout, MultipleStatements, QueryRejected, admit_query, check_single_statement
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT 1",
+    "SELECT 1;",
+    "SELECT 1 ;  -- done\n",
+    "SELECT 1;;",
+    "SELECT ';' AS semicolon",
+    "SELECT 'it''s; fine'",
+    "SELECT E'\\'; still a string'",
+    'SELECT 1 AS "a;b"',
+    "SELECT $$a; b$$, $tag$ ; $tag$",
+    "SELECT 1 /* ; /* nested ; */ ; */",
+    "SELECT 1 -- ; SELECT 2",
+])
+def test_single_statements_pass(query):
+    check_single_statement(query)
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT 1; SELECT count(*) FROM stock_data a, stock_data b",
+    "SELECT 1;DROP TABLE stock_data",
+    "SELECT 'a'; SELECT 'b'",
+    "SELECT 1 -- comment\n; SELECT 2",
+    # Without the E prefix a backslash does not escape the quote
+    "SELECT 'x\\'; SELECT 2",
+    "SELECT $$a$$; SELECT 2",
+])
+def test_statements_after_a_separator_are_rejected(query):
+    with pytest.raises(MultipleStatements):
+        check_single_statement(query)
+
+
+class FakeCursor:
+    """Answers EXPLAIN with a fixed plan and advisory lock attempts from a list"""
+
+    def __init__(self, total_cost, plan_rows, locks=()):
+        self.plan = [{"Plan": {"Total Cost": total_cost, "Plan Rows": plan_rows, "Node Type": "Seq Scan"}}]
+        self.locks = list(locks)
+        self.executed = []
+        self._row = None
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+        if sql.startswith("EXPLAIN"):
+            self._row = (self.plan,)
+        else:
+            self._row = (self.locks.pop(0) if self.locks else False,)
+
+    def fetchone(self):
+        return self._row
+
+
+def test_cheap_query_is_admitted_without_a_slot():
+    estimate = admit_query(FakeCursor(10, 5), "SELECT 1")
+    assert estimate == {"total_cost": 10, "plan_rows": 5, "node_type": "Seq Scan", "heavy": False}
+
+
+def test_estimates_over_the_limits_are_rejected(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_MAX_COST", 1000)
+    monkeypatch.setattr(admission, "ADMISSION_MAX_ROWS", 100)
+    with pytest.raises(QueryRejected, match="cost"):
+        admit_query(FakeCursor(5000, 1), "SELECT 1")
+    with pytest.raises(QueryRejected, match="rows"):
+        admit_query(FakeCursor(10, 500), "SELECT 1")
+    # Streams skip the row estimate
+    assert admit_query(FakeCursor(10, 500), "SELECT 1", check_rows=False)["heavy"] is False
+
+
+def test_heavy_query_takes_a_free_slot(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_HEAVY_COST", 100)
+    monkeypatch.setattr(admission, "ADMISSION_HEAVY_SLOTS", 2)
+    cursor = FakeCursor(500, 1, locks=[False, True])
+    assert admit_query(cursor, "SELECT 1")["slot"] == 1
+
+
+def test_heavy_query_times_out_when_slots_stay_busy(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_HEAVY_COST", 100)
+    with pytest.raises(AdmissionTimeout):
+        admit_query(FakeCursor(500, 1), "SELECT 1", queue_timeout=0)
+
+
+def test_multiple_statements_are_never_explained():
+    cursor = FakeCursor(10, 5)
+    with pytest.raises(MultipleStatements):
+        admit_query(cursor, "SELECT 1; SELECT 2")
+    assert cursor.executed == []
@@ -0,0 +1,57 @@
+import pytest
+
+from aggregation import AGGREGATE_MAX_STAGES, PipelineRejected, pipeline_hash, validate_pipeline
+
+
+def test_allowed_pipeline_is_returned_unchanged():
+    pipeline = [
+        {"$match": {"Ticker": "AAPL"}},
+        {"$group": {"_id": "$Ticker", "avg": {"$avg": "$Close"}}},
+        {"$sort": {"avg": -1}},
+        {"$facet": {"top": [{"$limit": 5}], "count": [{"$count": "n"}]}},
+    ]
+    assert validate_pipeline(pipeline) is pipeline
+
+
+@pytest.mark.parametrize("stage", [
+    {"$out": "copy"},
+    {"$merge": {"into": "copy"}},
+    {"$lookup": {"from": "other", "localField": "a", "foreignField": "b", "as": "c"}},
+    {"$unionWith": "other"},
+    {"$collStats": {}},
+])
+def test_stages_outside_the_allow_list_are_rejected(stage):
+    with pytest.raises(PipelineRejected, match="is not allowed"):
+        validate_pipeline([stage])
+
+
+@pytest.mark.parametrize("pipeline", [
+    [{"$match": {"$where": "this.a > 1"}}],
+    [{"$group": {"_id": None, "x": {"$accumulator": {}}}}],
+    [{"$project": {"x": {"$cond": [True, {"$function": {"body": "", "args": [], "lang": "js"}}, 0]}}}],
+    [{"$facet": {"a": [{"$match": {"$where": "1"}}]}}],
+])
+def test_javascript_operators_are_rejected_at_any_depth(pipeline):
+    with pytest.raises(PipelineRejected, match="is not allowed"):
+        validate_pipeline(pipeline)
+
+
+@pytest.mark.parametrize("pipeline", [
+    {"$match": {}},
+    [],
+    [{"$match": {}, "$limit": 1}],
+    [{"$facet": {"a": [{"$facet": {"b": []}}]}}],
+    [{"$facet": {"a": [{"$out": "copy"}]}}],
+    [{"$limit": 1}] * (AGGREGATE_MAX_STAGES + 1),
+])
+def test_malformed_pipelines_are_rejected(pipeline):
+    with pytest.raises(PipelineRejected):
+        validate_pipeline(pipeline)
+
+
+def test_pipeline_hash_keeps_key_order():
+    by_date = [{"$sort": {"date": 1, "ticker": 1}}]
+    by_ticker = [{"$sort": {"ticker": 1, "date": 1}}]
+    assert pipeline_hash("sp500", by_date) == pipeline_hash("sp500", [{"$sort": {"date": 1, "ticker": 1}}])
+    assert pipeline_hash("sp500", by_date) != pipeline_hash("sp500", by_ticker)
+    assert pipeline_hash("sp500", by_date) != pipeline_hash("rainfall", by_date)
@@ -0,0 +1,106 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, Header
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import compression
+from compression import CompressionMiddleware, choose_encoding, decoded_etag, encoded_etag
+from responses import conditional_json, etag_matches, render_json
+
+ROWS = {"results": [{"id": i, "name": f"row {i}"} for i in range(200)]}
+
+
+@pytest.mark.parametrize("header, zstd, expected", [
+    ("gzip", True, "gzip"),
+    ("gzip, zstd", True, "zstd"),
+    ("gzip, zstd", False, "gzip"),
+    ("zstd;q=0.5, gzip;q=0.8", True, "gzip"),
+    ("gzip;q=0", True, None),
+    ("*", True, "zstd"),
+    ("br", True, None),
+    ("identity", True, None),
+])
+def test_choose_encoding(monkeypatch, header, zstd, expected):
+    monkeypatch.setattr(compression, "ZSTD_AVAILABLE", zstd)
+    assert choose_encoding(header) == expected
+
+
+def test_encoded_etags():
+    assert encoded_etag('"abc"', "gzip") == '"abc-gzip"'
+    assert encoded_etag('W/"abc"', "gzip") == 'W/"abc"'
+    assert decoded_etag('"abc-zstd"') == '"abc"'
+    assert decoded_etag('"abc"') == '"abc"'
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", "abc-gzip"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, min_bytes=1024)
+
+    @app.get("/rows")
+    async def rows(if_none_match: str = Header(None)):
+        return conditional_json(if_none_match, render_json(ROWS))
+
+    @app.get("/small")
+    async def small(if_none_match: str = Header(None)):
+        return conditional_json(if_none_match, render_json({"ok": True}))
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"line {i}\n".encode()
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def test_compressed_response_gets_its_own_etag(client):
+    plain = client.get("/rows", headers={"Accept-Encoding": "identity"})
+    zipped = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+    assert plain.headers.get("content-encoding") is None
+    assert plain.headers["vary"] == "Accept-Encoding"
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["vary"] == "Accept-Encoding"
+    assert zipped.headers["etag"] == encoded_etag(plain.headers["etag"], "gzip")
+    assert zipped.json() == plain.json() == ROWS
+
+
+def test_either_etag_revalidates(client):
+    zipped = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+    not_modified = client.get("/rows", headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    # The 304 repeats the tag the client holds
+    assert not_modified.headers["etag"] == zipped.headers["etag"]
+
+    plain_etag = decoded_etag(zipped.headers["etag"])
+    not_modified = client.get("/rows", headers={"Accept-Encoding": "identity", "If-None-Match": plain_etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == plain_etag
+
+
+def test_small_responses_are_sent_as_is(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert response.headers.get("content-encoding") is None
+    assert not response.headers["etag"].endswith('-gzip"')
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_streamed_responses_are_compressed_chunk_by_chunk(client):
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw) == b"line 0\nline 1\nline 2\n"
@@ -0,0 +1,30 @@
+from index_advisor import QueryAdvisor, query_shape
+
+
+def _shape(field):
+    return query_shape({field: 1}, [])
+
+
+def test_least_recently_seen_shapes_are_evicted():
+    advisor = QueryAdvisor(sample_rate=0, max_shapes=2)
+    advisor.record_query("a", _shape("x"))
+    advisor.record_query("b", _shape("y"))
+    # Seeing "x" again keeps it; "y" is now the oldest
+    advisor.record_query("a", _shape("x"))
+    advisor.record_query("a", _shape("z"))
+
+    shapes = advisor.shapes()
+    assert [entry["shape"]["equality"] for entry in shapes["a"]] == [["x"], ["z"]]
+    assert "b" not in shapes
+    assert advisor.shapes("b") == {"b": []}
+    assert advisor.stats()["evictions"] == 1
+
+
+def test_explain_for_an_evicted_shape_is_dropped():
+    advisor = QueryAdvisor(sample_rate=1, max_concurrency=1, max_shapes=1)
+    assert advisor.record_query("a", _shape("x"))
+    advisor.record_query("a", _shape("y"))
+    summary = {"collscan": True, "docs_examined": 10, "returned": 1, "stages": ["COLLSCAN"]}
+    advisor.record_explain("a", _shape("x"), summary)
+    assert advisor.stats()["running"] == 0
+    assert [entry["explained"] for entry in advisor.shapes("a")["a"]] == [0]
@@ -0,0 +1,118 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from merge_join import JoinError, align_date, keyed_groups, merge_join, reduce_week, to_date
+
+
+async def _stream(rows):
+    for row in rows:
+        yield row
+
+
+def _join(left, right, **options):
+    grouping = options.pop("grouping", {})
+
+    async def collect():
+        merged = merge_join(
+            keyed_groups(_stream(left), "date", **grouping),
+            keyed_groups(_stream(right), "date", **grouping),
+            **options
+        )
+        return [
+            (key.isoformat(), left_row and left_row["v"], right_row and right_row["v"])
+            async for key, left_row, right_row in merged
+        ]
+
+    return asyncio.run(collect())
+
+
+LEFT = [{"date": "2014-01-01", "v": "a1"}, {"date": "2014-01-02", "v": "a2"}, {"date": "2014-01-04", "v": "a4"}]
+RIGHT = [{"date": "2014-01-02", "v": "b2"}, {"date": "2014-01-03", "v": "b3"}]
+
+
+def test_to_date_and_weekly_alignment():
+    assert to_date("2014-01-02T10:00:00") == date(2014, 1, 2)
+    assert to_date("not a date") is None
+    # 2014-01-02 was a Thursday
+    assert align_date(date(2014, 1, 2), "weekly") == date(2013, 12, 30)
+    assert align_date(date(2014, 1, 2), "weekly", week_start=6) == date(2013, 12, 29)
+    assert align_date(date(2014, 1, 2), "daily") == date(2014, 1, 2)
+
+
+@pytest.mark.parametrize("how, expected", [
+    ("inner", [("2014-01-02", "a2", "b2")]),
+    ("left", [("2014-01-01", "a1", None), ("2014-01-02", "a2", "b2"), ("2014-01-04", "a4", None)]),
+    ("outer", [
+        ("2014-01-01", "a1", None), ("2014-01-02", "a2", "b2"),
+        ("2014-01-03", None, "b3"), ("2014-01-04", "a4", None),
+    ]),
+])
+def test_join_types(how, expected):
+    assert _join(LEFT, RIGHT, how=how) == expected
+
+
+def test_duplicate_keys_give_the_cross_product():
+    left = [{"date": "2014-01-02", "v": "a"}, {"date": "2014-01-02", "v": "b"}]
+    right = [{"date": "2014-01-02", "v": "x"}, {"date": "2014-01-02", "v": "y"}]
+    assert _join(left, right) == [
+        ("2014-01-02", "a", "x"), ("2014-01-02", "a", "y"),
+        ("2014-01-02", "b", "x"), ("2014-01-02", "b", "y"),
+    ]
+
+
+def test_forward_fill_carries_the_last_row():
+    weekly = [{"date": "2014-01-01", "v": "w1"}, {"date": "2014-01-08", "v": "w2"}]
+    daily = [{"date": f"2014-01-{day:02d}", "v": f"d{day}"} for day in (1, 2, 3, 8, 9)]
+    assert _join(daily, weekly, how="left", forward_fill=True) == [
+        ("2014-01-01", "d1", "w1"), ("2014-01-02", "d2", "w1"), ("2014-01-03", "d3", "w1"),
+        ("2014-01-08", "d8", "w2"), ("2014-01-09", "d9", "w2"),
+    ]
+
+
+def test_forward_fill_respects_the_limit():
+    weekly = [{"date": "2014-01-01", "v": "w1"}]
+    daily = [{"date": "2014-01-02", "v": "d2"}, {"date": "2014-01-05", "v": "d5"}]
+    assert _join(daily, weekly, how="left", forward_fill=True, fill_limit_days=2) == [
+        ("2014-01-02", "d2", "w1"), ("2014-01-05", "d5", None),
+    ]
+    # An inner join drops dates the carried row no longer reaches
+    assert _join(daily, weekly, forward_fill=True, fill_limit_days=2) == [("2014-01-02", "d2", "w1")]
+
+
+def test_weekly_alignment_reduces_each_week_to_one_row():
+    left = [{"date": "2014-01-06", "v": "mon"}, {"date": "2014-01-10", "v": "fri"}]
+    right = [{"date": "2014-01-08", "v": "wed"}]
+    assert _join(left, right, grouping={"alignment": "weekly"}) == [("2014-01-06", "fri", "wed")]
+
+
+def test_reduce_week_aggregates_only_value_fields():
+    rows = [
+        {"date": "2014-01-06", "stock_id": 7, "ticker": "AAPL", "close": 10},
+        {"date": "2014-01-07", "stock_id": 7, "ticker": "AAPL", "close": 14},
+    ]
+    assert reduce_week(rows, "mean", ["close"]) == {"date": "2014-01-06", "stock_id": 7, "ticker": "AAPL", "close": 12.0}
+    assert reduce_week(rows, "sum", ["close"])["close"] == 24.0
+    assert reduce_week(rows, "last", ["close"]) == rows[-1]
+
+
+def test_reduce_week_returns_floats_for_single_row_weeks():
+    reduced = reduce_week([{"date": "2014-01-06", "close": 10}], "mean", ["close"])
+    assert reduced["close"] == 10.0 and isinstance(reduced["close"], float)
+
+
+def test_unsorted_input_is_rejected():
+    with pytest.raises(JoinError, match="not sorted"):
+        _join([{"date": "2014-01-02"}, {"date": "2014-01-01"}], [])
+
+
+def test_rows_without_a_date_are_skipped_and_counted():
+    stats = {}
+
+    async def collect():
+        rows = _stream([{"date": None}, {"date": "2014-01-01"}, {"date": "bad"}])
+        return [key async for key, _ in keyed_groups(rows, "date", stats=stats)]
+
+    assert asyncio.run(collect()) == [date(2014, 1, 1)]
+    assert stats == {"rows": 3, "skipped": 2}
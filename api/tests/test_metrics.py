@@ -0,0 +1,87 @@
+import math
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+from metrics import Gauge, Histogram, MetricsMiddleware, add_request_time, render_metrics
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram("t_seconds", "Test latency", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+    assert list(histogram.render()) == [
+        "# HELP t_seconds Test latency",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{route="/a",le="0.1"} 2',
+        't_seconds_bucket{route="/a",le="1.0"} 3',
+        't_seconds_bucket{route="/a",le="+Inf"} 4',
+        't_seconds_sum{route="/a"} 3.65',
+        't_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_histogram_series_are_sorted_and_labels_escaped():
+    histogram = Histogram("t", "Test", ["path"], buckets=(1,))
+    histogram.observe(0, 'b"\\\n')
+    histogram.observe(0, "a")
+    lines = [line for line in histogram.render() if "_count" in line]
+    assert lines == ['t_count{path="a"} 1', 't_count{path="b\\"\\\\\\n"} 1']
+
+
+def test_unlabelled_histogram_and_gauge():
+    histogram = Histogram("h", "Test", buckets=(1,))
+    histogram.observe(2)
+    assert 'h_bucket{le="+Inf"} 1' in list(histogram.render())
+    assert "h_count 1" in list(histogram.render())
+
+    gauge = Gauge("g", "Test gauge")
+    gauge.inc(3)
+    gauge.dec()
+    assert list(gauge.render()) == ["# HELP g Test gauge", "# TYPE g gauge", "g 2.0"]
+
+
+def test_number_formatting():
+    assert metrics._number(math.inf) == "+Inf"
+    assert metrics._number(-math.inf) == "-Inf"
+    assert metrics._number(3) == "3"
+    assert metrics._number(0.25) == "0.25"
+
+
+def test_render_metrics_skips_failing_collectors(monkeypatch):
+    def broken():
+        raise ConnectionError("database down")
+
+    monkeypatch.setattr(metrics, "_collectors", [broken, lambda: [("t_pool_size", "gauge", "Pool size", 4)]])
+    text = render_metrics()
+    assert text.endswith("\n")
+    assert "# TYPE api_http_request_duration_seconds histogram" in text
+    assert "# HELP t_pool_size Pool size\n# TYPE t_pool_size gauge\nt_pool_size 4\n" in text
+
+
+def test_middleware_labels_requests_by_route_template(monkeypatch):
+    latency = Histogram("t_latency", "Test", ["method", "route", "status"])
+    backend = Histogram("t_backend", "Test", ["method", "route", "backend"])
+    monkeypatch.setattr(metrics, "REQUEST_LATENCY", latency)
+    monkeypatch.setattr(metrics, "REQUEST_BACKEND_TIME", backend)
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item}")
+    async def item(item: str):
+        add_request_time("postgres", 0.002)
+        return {"item": item}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+
+    counts = [line for line in latency.render() if "_count" in line]
+    assert counts == [
+        't_latency_count{method="GET",route="/items/{item}",status="200"} 2',
+        't_latency_count{method="GET",route="unmatched",status="404"} 1',
+    ]
+    assert 't_backend_count{method="GET",route="/items/{item}",backend="postgres"} 2' in list(backend.render())
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import mongo
+from benchmarks.local_backends import FakeMongoClient
+from main import app
+from pagination import (
+    PaginationError, decode_mongo_token, encode_mongo_token, mongo_keyset_filter, parse_mongo_sort
+)
+
+
+def test_parse_mongo_sort_appends_id_tiebreaker():
+    assert parse_mongo_sort(None) == [("_id", 1)]
+    assert parse_mongo_sort('{"date": -1}') == [("date", -1), ("_id", -1)]
+    assert parse_mongo_sort('{"_id": -1, "date": 1}') == [("_id", -1), ("date", 1)]
+    with pytest.raises(PaginationError):
+        parse_mongo_sort('{"date": 2}')
+    with pytest.raises(PaginationError):
+        parse_mongo_sort("[1]")
+
+
+def test_mongo_keyset_filter():
+    assert mongo_keyset_filter([("_id", 1)], [3]) == {"_id": {"$gt": 3}}
+    assert mongo_keyset_filter([("date", -1), ("_id", -1)], ["d", 3]) == {"$or": [
+        {"date": {"$lt": "d"}},
+        {"date": "d", "_id": {"$lt": 3}},
+    ]}
+
+
+def test_mongo_token_preserves_bson_types():
+    keys = [("Date", 1), ("meta.rank", -1), ("_id", 1)]
+    oid = ObjectId()
+    document = {"_id": oid, "Date": datetime(2014, 1, 2), "meta": {"rank": 4}}
+    token = encode_mongo_token("sp500|{}", keys, document)
+    assert decode_mongo_token("sp500|{}", token, 3) == [datetime(2014, 1, 2), 4, oid]
+    with pytest.raises(PaginationError, match="does not belong"):
+        decode_mongo_token("other|{}", token, 3)
+    with pytest.raises(PaginationError, match="Malformed"):
+        decode_mongo_token("sp500|{}", "%%%", 3)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Several documents share a date, so paging has to fall back on _id
+    frame = pd.DataFrame({
+        "date": ["2014-01-01", "2014-01-01", "2014-01-02", "2014-01-02", "2014-01-03", "2014-01-03", "2014-01-04"],
+        "close": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+    })
+    monkeypatch.setattr(mongo, "_client", FakeMongoClient({"prices": frame}))
+    return TestClient(app)
+
+
+def _pages(client, **params):
+    pages, after = [], None
+    while True:
+        response = client.get("/mongodb/query/prices", params={**params, **({"after": after} if after else {})})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages.append(body["results"])
+        after = body["next_token"]
+        if after is None:
+            return pages
+
+
+@pytest.mark.parametrize("projection", [None, '{"date": 1, "close": 1}', '{"date": 1, "_id": 0}'])
+def test_pages_cover_every_document_once(client, projection):
+    params = {"limit": 3, "sort": '{"date": 1}'}
+    if projection:
+        params["projection"] = projection
+    pages = _pages(client, **params)
+    # The last page is short and carries no token
+    assert [len(page) for page in pages] == [3, 3, 1]
+    dates = [doc["date"] for page in pages for doc in page]
+    assert dates == sorted(dates)
+    if projection is None:
+        assert sorted(doc["close"] for page in pages for doc in page) == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+
+
+def test_no_token_when_the_last_page_is_full(client):
+    pages = _pages(client, limit=7)
+    assert [len(page) for page in pages] == [7]
+
+
+def test_projection_excluding_a_sort_key_is_rejected(client):
+    response = client.get("/mongodb/query/prices", params={"limit": 3, "projection": '{"_id": 0}'})
+    assert response.status_code == 400
@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import pytest
+
+from pagination import PaginationError, build_page_query, decode_cursor, encode_cursor, split_order_by
+
+QUERY = "SELECT date, ticker, close FROM stock_data ORDER BY date, ticker"
+
+
+def test_split_order_by_keys_and_directions():
+    body, keys = split_order_by("SELECT a, b FROM t ORDER BY a DESC, t.\"B\"")
+    assert body == "SELECT a, b FROM t"
+    assert keys == [("a", True), ('"B"', False)]
+
+
+def test_split_order_by_ignores_nested_order_by():
+    with pytest.raises(PaginationError):
+        split_order_by("SELECT * FROM (SELECT a FROM t ORDER BY a) s")
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT a FROM t",
+    "SELECT a FROM t ORDER BY a LIMIT 10",
+    "SELECT a FROM t ORDER BY lower(a)",
+])
+def test_split_order_by_rejects_unpageable_queries(query):
+    with pytest.raises(PaginationError):
+        split_order_by(query)
+
+
+def test_cursor_round_trip():
+    token = encode_cursor(QUERY, ["2014-01-02", "AAPL"])
+    assert decode_cursor(QUERY, token, 2) == ["2014-01-02", "AAPL"]
+    # Whitespace and case differences normalize to the same query
+    assert decode_cursor(QUERY.replace(" ", "  "), token, 2) == ["2014-01-02", "AAPL"]
+
+
+def test_cursor_rejects_other_query_and_garbage():
+    token = encode_cursor(QUERY, ["2014-01-02", "AAPL"])
+    with pytest.raises(PaginationError, match="does not belong"):
+        decode_cursor(QUERY + " DESC", token, 2)
+    with pytest.raises(PaginationError, match="does not belong"):
+        decode_cursor(QUERY, token, 3)
+    with pytest.raises(PaginationError, match="Malformed"):
+        decode_cursor(QUERY, "not a token!", 2)
+
+
+def test_cursor_rejects_null_sort_key():
+    token = encode_cursor(QUERY, ["2014-01-02", None])
+    with pytest.raises(PaginationError, match="NULL"):
+        decode_cursor(QUERY, token, 2)
+
+
+def test_build_page_query_first_and_next_page():
+    first = build_page_query(QUERY, 50)
+    assert first["sql"].endswith("ORDER BY date ASC, ticker ASC LIMIT 51")
+    assert first["params"] is None
+    assert first["key_columns"] == ["date", "ticker"]
+
+    page = build_page_query(QUERY, 50, encode_cursor(QUERY, ["2014-01-02", "AAPL"]))
+    assert "WHERE (date, ticker) > (%s, %s)" in page["sql"]
+    assert page["params"] == ["2014-01-02", "AAPL"]
+
+
+def test_build_page_query_mixed_directions():
+    query = "SELECT a, b FROM t ORDER BY a DESC, b"
+    page = build_page_query(query, 10, encode_cursor(query, [5, 7]))
+    assert "WHERE (a < %s) OR (a = %s AND b > %s)" in page["sql"]
+    # Key values travel as text and are cast by PostgreSQL
+    assert page["params"] == ["5", "5", "7"]
+
+
+class ProbeCursor:
+    """Records statements; the LIMIT 0 probe reports the subquery's columns"""
+
+    def __init__(self, columns):
+        self.executed = []
+        self.description = [(name,) for name in columns]
+        self.connection = self
+
+    def rollback(self):
+        self.executed.append("ROLLBACK")
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+
+def test_select_list_probe_runs_under_the_statement_timeout():
+    from routers.postgresql import _undefined_column
+
+    cursor = ProbeCursor(["date", "close"])
+    error = SimpleNamespace(diag=SimpleNamespace(message_primary='column "ticker" does not exist'))
+    result = _undefined_column(cursor, QUERY, ["date", "ticker"], error, 250)
+    assert "ticker" in str(result)
+    assert cursor.executed[0] == "ROLLBACK"
+    assert cursor.executed[1].startswith("SET LOCAL statement_timeout")
+    assert cursor.executed[2].endswith("LIMIT 0")
@@ -0,0 +1,25 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+from database import PostgresPool
+from main import app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Nothing listens on port 1, so every connection attempt is refused
+    pool = PostgresPool(min_size=0, max_size=2, host="127.0.0.1", port=1, connect_timeout=2)
+    monkeypatch.setattr(database, "_pool", pool)
+    yield TestClient(app)
+    pool.close()
+
+
+def test_query_returns_503_when_postgres_is_down(client):
+    response = client.post("/postgresql/query", params={"query": "SELECT 1", "cache": "false"})
+    assert response.status_code == 503
+    assert "unavailable" in response.json()["detail"]
+
+
+def test_table_list_returns_503_when_postgres_is_down(client):
+    assert client.get("/postgresql/tables").status_code == 503
@@ -0,0 +1,21 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from streaming import csv_chunks, ndjson_chunks
+
+
+def test_ndjson_encodes_values_like_json_responses():
+    batches = [[(Decimal("123.45"), datetime(2014, 1, 2, 9, 30), float("nan"))], [], [(1, None, 2.5)]]
+    chunks = list(ndjson_chunks(["close", "at", "ratio"], batches))
+    assert len(chunks) == 2
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"close": 123.45, "at": "2014-01-02T09:30:00", "ratio": None},
+        {"close": 1, "at": None, "ratio": 2.5},
+    ]
+
+
+def test_csv_has_one_header_and_a_chunk_per_batch():
+    chunks = list(csv_chunks(["a", "b"], [[(1, "x")], [(2, "y,z")]]))
+    assert chunks == [b"a,b\r\n1,x\r\n", b'2,"y,z"\r\n']
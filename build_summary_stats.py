@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Build the summary-statistics store read by the Flask dashboard
+Profiles every CSV in dataset/ and cleaned_data/ (per-column count, mean,
+std and quantiles, date coverage, first/latest values and a short preview)
+and writes it as one compact JSON file, so the web pages never load the
+full datasets.
+
+OUTPUT: dataset/summary_stats.json (override with SUMMARY_STORE_PATH)
+"""
+
+import glob
+import json
+import math
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+SOURCE_DIRS = ['dataset', 'cleaned_data']
+SUMMARY_STORE_PATH = os.getenv('SUMMARY_STORE_PATH', os.path.join('dataset', 'summary_stats.json'))
+STORE_VERSION = 1
+# Rows kept for the data preview tables
+PREVIEW_ROWS = 20
+
+QUANTILES = {'p25': 0.25, 'p50': 0.5, 'p75': 0.75}
+
+
+def _json_value(value):
+    """Plain JSON value for a pandas/numpy scalar (NaN and NaT become None)"""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _record(row):
+    return {column: _json_value(value) for column, value in row.items()}
+
+
+def _date_column(df):
+    for column in df.columns:
+        if column.lower() == 'date':
+            return column
+    return None
+
+
+def column_stats(series):
+    """count/missing/unique for every column, plus mean, std and quantiles for numeric ones"""
+    count = int(series.count())
+    stats = {
+        'dtype': str(series.dtype),
+        'count': count,
+        'missing': int(len(series) - count),
+        'missing_pct': round((len(series) - count) / len(series) * 100, 2) if len(series) else 0.0,
+        'n_unique': int(series.nunique()),
+    }
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.dropna()
+        stats['mean'] = _json_value(values.mean())
+        stats['std'] = _json_value(values.std())
+        stats['min'] = _json_value(values.min())
+        for key, q in QUANTILES.items():
+            stats[key] = _json_value(values.quantile(q))
+        stats['max'] = _json_value(values.max())
+    return stats
+
+
+def summarize_dataset(path):
+    """Store entry for one CSV file"""
+    df = pd.read_csv(path)
+    date_column = _date_column(df)
+    coverage = None
+    if date_column is not None:
+        df[date_column] = pd.to_datetime(df[date_column], errors='coerce')
+        df = df.sort_values(date_column, kind='stable').reset_index(drop=True)
+        dates = df[date_column].dropna()
+        if len(dates):
+            coverage = {
+                'start': _json_value(dates.iloc[0]),
+                'end': _json_value(dates.iloc[-1]),
+                'dates': int(dates.nunique()),
+                'span_days': int((dates.iloc[-1] - dates.iloc[0]).days) + 1,
+            }
+
+    numeric = df.select_dtypes(include=[np.number]).columns
+    categorical = df.select_dtypes(include=['object', 'category']).columns
+    stat = os.stat(path)
+    return {
+        'source': path.replace(os.sep, '/'),
+        'modified': datetime.fromtimestamp(stat.st_mtime, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'size_bytes': stat.st_size,
+        'rows': len(df),
+        'columns': len(df.columns),
+        'numeric_columns': len(numeric),
+        'categorical_columns': len(categorical),
+        'date_column': date_column,
+        'coverage': coverage,
+        'stats': {column: column_stats(df[column]) for column in df.columns},
+        'first': _record(df.iloc[0]) if len(df) else None,
+        'latest': _record(df.iloc[-1]) if len(df) else None,
+        'preview': [_record(row) for _, row in df.head(PREVIEW_ROWS).iterrows()],
+    }
+
+
+def build_summary_store(source_dirs=SOURCE_DIRS, output_path=SUMMARY_STORE_PATH):
+    """Profile every CSV under source_dirs and write the store; returns the store"""
+    datasets = {}
+    for source_dir in source_dirs:
+        for path in sorted(glob.glob(os.path.join(source_dir, '*.csv'))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name in datasets:
+                raise ValueError(f"{path}: dataset name '{name}' is already taken by {datasets[name]['source']}")
+            datasets[name] = summarize_dataset(path)
+
+    store = {
+        'version': STORE_VERSION,
+        'built_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'datasets': datasets,
+    }
+    # Write next to the target and rename, so readers never see a half-written file
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(store, f, separators=(',', ':'), allow_nan=False)
+    os.replace(tmp_path, output_path)
+    return store
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("BUILDING SUMMARY STATISTICS STORE")
+    print("=" * 80)
+
+    store = build_summary_store()
+    for name, entry in store['datasets'].items():
+        coverage = entry['coverage']
+        dates = f"{coverage['start']} to {coverage['end']}" if coverage else "no date column"
+        print(f"  ✓ {name}: {entry['rows']:,} rows, {entry['columns']} columns, {dates}")
+
+    print(f"\n✓ Saved to: {SUMMARY_STORE_PATH} ({os.path.getsize(SUMMARY_STORE_PATH):,} bytes)")
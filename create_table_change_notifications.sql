@@ -0,0 +1,48 @@
+-- ============================================================================
+-- TABLE CHANGE NOTIFICATIONS FOR THE API CACHES
+-- ============================================================================
+-- The FastAPI service LISTENs on the 'table_loaded' channel and drops cached
+-- query results and table metadata for the table named in the payload.
+-- Load scripts send the notification themselves after rewriting a table;
+-- this script adds event triggers so DDL (CREATE/ALTER/DROP TABLE, including
+-- pandas' to_sql(if_exists='replace')) notifies as well.
+--
+-- Event triggers require superuser. Run once per database:
+--   psql -h localhost -p 45432 -U admin -d db -f create_table_change_notifications.sql
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION notify_table_ddl()
+RETURNS event_trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    obj RECORD;
+BEGIN
+    IF TG_EVENT = 'sql_drop' THEN
+        FOR obj IN SELECT * FROM pg_event_trigger_dropped_objects()
+                   WHERE object_type = 'table' AND schema_name = 'public'
+        LOOP
+            PERFORM pg_notify('table_loaded', obj.object_name);
+        END LOOP;
+    ELSE
+        FOR obj IN SELECT * FROM pg_event_trigger_ddl_commands()
+                   WHERE object_type = 'table' AND schema_name = 'public'
+        LOOP
+            -- object_identity is schema-qualified, e.g. public.stock_data
+            PERFORM pg_notify('table_loaded', split_part(obj.object_identity, '.', 2));
+        END LOOP;
+    END IF;
+END;
+$$;
+
+DROP EVENT TRIGGER IF EXISTS notify_table_ddl_end;
+CREATE EVENT TRIGGER notify_table_ddl_end
+    ON ddl_command_end
+    WHEN TAG IN ('CREATE TABLE', 'CREATE TABLE AS', 'SELECT INTO', 'ALTER TABLE')
+    EXECUTE FUNCTION notify_table_ddl();
+
+DROP EVENT TRIGGER IF EXISTS notify_table_ddl_drop;
+CREATE EVENT TRIGGER notify_table_ddl_drop
+    ON sql_drop
+    WHEN TAG IN ('DROP TABLE')
+    EXECUTE FUNCTION notify_table_ddl();
@@ -8,7 +8,7 @@ Includes: raw data, merged data, and correlation statistics
 
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from datetime import datetime
 import os
 
@@ -115,6 +115,25 @@ COLUMN_MAPPINGS = {
     }
 }
 
+# ============================================================================
+# Change Notifications
+# ============================================================================
+
+# The FastAPI service LISTENs on this channel and drops cached results for the
+# table named in the payload (see api/database.py)
+TABLE_CHANGE_CHANNEL = 'table_loaded'
+
+def notify_table_loaded(engine, table_name):
+    """Tell listening API processes that a table has been rewritten"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text("SELECT pg_notify(:channel, :table)"),
+                {"channel": TABLE_CHANGE_CHANNEL, "table": table_name}
+            )
+    except Exception as e:
+        print(f"  ⚠ Could not send {TABLE_CHANGE_CHANNEL} notification: {e}")
+
 # ============================================================================
 # Main Export Function
 # ============================================================================
@@ -189,6 +208,7 @@ def export_to_postgres():
             )
             
             print(f"✓ Exported {len(df):,} rows to {table_name}")
+            notify_table_loaded(engine, table_name)
             total_rows += len(df)
             successful_tables += 1
             
@@ -303,6 +323,7 @@ def export_using_psycopg2():
         
         # Execute batch insert
         execute_values(cursor, insert_query, values)
+        cursor.execute("SELECT pg_notify(%s, %s)", (TABLE_CHANGE_CHANNEL, 'correlation_statistics'))
         conn.commit()
         
         print(f"✓ Exported {len(df)} rows to correlation_statistics")
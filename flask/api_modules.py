@@ -0,0 +1,12 @@
+# Puts ../api on sys.path so the console and background jobs use the API's
+# own admission control and Arrow conversion (api/admission.py,
+# api/columnar.py) instead of keeping copies. Both services then share one
+# implementation, and one set of advisory-lock slots (ADMISSION_LOCK_KEY).
+# docker-compose mounts ./api at /usr/src/api next to the app. It is
+# appended, so Flask's own modules win on a name clash.
+import os
+import sys
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+if API_DIR not in sys.path:
+    sys.path.append(API_DIR)
@@ -1,13 +1,33 @@
-from flask import Flask, render_template, request, redirect, url_for
+from flask import Flask, render_template, request, redirect, url_for, jsonify, send_file
 import pandas as pd
 import numpy as np
 import sys
 import os
 import base64
 import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from pymongo import MongoClient
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.errors import QueryCanceled
+
+import api_modules  # noqa: F401  (puts ../api on sys.path)
+from admission import AdmissionTimeout, MultipleStatements, QueryRejected, check_single_statement
+from jobs import (
+    PARQUET_MEDIA_TYPE, JobError, JobNotFound, JobNotReady, JobQueueFull,
+    cancel_job, get_job, list_jobs, read_result_page, submit_job
+)
+from mongo_console import (
+    MONGO_CONSOLE_DEFAULT_LIMIT, MONGO_CONSOLE_MAX_LIMIT, MONGO_CONSOLE_MAX_STRING_CHARS, MONGO_CONSOLE_STRING_CHARS,
+    ConsoleQueryError, cached_collection_names, run_console_query
+)
+from pg_console import (
+    POSTGRES_CONNECT_KWARGS, POSTGRES_CONSOLE_PAGE_SIZE, POSTGRES_CONSOLE_MAX_PAGE_SIZE, POSTGRES_STATEMENT_TIMEOUT_MS,
+    ConsoleBusy, QueryCancelled, SessionNotFound, cancel_query, new_query_id, next_page, pool_usage, start_query
+)
+from summary_store import cached_overview, cached_summary
 
 app = Flask(__name__, template_folder='templates')
 
@@ -27,42 +47,53 @@ if mongo_user and mongo_password:
 else:
     mongo_uri = f'mongodb://{mongo_host}:{mongo_port}/{mongo_db_name}'
 
-try:
-    mongo_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-    mongo_db = mongo_client[mongo_db_name]
-    # Test the connection
-    mongo_client.admin.command('ping')
-    print("MongoDB connection successful")
-except Exception as e:
-    print(f"MongoDB connection failed: {e}")
-    # Fallback for local development
-    if mongo_host != 'localhost':
-        print("Trying localhost connection...")
-        try:
-            mongo_client = MongoClient('mongodb://localhost:37017/db', serverSelectionTimeoutMS=5000)
-            mongo_db = mongo_client['db']
-            mongo_client.admin.command('ping')
-            print("Localhost MongoDB connection successful")
-        except Exception as e2:
-            print(f"Localhost connection also failed: {e2}")
-            mongo_client = None
-            mongo_db = None
-
-# PostgreSQL connection
-def get_postgres_connection():
-    host = os.getenv('POSTGRES_HOST', 'localhost')
-    port = os.getenv('POSTGRES_PORT', '45432')
-    database = os.getenv('POSTGRES_DB', 'db')
-    user = os.getenv('POSTGRES_USER', 'admin')
-    password = os.getenv('POSTGRES_PASSWORD', 'PassW0rd')
-    
-    return psycopg2.connect(
-        host=host,
-        port=port,
-        database=database,
-        user=user,
-        password=password
-    )
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '2000'))
+# After a failed connection attempt, requests don't retry for this many seconds
+MONGO_RETRY_INTERVAL = float(os.getenv('MONGO_RETRY_INTERVAL', '30'))
+
+# Created on first use, so the app starts even when MongoDB is down
+mongo_client = None
+mongo_db = None
+_mongo_lock = threading.Lock()
+_mongo_retry_at = 0.0
+
+def get_mongo_db():
+    """Shared MongoDB database handle, connecting on first use (None if unreachable)"""
+    global mongo_client, mongo_db, _mongo_retry_at
+    if mongo_db is not None:
+        return mongo_db
+    with _mongo_lock:
+        if mongo_db is not None or time.monotonic() < _mongo_retry_at:
+            return mongo_db
+        candidates = [(mongo_uri, mongo_db_name)]
+        # Fallback for local development
+        if mongo_host != 'localhost':
+            candidates.append(('mongodb://localhost:37017/db', 'db'))
+        for uri, db_name in candidates:
+            client = MongoClient(uri, serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS)
+            try:
+                client.admin.command('ping')
+            except Exception as e:
+                print(f"MongoDB connection failed ({uri.split('@')[-1]}): {e}")
+                client.close()
+                continue
+            print("MongoDB connection successful")
+            mongo_client, mongo_db = client, client[db_name]
+            return mongo_db
+        _mongo_retry_at = time.monotonic() + MONGO_RETRY_INTERVAL
+        return None
+
+# Seconds to wait for each backend in /readyz
+READY_CHECK_TIMEOUT = float(os.getenv('READY_CHECK_TIMEOUT', '2'))
+# Runs the MongoDB probe, so /readyz can stop waiting on it after READY_CHECK_TIMEOUT
+_ready_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ready-mongo')
+_mongo_probe = None
+_mongo_probe_lock = threading.Lock()
+APP_STARTED_AT = time.monotonic()
+
+# PostgreSQL connection (unpooled; the query console uses pg_console's pool)
+def get_postgres_connection(connect_timeout=None):
+    return psycopg2.connect(connect_timeout=connect_timeout, **POSTGRES_CONNECT_KWARGS)
 
 def get_img_as_base64(file_path):
     try:
@@ -72,50 +103,35 @@ def get_img_as_base64(file_path):
     except:
         return ""
 
-# Load datasets
-def load_datasets():
-    """Load stock prediction datasets"""
-    try:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        dataset_dir = os.path.join(base_dir, "..", "dataset")
-        
-        sp500_df = pd.read_csv(os.path.join(dataset_dir, "sp500.csv"))
-        depression_df = pd.read_csv(os.path.join(dataset_dir, "depression_index.csv"))
-        rainfall_df = pd.read_csv(os.path.join(dataset_dir, "rainfall.csv"))
-        
-        return sp500_df, depression_df, rainfall_df
-    except Exception as e:
-        print(f"Error loading datasets: {e}")
-        return None, None, None
+def build_metrics_data():
+    """Headline metrics for the home page, from the summary-statistics store"""
+    overview = cached_overview()
 
-# Calculate metrics
-sp500_df, depression_df, rainfall_df = load_datasets()
+    total_days = overview['sp500_count'] if overview is not None else 0
+    date_range = f"2014-2024" if overview is not None else "N/A"
+    features_count = 8  # S&P500 metrics + depression index + rainfall
 
-total_days = len(sp500_df) if sp500_df is not None else 0
-date_range = f"2014-2024" if sp500_df is not None else "N/A"
-features_count = 8  # S&P500 metrics + depression index + rainfall
-
-# Build metrics list for stock prediction platform
-metrics_data = [
-    {
-        "label": "Trading Days",
-        "value": f"{total_days:,}",
-        "delta": "",
-        "context": date_range,
-    },
-    {
-        "label": "Data Sources",
-        "value": "3",
-        "delta": "",
-        "context": "S&P500, Depression Index, Rainfall",
-    },
-    {
-        "label": "Features",
-        "value": f"{features_count}",
-        "delta": "",
-        "context": "Price, Volume, Volatility, External",
-    },
-]
+    # Build metrics list for stock prediction platform
+    return [
+        {
+            "label": "Trading Days",
+            "value": f"{total_days:,}",
+            "delta": "",
+            "context": date_range,
+        },
+        {
+            "label": "Data Sources",
+            "value": "3",
+            "delta": "",
+            "context": "S&P500, Depression Index, Rainfall",
+        },
+        {
+            "label": "Features",
+            "value": f"{features_count}",
+            "delta": "",
+            "context": "Price, Volume, Volatility, External",
+        },
+    ]
 
 navigation_cards = [
     {
@@ -158,37 +174,21 @@ navigation_cards = [
 
 @app.route('/')
 def home():
-    return render_template('home.html', metrics_data=metrics_data, navigation_cards=navigation_cards)
+    return render_template('home.html', metrics_data=build_metrics_data(), navigation_cards=navigation_cards)
 
 @app.route('/data-overview')
 def data_overview():
     """Data overview page showing dataset statistics and visualizations"""
-    sp500_df, depression_df, rainfall_df = load_datasets()
-    
-    if sp500_df is None:
-        return "Error loading datasets"
-    
-    # Calculate statistics
-    latest_close = sp500_df['Close_^GSPC'].iloc[-1]
-    start_close = sp500_df['Close_^GSPC'].iloc[0]
-    total_return = ((latest_close - start_close) / start_close) * 100
-    avg_daily_return = sp500_df['Return'].mean() * 100
-    avg_volatility = sp500_df['Volatility_7'].mean() * 100
-    
-    return render_template('data_overview.html',
-                          latest_close=latest_close,
-                          total_return=total_return,
-                          avg_daily_return=avg_daily_return,
-                          avg_volatility=avg_volatility,
-                          sp500_count=len(sp500_df),
-                          sp500_start=sp500_df['Date'].iloc[0],
-                          sp500_end=sp500_df['Date'].iloc[-1],
-                          depression_count=len(depression_df),
-                          rainfall_count=len(rainfall_df))
+    overview = cached_overview()
+
+    if overview is None:
+        return "Summary statistics not found. Please run build_summary_stats.py first."
+
+    return render_template('data_overview.html', **overview)
 
 @app.route('/feature-engineering')
 def feature_engineering():
-    return render_template('feature_engineering.html')
+    return render_template('feature_engineering.html', summary=cached_summary('merged_analysis_data'))
 
 @app.route('/training')
 def training():
@@ -196,7 +196,7 @@ def training():
 
 @app.route('/predictions')
 def predictions():
-    return render_template('predictions.html')
+    return render_template('predictions.html', summary=cached_summary('merged_analysis_data'))
 
 @app.route('/import-summary')
 def import_summary():
@@ -212,63 +212,207 @@ def import_summary():
 
 @app.route('/query-mongodb', methods=['GET', 'POST'])
 def query_mongodb():
-    collections = mongo_db.list_collection_names()
-    results = None
+    mongo_db = get_mongo_db()
+    page = None
     error = None
+    form = {
+        'collection': request.form.get('collection', ''),
+        'query': request.form.get('query', '{}'),
+        'projection': request.form.get('projection', ''),
+        'limit': request.form.get('limit', MONGO_CONSOLE_DEFAULT_LIMIT, type=int),
+        'max_chars': request.form.get('max_chars', MONGO_CONSOLE_STRING_CHARS, type=int),
+        'offset': request.form.get('offset', 0, type=int),
+    }
+    if mongo_db is None:
+        return render_template('query_mongodb.html',
+                             collections=[],
+                             results=None,
+                             form=form,
+                             error="MongoDB is not reachable right now. Try again shortly.")
+    collections = cached_collection_names(mongo_db, refresh=request.args.get('refresh') == '1')
+    status = 200
     
     if request.method == 'POST':
-        collection_name = request.form.get('collection')
-        query = request.form.get('query', '{}')
-        limit = int(request.form.get('limit', 10))
-        
         try:
-            collection = mongo_db[collection_name]
-            # Parse query as JSON
-            query_dict = json.loads(query) if query.strip() else {}
-            cursor = collection.find(query_dict).limit(limit)
-            results = list(cursor)
-            
-            # Convert ObjectId to string for JSON serialization
-            for doc in results:
-                if '_id' in doc:
-                    doc['_id'] = str(doc['_id'])
-                    
+            page = run_console_query(mongo_db,
+                                     form['collection'],
+                                     form['query'],
+                                     form['projection'],
+                                     request.form.get('after', ''),
+                                     form['limit'],
+                                     form['max_chars'])
+            form.update(limit=page['limit'], max_chars=page['max_chars'])
+        except ConsoleQueryError as e:
+            error = str(e)
+            status = 400
         except Exception as e:
             error = str(e)
     
     return render_template('query_mongodb.html', 
                          collections=collections, 
-                         results=results, 
-                         error=error)
+                         results=page['documents'] if page else None, 
+                         page=page,
+                         form=form,
+                         max_limit=MONGO_CONSOLE_MAX_LIMIT,
+                         max_string_chars=MONGO_CONSOLE_MAX_STRING_CHARS,
+                         error=error), status
 
 @app.route('/query-postgresql', methods=['GET', 'POST'])
 def query_postgresql():
-    results = None
-    columns = None
+    page = None
     error = None
+    query = ''
+    page_size = POSTGRES_CONSOLE_PAGE_SIZE
+    timeout_s = POSTGRES_STATEMENT_TIMEOUT_MS // 1000
     
     if request.method == 'POST':
+        action = request.form.get('action', 'execute')
+        query_id = request.form.get('query_id', '')
         query = request.form.get('query', '').strip()
+        page_size = request.form.get('page_size', page_size, type=int)
+        timeout_s = request.form.get('timeout', timeout_s, type=int)
         
-        # Basic safety check - only allow SELECT queries
-        if not query.upper().startswith('SELECT'):
-            error = "Only SELECT queries are allowed for security reasons."
-        else:
-            try:
-                conn = get_postgres_connection()
-                cursor = conn.cursor(cursor_factory=RealDictCursor)
-                cursor.execute(query)
-                results = cursor.fetchall()
-                columns = list(results[0].keys()) if results else []
-                cursor.close()
-                conn.close()
-            except Exception as e:
-                error = str(e)
+        try:
+            if action == 'next':
+                page = next_page(query_id)
+            elif action == 'close':
+                cancel_query(query_id)
+            # Basic safety check - only allow SELECT queries
+            elif not query.upper().startswith('SELECT'):
+                error = "Only SELECT queries are allowed for security reasons."
+            else:
+                check_single_statement(query)
+                page = start_query(query_id, query, page_size, timeout_s * 1000)
+        except MultipleStatements as e:
+            error = str(e)
+        except SessionNotFound:
+            error = "This result is no longer open (it was closed, finished or sat idle too long). Run the query again."
+        except QueryRejected as e:
+            error = f"Query rejected: {e}. Add filters or a LIMIT and try again."
+        except (AdmissionTimeout, ConsoleBusy, QueryCancelled) as e:
+            error = str(e)
+        except QueryCanceled:
+            error = f"Query cancelled after {timeout_s}s statement timeout."
+        except Exception as e:
+            error = str(e)
     
     return render_template('query_postgresql.html', 
-                         results=results, 
-                         columns=columns, 
+                         results=page['rows'] if page else None, 
+                         columns=page['columns'] if page else None, 
+                         page=page,
+                         query=page['query'] if page else query,
+                         query_id=new_query_id(),
+                         page_size=page['page_size'] if page else page_size,
+                         max_page_size=POSTGRES_CONSOLE_MAX_PAGE_SIZE,
+                         timeout=timeout_s,
+                         max_timeout=POSTGRES_STATEMENT_TIMEOUT_MS // 1000,
                          error=error)
 
+@app.route('/query-postgresql/cancel', methods=['POST'])
+def cancel_postgresql_query():
+    """Cancel a running console query (called by the page while its request is pending)"""
+    return jsonify(cancelled=cancel_query(request.form.get('query_id', '')))
+
+def job_json(job):
+    return dict(job.to_dict(),
+                status_url=url_for('background_job_status', job_id=job.id),
+                result_url=url_for('background_job_result', job_id=job.id))
+
+@app.route('/jobs', methods=['GET', 'POST'])
+def background_jobs():
+    """Submit a background job (JSON {"kind", "params"}) or list known jobs"""
+    if request.method == 'GET':
+        return jsonify(jobs=[job_json(job) for job in list_jobs()])
+    payload = request.get_json(silent=True) or {}
+    try:
+        job = submit_job(payload.get('kind'), payload.get('params'))
+    except JobError as e:
+        return jsonify(error=str(e)), 400
+    except JobQueueFull as e:
+        return jsonify(error=str(e)), 503
+    return jsonify(job_json(job)), 202, {'Location': url_for('background_job_status', job_id=job.id)}
+
+@app.route('/jobs/<job_id>')
+def background_job_status(job_id):
+    """Poll a job: queued, running (with rows written so far), done, failed or cancelled"""
+    try:
+        return jsonify(job_json(get_job(job_id)))
+    except JobNotFound:
+        return jsonify(error="Job not found (it may have expired)"), 404
+
+@app.route('/jobs/<job_id>/result')
+def background_job_result(job_id):
+    """One page of a finished job's rows (offset/limit), or the whole Parquet file with format=parquet"""
+    try:
+        if request.args.get('format') == 'parquet':
+            job = get_job(job_id)
+            if job.status != 'done':
+                raise JobNotReady(f"Job is {job.status}")
+            return send_file(job.path, mimetype=PARQUET_MEDIA_TYPE, as_attachment=True, download_name=f'{job_id}.parquet')
+        return jsonify(read_result_page(job_id,
+                                        request.args.get('offset', 0, type=int),
+                                        request.args.get('limit', None, type=int)))
+    except JobNotFound:
+        return jsonify(error="Job not found (it may have expired)"), 404
+    except JobNotReady as e:
+        return jsonify(error=str(e)), 409
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_background_job(job_id):
+    try:
+        return jsonify(job_json(cancel_job(job_id)))
+    except JobNotFound:
+        return jsonify(error="Job not found (it may have expired)"), 404
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up; backends are not touched"""
+    return jsonify(status="ok", uptime_s=round(time.monotonic() - APP_STARTED_AT, 1))
+
+def _probe_mongo():
+    db = get_mongo_db()
+    if db is None:
+        return {"status": "down", "error": "not connected"}
+    try:
+        db.client.admin.command('ping')
+        return {"status": "ok"}
+    except Exception as e:
+        return {"status": "down", "error": str(e).strip()}
+
+def _mongo_probe_future():
+    """The probe still in flight, or a new one; a hung probe is waited on again, never queued behind"""
+    global _mongo_probe
+    with _mongo_probe_lock:
+        if _mongo_probe is None or _mongo_probe.done():
+            _mongo_probe = _ready_executor.submit(_probe_mongo)
+        return _mongo_probe
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: per-backend status, 503 until PostgreSQL and MongoDB both answer within READY_CHECK_TIMEOUT"""
+    checks = {}
+    try:
+        # libpq takes whole seconds
+        conn = get_postgres_connection(connect_timeout=max(1, math.ceil(READY_CHECK_TIMEOUT)))
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        finally:
+            conn.close()
+        checks['postgres'] = {"status": "ok"}
+    except Exception as e:
+        checks['postgres'] = {"status": "down", "error": str(e).strip()}
+    # Console/job pool usage; informational, it does not affect readiness
+    checks['postgres']['pool'] = pool_usage()
+
+    # get_mongo_db may try two hosts for MONGO_SERVER_SELECTION_TIMEOUT_MS each
+    try:
+        checks['mongo'] = _mongo_probe_future().result(timeout=READY_CHECK_TIMEOUT)
+    except FutureTimeout:
+        checks['mongo'] = {"status": "down", "error": f"no answer within {READY_CHECK_TIMEOUT:g}s"}
+
+    ready = all(check["status"] == "ok" for check in checks.values())
+    return jsonify(status="ready" if ready else "not_ready", checks=checks), 200 if ready else 503
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=18502, debug=True)
\ No newline at end of file
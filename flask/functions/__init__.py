@@ -12,6 +12,7 @@ __all__ = [
     'get_all_tables', 'get_table_schema', 'get_table_row_count',
     'get_query_where_byorder_to_bene', 'get_transactions_by_byorder_to_bene',
     'get_score_distribution', 'get_anomaly_score_histogram_bins',
+    'score_distribution_query', 'transactions_above_threshold_query',
 
     # Visualization functions
     'create_anomaly_score_distribution_plot', 'create_anomaly_score_distribution_plot_from_data',
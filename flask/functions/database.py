@@ -476,26 +476,25 @@ def get_similar_transactions(transaction_key: str, use_host: bool = False, table
     return execute_query(query, use_host=use_host)
 
 
-def get_score_distribution(use_host: bool = False, table_name: str = "transactions") -> pd.DataFrame:
+SCORE_COLUMNS = [
+    'rule_base_risk_score',
+    'hbos_anomaly_score', 
+    'pca_isolation_forest_score',
+    'hbos_pca_isolation_forest_score'
+]
+
+
+def score_distribution_query(table_name: str = "transactions") -> str:
     """
-    Get distribution statistics for all score columns in the transactions table
-    Returns statistics like count, mean, std, min, max, and percentiles for each score column
+    SQL behind get_score_distribution(), one row of statistics per score column
     Args:
-        use_host: If True, use localhost with host port (for connections from host machine)
         table_name: Name of the table to query (default: "transactions")
     Returns:
-        pandas DataFrame with distribution statistics for each score column
+        SQL query string
     """
-    score_columns = [
-        'rule_base_risk_score',
-        'hbos_anomaly_score', 
-        'pca_isolation_forest_score',
-        'hbos_pca_isolation_forest_score'
-    ]
-    
     # Build query to get statistics for each score column
     stats_queries = []
-    for col in score_columns:
+    for col in SCORE_COLUMNS:
         stats_queries.append(f"""
             SELECT 
                 '{col}' as score_type,
@@ -514,9 +513,20 @@ def get_score_distribution(use_host: bool = False, table_name: str = "transactio
         """)
     
     # Combine all queries with UNION ALL
-    combined_query = " UNION ALL ".join(stats_queries)
-    
-    return execute_query(combined_query, use_host=use_host)
+    return " UNION ALL ".join(stats_queries)
+
+
+def get_score_distribution(use_host: bool = False, table_name: str = "transactions") -> pd.DataFrame:
+    """
+    Get distribution statistics for all score columns in the transactions table
+    Returns statistics like count, mean, std, min, max, and percentiles for each score column
+    Args:
+        use_host: If True, use localhost with host port (for connections from host machine)
+        table_name: Name of the table to query (default: "transactions")
+    Returns:
+        pandas DataFrame with distribution statistics for each score column
+    """
+    return execute_query(score_distribution_query(table_name), use_host=use_host)
 
 
 def get_anomaly_score_histogram_bins(score_column: str = 'hbos_pca_isolation_forest_score', 
@@ -665,6 +675,26 @@ def get_transactions_above_threshold(score_column: str, threshold: float, use_ho
     return result
 
 
+def transactions_above_threshold_query(score_column: str, threshold: float, table_name: str = "transactions") -> str:
+    """
+    SQL behind get_transactions_above_threshold_all_columns(): all columns at or above the threshold, highest first
+    Args:
+        score_column: One of SCORE_COLUMNS
+        threshold: Threshold value for filtering
+        table_name: Name of the table to query (default: "transactions")
+    Returns:
+        SQL query string
+    """
+    if score_column not in SCORE_COLUMNS:
+        raise ValueError(f"Unknown score column '{score_column}'; expected one of {', '.join(SCORE_COLUMNS)}")
+    return f"""
+    SELECT *
+    FROM {table_name}
+    WHERE "{score_column}" >= {float(threshold)}
+    ORDER BY "{score_column}" DESC;
+    """
+
+
 def get_transactions_above_threshold_all_columns(score_column: str, threshold: float, use_host: bool = False, table_name: str = "transactions") -> pd.DataFrame:
     """
     Get all columns from transactions where the specified score column is above the given threshold
@@ -677,12 +707,7 @@ def get_transactions_above_threshold_all_columns(score_column: str, threshold: f
     Returns:
         pandas DataFrame with all columns for filtered transactions
     """
-    query = f"""
-    SELECT *
-    FROM {table_name}
-    WHERE "{score_column}" >= {threshold}
-    ORDER BY "{score_column}" DESC;
-    """
+    query = transactions_above_threshold_query(score_column, threshold, table_name)
     result = execute_query(query, use_host=use_host)
     
     if result is not None and len(result) > 0:
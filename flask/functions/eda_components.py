@@ -7,12 +7,12 @@ import plotly.graph_objects as go
 from datetime import datetime
 
 
-def create_data_overview_section(df, data_source):
+def create_data_overview_section(summary, data_source):
     """
     Create and display the data overview section with basic statistics, data structure, and preview.
 
     Args:
-        df: The dataframe to analyze
+        summary: The dataset's entry in the summary-statistics store (see build_summary_stats.py)
         data_source: String describing the data source
     """
     st.markdown("---")
@@ -24,35 +24,39 @@ def create_data_overview_section(df, data_source):
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        st.metric("Total Rows", f"{len(df):,}")
+        st.metric("Total Rows", f"{summary['rows']:,}")
 
     with col2:
-        st.metric("Total Columns", len(df.columns))
+        st.metric("Total Columns", summary['columns'])
 
     with col3:
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        st.metric("Numeric Columns", len(numeric_cols))
+        st.metric("Numeric Columns", summary['numeric_columns'])
 
     with col4:
-        categorical_cols = df.select_dtypes(include=['object', 'category']).columns
-        st.metric("Categorical Columns", len(categorical_cols))
+        st.metric("Categorical Columns", summary['categorical_columns'])
+
+    if summary.get('coverage'):
+        coverage = summary['coverage']
+        st.markdown(f"**Date Coverage:** {coverage['start']} to {coverage['end']} ({coverage['dates']:,} dates)")
 
     # Data types and missing values overview
     st.markdown("### Data Structure Overview")
 
     try:
-        from function_collection import overview
-        overview_df = overview(df)
+        overview_df = pd.DataFrame.from_dict(summary['stats'], orient='index')
 
         # Display overview table with row numbers
-        overview_df_display = overview_df.reset_index()
+        overview_df_display = overview_df.reset_index().rename(columns={'index': 'column'})
         st.dataframe(
             overview_df_display,
             use_container_width=True,
             column_config={
                 "dtype": st.column_config.TextColumn("Data Type"),
                 "n_unique": st.column_config.NumberColumn("Unique Values", format="%d"),
-                "missing_%": st.column_config.NumberColumn("Missing %", format="%.2f%%")
+                "missing_pct": st.column_config.NumberColumn("Missing %", format="%.2f%%"),
+                "p25": st.column_config.NumberColumn("25%"),
+                "p50": st.column_config.NumberColumn("50%"),
+                "p75": st.column_config.NumberColumn("75%")
             }
         )
 
@@ -62,12 +66,13 @@ def create_data_overview_section(df, data_source):
     # Sample data preview
     st.markdown("### Data Preview")
 
-    col1, col2 = st.columns([3, 1])
-
-    n_rows = st.slider("Number of rows to preview", 5, 100, 10)
+    preview = summary['preview']
+    if len(preview) > 1:
+        n_rows = st.slider("Number of rows to preview", 1, len(preview), min(10, len(preview)))
+    else:
+        n_rows = len(preview)
 
-    # Add row numbers
-    preview_df = df.head(n_rows).copy()
+    preview_df = pd.DataFrame(preview[:n_rows])
     st.dataframe(preview_df, use_container_width=True)
 
 
@@ -0,0 +1,307 @@
+# Local background jobs for reads that are too slow to run inside a request
+# (large console queries, the full-table transactions reports). Jobs run on
+# a small thread pool. Each streams its rows from a server-side cursor into
+# a Parquet file under JOB_RESULT_DIR, one row group per fetched batch, so
+# neither the worker nor the finished result is held in memory. The UI
+# polls a job's status and then pages through its result file.
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+import psycopg2
+
+# pyarrow is optional; jobs cannot be submitted without it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+import api_modules  # noqa: F401  (puts ../api on sys.path)
+from admission import MultipleStatements, admit_query, check_single_statement
+from columnar import rows_to_batch, schema_from_description
+from pg_console import pooled_connection
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# Jobs waiting for a worker; submissions beyond this are refused
+JOB_MAX_QUEUED = int(os.getenv('JOB_MAX_QUEUED', '20'))
+JOB_STATEMENT_TIMEOUT_MS = int(os.getenv('JOB_STATEMENT_TIMEOUT_MS', '600000'))
+# Rows per fetch from the cursor, and so per Parquet row group
+JOB_BATCH_ROWS = int(os.getenv('JOB_BATCH_ROWS', '10000'))
+JOB_PAGE_SIZE = int(os.getenv('JOB_PAGE_SIZE', '100'))
+JOB_MAX_PAGE_SIZE = int(os.getenv('JOB_MAX_PAGE_SIZE', '1000'))
+# Seconds a finished job and its result file are kept
+JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', '3600'))
+JOB_RESULT_DIR = os.getenv('JOB_RESULT_DIR', os.path.join(tempfile.gettempdir(), 'flask-jobs'))
+
+PARQUET_MEDIA_TYPE = 'application/vnd.apache.parquet'
+
+
+class JobError(ValueError):
+    """Raised for a job that cannot be submitted as given"""
+
+
+class JobQueueFull(Exception):
+    """Raised when JOB_MAX_QUEUED jobs are already waiting"""
+
+
+class JobNotFound(Exception):
+    """Raised for an unknown or expired job id"""
+
+
+class JobNotReady(Exception):
+    """Raised when the result of a job that has not finished is requested"""
+
+
+def _postgres_query_sql(params: Dict[str, Any]) -> str:
+    query = str(params.get('query', '')).strip()
+    if not query.upper().startswith('SELECT'):
+        raise JobError("Only SELECT queries are allowed for security reasons.")
+    try:
+        check_single_statement(query)
+    except MultipleStatements as e:
+        raise JobError(str(e))
+    return query
+
+
+def _transactions_above_threshold_sql(params: Dict[str, Any]) -> str:
+    from functions.database import transactions_above_threshold_query
+    try:
+        return transactions_above_threshold_query(params.get('score_column'), float(params['threshold']))
+    except KeyError:
+        raise JobError("'threshold' is required")
+    except (TypeError, ValueError) as e:
+        raise JobError(str(e))
+
+
+def _score_distribution_sql(params: Dict[str, Any]) -> str:
+    from functions.database import score_distribution_query
+    return score_distribution_query()
+
+
+# kind -> builder of the job's SQL from its params (raises JobError if they are invalid)
+JOB_KINDS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    'postgres_query': _postgres_query_sql,
+    'transactions_above_threshold': _transactions_above_threshold_sql,
+    'score_distribution': _score_distribution_sql,
+}
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+class Job:
+    """One submitted job: its query, state and result file"""
+
+    def __init__(self, kind: str, params: Dict[str, Any], sql: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.sql = sql
+        self.status = 'queued'
+        self.error: Optional[str] = None
+        self.rows = 0
+        self.columns: List[str] = []
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.path = os.path.join(JOB_RESULT_DIR, f'{self.id}.parquet')
+        self.future = None
+        self.conn = None
+        self.cancel_requested = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        finished_or_now = self.finished_at or time.time()
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'error': self.error,
+            # While running: rows written so far
+            'rows': self.rows,
+            'columns': self.columns,
+            'submitted_at': self.submitted_at,
+            'queued_s': round((self.started_at or finished_or_now) - self.submitted_at, 3),
+            'run_s': round(finished_or_now - self.started_at, 3) if self.started_at else None,
+        }
+
+
+_jobs: Dict[str, Job] = {}
+_jobs_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+        return _executor
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _reap_expired() -> None:
+    """Forget finished jobs older than JOB_RESULT_TTL and delete their result files"""
+    cutoff = time.time() - JOB_RESULT_TTL
+    with _jobs_lock:
+        expired = [job for job in _jobs.values() if job.finished_at is not None and job.finished_at < cutoff]
+        for job in expired:
+            del _jobs[job.id]
+    for job in expired:
+        _remove_file(job.path)
+
+
+def _write_result(job: Job, cursor, path: str) -> None:
+    rows = cursor.fetchmany(JOB_BATCH_ROWS)
+    schema = schema_from_description(cursor.description)
+    job.columns = schema.names
+    writer = pq.ParquetWriter(path, schema)
+    try:
+        while rows:
+            if job.cancel_requested:
+                raise JobError("Job cancelled.")
+            # One row group per batch, so a result page reads only the groups it overlaps
+            writer.write_table(pa.Table.from_batches([rows_to_batch(schema, rows)]))
+            job.rows += len(rows)
+            rows = cursor.fetchmany(JOB_BATCH_ROWS)
+    finally:
+        writer.close()
+
+
+def _run(job: Job) -> None:
+    job.status = 'running'
+    job.started_at = time.time()
+    partial = f'{job.path}.part'
+    try:
+        with pooled_connection() as conn:
+            job.conn = conn
+            with conn.cursor() as setup:
+                setup.execute("SET LOCAL statement_timeout = %s", (JOB_STATEMENT_TIMEOUT_MS,))
+                # The result goes to disk, so only the cost estimate matters
+                admit_query(setup, job.sql, check_rows=False)
+            if job.cancel_requested:
+                raise JobError("Job cancelled.")
+            with conn.cursor(name=f'job_{job.id}') as cursor:
+                cursor.execute(job.sql)
+                _write_result(job, cursor, partial)
+        os.replace(partial, job.path)
+        job.status = 'done'
+    except Exception as e:
+        _remove_file(partial)
+        if job.cancel_requested:
+            job.status = 'cancelled'
+        else:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.status = 'failed'
+            # PostgreSQL errors without the EXPLAIN statement echoed back
+            job.error = e.diag.message_primary if isinstance(e, psycopg2.Error) and e.diag.message_primary else str(e).strip()
+    finally:
+        job.conn = None
+        job.finished_at = time.time()
+
+
+def submit_job(kind: str, params: Optional[Dict[str, Any]] = None) -> Job:
+    """Validate and queue a job; it starts when a worker is free"""
+    if not ARROW_AVAILABLE:
+        raise JobError("pyarrow is not installed on the server")
+    if kind not in JOB_KINDS:
+        raise JobError(f"Unknown job kind '{kind}'; expected one of {', '.join(JOB_KINDS)}")
+    params = params or {}
+    job = Job(kind, params, JOB_KINDS[kind](params))
+
+    _reap_expired()
+    with _jobs_lock:
+        queued = sum(1 for other in _jobs.values() if other.status == 'queued')
+        if queued >= JOB_MAX_QUEUED:
+            raise JobQueueFull(f"{queued} jobs are already waiting; retry later")
+        _jobs[job.id] = job
+    os.makedirs(JOB_RESULT_DIR, exist_ok=True)
+    job.future = _get_executor().submit(_run, job)
+    return job
+
+
+def get_job(job_id: str) -> Job:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        raise JobNotFound(job_id)
+    return job
+
+
+def list_jobs() -> List[Job]:
+    """Known jobs, newest first"""
+    _reap_expired()
+    with _jobs_lock:
+        return sorted(_jobs.values(), key=lambda job: job.submitted_at, reverse=True)
+
+
+def cancel_job(job_id: str) -> Job:
+    """Cancel a queued job, or stop a running one (its statement is cancelled)"""
+    job = get_job(job_id)
+    if job.status not in ('queued', 'running'):
+        return job
+    job.cancel_requested = True
+    if job.future is not None and job.future.cancel():
+        job.status = 'cancelled'
+        job.finished_at = time.time()
+    elif job.conn is not None:
+        job.conn.cancel()
+    return job
+
+
+def read_result_page(job_id: str, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Rows [offset, offset + limit) of a finished job, reading only the row groups they fall in"""
+    job = get_job(job_id)
+    if job.status != 'done':
+        raise JobNotReady(f"Job is {job.status}")
+    offset = max(offset, 0)
+    limit = min(max(limit or JOB_PAGE_SIZE, 1), JOB_MAX_PAGE_SIZE)
+
+    with open(job.path, 'rb') as f:
+        parquet = pq.ParquetFile(f)
+        metadata = parquet.metadata
+        groups = []
+        group_start = first_start = 0
+        for index in range(metadata.num_row_groups):
+            group_rows = metadata.row_group(index).num_rows
+            if group_start + group_rows > offset and group_start < offset + limit:
+                if not groups:
+                    first_start = group_start
+                groups.append(index)
+            group_start += group_rows
+        if groups:
+            table = parquet.read_row_groups(groups).slice(offset - first_start, limit)
+        else:
+            table = parquet.schema_arrow.empty_table()
+
+    columns = table.column_names
+    rows = [[_json_value(value) for value in row.values()] for row in table.to_pylist()]
+    next_offset = offset + len(rows)
+    return {
+        'job_id': job.id,
+        'columns': columns,
+        'rows': rows,
+        'offset': offset,
+        'limit': limit,
+        'total_rows': metadata.num_rows,
+        'next_offset': next_offset if next_offset < metadata.num_rows else None,
+    }
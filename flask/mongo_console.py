@@ -0,0 +1,163 @@
+# Reads behind the MongoDB query console. Every read is bounded: at most
+# MONGO_CONSOLE_MAX_LIMIT documents per page, paged by _id rather than skip,
+# and long top-level strings (e.g. CCnews article text) are cut inside
+# MongoDB, so full documents never reach the web worker or the browser.
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from bson import json_util
+
+MONGO_CONSOLE_DEFAULT_LIMIT = int(os.getenv('MONGO_CONSOLE_DEFAULT_LIMIT', '10'))
+MONGO_CONSOLE_MAX_LIMIT = int(os.getenv('MONGO_CONSOLE_MAX_LIMIT', '100'))
+# Top-level strings longer than this many characters are truncated (the form may raise it up to the max)
+MONGO_CONSOLE_STRING_CHARS = int(os.getenv('MONGO_CONSOLE_STRING_CHARS', '200'))
+MONGO_CONSOLE_MAX_STRING_CHARS = int(os.getenv('MONGO_CONSOLE_MAX_STRING_CHARS', '5000'))
+MONGO_CONSOLE_MAX_TIME_MS = int(os.getenv('MONGO_CONSOLE_MAX_TIME_MS', '10000'))
+# Seconds a collection listing is reused before asking MongoDB again
+MONGO_COLLECTIONS_TTL = float(os.getenv('MONGO_COLLECTIONS_TTL', '60'))
+
+
+class ConsoleQueryError(ValueError):
+    """Raised for a console request that cannot be run as given"""
+
+
+# "$field" or "$field.sub": renaming a field, never an expression or a $$variable
+_FIELD_PATH = re.compile(r'^\$[A-Za-z_]\w*(\.\w+)*$')
+
+
+_collections: Optional[List[str]] = None
+_collections_expire_at = 0.0
+_collections_lock = threading.Lock()
+
+
+def cached_collection_names(db, refresh: bool = False) -> List[str]:
+    """Sorted collection names, listed at most once per MONGO_COLLECTIONS_TTL seconds"""
+    global _collections, _collections_expire_at
+    with _collections_lock:
+        if refresh or _collections is None or time.monotonic() >= _collections_expire_at:
+            _collections = sorted(db.list_collection_names())
+            _collections_expire_at = time.monotonic() + MONGO_COLLECTIONS_TTL
+        return _collections
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    return min(max(limit or MONGO_CONSOLE_DEFAULT_LIMIT, 1), MONGO_CONSOLE_MAX_LIMIT)
+
+
+def clamp_string_chars(max_chars: Optional[int]) -> int:
+    return min(max(max_chars or MONGO_CONSOLE_STRING_CHARS, 1), MONGO_CONSOLE_MAX_STRING_CHARS)
+
+
+def parse_document(text: Optional[str], name: str) -> Dict[str, Any]:
+    """A JSON object from the form; Extended JSON ({"$oid": ...}, {"$date": ...}) is accepted"""
+    if not text or not text.strip():
+        return {}
+    try:
+        value = json_util.loads(text)
+    except ValueError as e:
+        raise ConsoleQueryError(f"{name} is not valid JSON: {e}")
+    if not isinstance(value, dict):
+        raise ConsoleQueryError(f"{name} must be a JSON object")
+    return value
+
+
+def check_projection(projection: Dict[str, Any]) -> Dict[str, Any]:
+    """Allow only inclusion/exclusion flags and field-path renames
+
+    The projection becomes a $project stage, where operator expressions
+    ($function, $accumulator, ...) would run arbitrary work on the server.
+    """
+    for key, value in projection.items():
+        if not isinstance(key, str) or not key or key.startswith('$'):
+            raise ConsoleQueryError(f"Projection field {key!r} is not a field name")
+        if value in (0, 1) and isinstance(value, (bool, int)):
+            continue
+        if isinstance(value, str) and _FIELD_PATH.match(value):
+            continue
+        raise ConsoleQueryError(
+            f"Projection value for '{key}' must be 0, 1, true, false or a field path like \"$name\""
+        )
+    return projection
+
+
+def truncate_strings_stage(max_chars: int) -> Dict[str, Any]:
+    """$replaceRoot stage cutting top-level strings longer than max_chars, noting their full length"""
+    truncated = {'$let': {
+        'vars': {'length': {'$strLenCP': '$$field.v'}},
+        'in': {'$cond': [
+            {'$gt': ['$$length', max_chars]},
+            {'$concat': [{'$substrCP': ['$$field.v', 0, max_chars]}, '… (', {'$toString': '$$length'}, ' chars)']},
+            '$$field.v',
+        ]},
+    }}
+    return {'$replaceRoot': {'newRoot': {'$arrayToObject': {'$map': {
+        'input': {'$objectToArray': '$$ROOT'},
+        'as': 'field',
+        'in': {
+            'k': '$$field.k',
+            'v': {'$cond': [{'$eq': [{'$type': '$$field.v'}, 'string']}, truncated, '$$field.v']},
+        },
+    }}}}}
+
+
+def build_pipeline(
+    query: Dict[str, Any],
+    projection: Dict[str, Any],
+    after: Any,
+    limit: int,
+    max_chars: int
+) -> List[Dict[str, Any]]:
+    """One page in _id order; one extra document is read to tell whether another page follows"""
+    match = query
+    if after is not None:
+        match = {'$and': [query, {'_id': {'$gt': after}}]} if query else {'_id': {'$gt': after}}
+    stages = [{'$match': match}, {'$sort': {'_id': 1}}, {'$limit': limit + 1}]
+    # _id is always kept, since it is the paging key
+    projection = {key: value for key, value in projection.items() if key != '_id'}
+    if projection:
+        stages.append({'$project': projection})
+    stages.append(truncate_strings_stage(max_chars))
+    return stages
+
+
+def run_console_query(
+    db,
+    collection: str,
+    query_text: str,
+    projection_text: str = '',
+    after_token: str = '',
+    limit: Optional[int] = None,
+    max_chars: Optional[int] = None
+) -> Dict[str, Any]:
+    """One page of a console query; pass the returned next_token as after_token for the next page"""
+    if collection not in cached_collection_names(db) and collection not in cached_collection_names(db, refresh=True):
+        raise ConsoleQueryError(f"Collection '{collection}' does not exist")
+    query = parse_document(query_text, 'Query')
+    projection = check_projection(parse_document(projection_text, 'Projection'))
+    try:
+        after = json_util.loads(after_token) if after_token else None
+    except ValueError:
+        raise ConsoleQueryError("Invalid page token; run the query again")
+    limit = clamp_limit(limit)
+    max_chars = clamp_string_chars(max_chars)
+
+    pipeline = build_pipeline(query, projection, after, limit, max_chars)
+    documents = list(db[collection].aggregate(pipeline, maxTimeMS=MONGO_CONSOLE_MAX_TIME_MS))
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    next_token = json_util.dumps(documents[-1]['_id']) if has_more else None
+
+    # Convert ObjectId to string for JSON serialization
+    for doc in documents:
+        if '_id' in doc:
+            doc['_id'] = str(doc['_id'])
+
+    return {
+        'documents': documents,
+        'next_token': next_token,
+        'limit': limit,
+        'max_chars': max_chars,
+    }
@@ -0,0 +1,328 @@
+# Sessions behind the PostgreSQL query console. Each query runs on a pooled
+# connection under a named (server-side) cursor and is read one page at a
+# time, so a worker never holds more than a page of rows. A session keeps
+# its connection and transaction open between pages until the rows run out,
+# the user closes or cancels it, or it sits idle for
+# POSTGRES_CONSOLE_IDLE_TIMEOUT seconds. That includes any heavy-query
+# admission slot, which is scoped to the transaction.
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from psycopg2.errors import QueryCanceled
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+import api_modules  # noqa: F401  (puts ../api on sys.path)
+from admission import admit_query
+
+POSTGRES_CONNECT_KWARGS = {
+    'host': os.getenv('POSTGRES_HOST', 'localhost'),
+    'port': os.getenv('POSTGRES_PORT', '45432'),
+    'database': os.getenv('POSTGRES_DB', 'db'),
+    'user': os.getenv('POSTGRES_USER', 'admin'),
+    'password': os.getenv('POSTGRES_PASSWORD', 'PassW0rd'),
+}
+
+# Upper bound for the console's statement timeout control (milliseconds)
+POSTGRES_STATEMENT_TIMEOUT_MS = int(os.getenv('POSTGRES_STATEMENT_TIMEOUT_MS', '30000'))
+POSTGRES_POOL_MAX = int(os.getenv('POSTGRES_POOL_MAX', '5'))
+# Seconds to wait for a free pooled connection before giving up
+POSTGRES_POOL_WAIT_TIMEOUT = float(os.getenv('POSTGRES_POOL_WAIT_TIMEOUT', '5'))
+POSTGRES_CONSOLE_PAGE_SIZE = int(os.getenv('POSTGRES_CONSOLE_PAGE_SIZE', '100'))
+POSTGRES_CONSOLE_MAX_PAGE_SIZE = int(os.getenv('POSTGRES_CONSOLE_MAX_PAGE_SIZE', '1000'))
+POSTGRES_CONSOLE_IDLE_TIMEOUT = float(os.getenv('POSTGRES_CONSOLE_IDLE_TIMEOUT', '120'))
+
+_QUERY_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class SessionNotFound(Exception):
+    """Raised for a query id with no open session (finished, closed or expired)"""
+
+
+class ConsoleBusy(Exception):
+    """Raised when no pooled connection frees up within the wait timeout"""
+
+
+class QueryCancelled(Exception):
+    """Raised when the user cancelled the session's running (or queued) statement"""
+
+
+# Created on first use, so the app starts even when PostgreSQL is down
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises instead of waiting when it is exhausted, so
+# checkouts queue on this semaphore first
+_pool_slots = threading.BoundedSemaphore(POSTGRES_POOL_MAX)
+
+# Connections currently checked out (console sessions and background jobs)
+_in_use = 0
+_in_use_lock = threading.Lock()
+
+_sessions: Dict[str, 'ConsoleSession'] = {}
+_sessions_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(0, POSTGRES_POOL_MAX, **POSTGRES_CONNECT_KWARGS)
+        return _pool
+
+
+def _count_in_use(amount: int) -> None:
+    global _in_use
+    with _in_use_lock:
+        _in_use += amount
+
+
+def _checkout():
+    if not _pool_slots.acquire(timeout=POSTGRES_POOL_WAIT_TIMEOUT):
+        # Idle sessions are the usual reason the pool is full
+        if not (_evict_idle() and _pool_slots.acquire(timeout=POSTGRES_POOL_WAIT_TIMEOUT)):
+            raise ConsoleBusy(
+                f"All {POSTGRES_POOL_MAX} console connections stayed busy for "
+                f"{POSTGRES_POOL_WAIT_TIMEOUT:g}s; close an open result or retry later"
+            )
+    try:
+        conn = _get_pool().getconn()
+    except Exception:
+        _pool_slots.release()
+        raise
+    _count_in_use(1)
+    return conn
+
+
+def _checkin(conn) -> None:
+    broken = False
+    try:
+        # Closing the transaction also closes any server-side cursor
+        conn.rollback()
+    except Exception:
+        broken = True
+    try:
+        _get_pool().putconn(conn, close=broken or bool(conn.closed))
+    finally:
+        _count_in_use(-1)
+        _pool_slots.release()
+
+
+@contextmanager
+def pooled_connection():
+    """A connection from the console pool for other long reads (e.g. background jobs); rolled back on exit"""
+    conn = _checkout()
+    try:
+        yield conn
+    finally:
+        _checkin(conn)
+
+
+def new_query_id() -> str:
+    return uuid.uuid4().hex
+
+
+class ConsoleSession:
+    """One console query: its connection, server-side cursor and read position"""
+
+    def __init__(self, query_id: str, query: str, page_size: int, timeout_ms: int):
+        self.query_id = query_id
+        self.query = query
+        self.page_size = page_size
+        self.timeout_ms = timeout_ms
+        self.conn = None
+        self.cursor = None
+        self.columns: List[str] = []
+        # Row read past the current page, so "has more" is known without an empty page
+        self.lookahead = None
+        self.rows_read = 0
+        self.cancelled = False
+        self.closed = False
+        # Held while a statement runs on the connection
+        self.busy = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def open(self) -> None:
+        self.conn = _checkout()
+
+    def execute(self) -> None:
+        if self.cancelled:
+            raise QueryCancelled("Query cancelled.")
+        with self.conn.cursor() as setup:
+            setup.execute("SET LOCAL statement_timeout = %s", (self.timeout_ms,))
+            # Only a page is ever held in memory, so the row estimate is not checked
+            admit_query(setup, self.query, check_rows=False)
+        if self.cancelled:
+            raise QueryCancelled("Query cancelled.")
+        self.cursor = self.conn.cursor(name=f"console_{self.query_id}", cursor_factory=RealDictCursor)
+        self.cursor.execute(self.query)
+
+    def fetch_page(self) -> Dict[str, Any]:
+        rows = [self.lookahead] if self.lookahead is not None else []
+        rows += self.cursor.fetchmany(self.page_size + 1 - len(rows))
+        if not self.columns and self.cursor.description:
+            self.columns = [desc[0] for desc in self.cursor.description]
+        self.lookahead = rows.pop() if len(rows) > self.page_size else None
+        first_row = self.rows_read + 1
+        self.rows_read += len(rows)
+        self.last_used = time.monotonic()
+        return {
+            'query_id': self.query_id,
+            'query': self.query,
+            'columns': self.columns,
+            'rows': rows,
+            'first_row': first_row,
+            'last_row': self.rows_read,
+            'has_more': self.lookahead is not None,
+            'page_size': self.page_size,
+        }
+
+    def close(self) -> None:
+        """Roll back and return the connection to the pool (idempotent)"""
+        with _sessions_lock:
+            if self.closed:
+                return
+            self.closed = True
+            if _sessions.get(self.query_id) is self:
+                del _sessions[self.query_id]
+        if self.conn is None:
+            return
+        try:
+            _checkin(self.conn)
+        finally:
+            self.conn = None
+
+
+def _evict_idle() -> bool:
+    """Close the least recently used idle session; False if every session is busy"""
+    with _sessions_lock:
+        idle = sorted(_sessions.values(), key=lambda session: session.last_used)
+    for session in idle:
+        if session.busy.acquire(blocking=False):
+            try:
+                session.close()
+            finally:
+                session.busy.release()
+            return True
+    return False
+
+
+def _reap_idle() -> None:
+    cutoff = time.monotonic() - POSTGRES_CONSOLE_IDLE_TIMEOUT
+    with _sessions_lock:
+        expired = [session for session in _sessions.values() if session.last_used < cutoff]
+    for session in expired:
+        if session.busy.acquire(blocking=False):
+            try:
+                session.close()
+            finally:
+                session.busy.release()
+
+
+def _run(session: ConsoleSession, step) -> Dict[str, Any]:
+    """Run a step that reads a page; the session is closed on error or once its rows run out"""
+    try:
+        page = step()
+    except QueryCanceled as e:
+        session.close()
+        if session.cancelled:
+            raise QueryCancelled("Query cancelled.") from e
+        raise
+    except Exception:
+        session.close()
+        raise
+    if not page['has_more']:
+        session.close()
+    return page
+
+
+def clamp_page_size(page_size: Optional[int]) -> int:
+    return min(max(page_size or POSTGRES_CONSOLE_PAGE_SIZE, 1), POSTGRES_CONSOLE_MAX_PAGE_SIZE)
+
+
+def clamp_timeout_ms(timeout_ms: Optional[int]) -> int:
+    return min(max(timeout_ms or POSTGRES_STATEMENT_TIMEOUT_MS, 1), POSTGRES_STATEMENT_TIMEOUT_MS)
+
+
+def start_query(query_id: str, query: str, page_size: int, timeout_ms: int) -> Dict[str, Any]:
+    """Run a SELECT under a server-side cursor and return its first page"""
+    if not _QUERY_ID.match(query_id or ''):
+        query_id = new_query_id()
+    _reap_idle()
+    session = ConsoleSession(query_id, query, clamp_page_size(page_size), clamp_timeout_ms(timeout_ms))
+    # Held from the start, so a cancel that arrives before the connection does
+    # only flags the session instead of closing it under us
+    session.busy.acquire()
+    try:
+        with _sessions_lock:
+            previous = _sessions.get(query_id)
+            _sessions[query_id] = session
+        if previous is not None:
+            _stop(previous)
+
+        def first_page():
+            session.open()
+            session.execute()
+            return session.fetch_page()
+
+        return _run(session, first_page)
+    finally:
+        session.busy.release()
+
+
+def next_page(query_id: str) -> Dict[str, Any]:
+    """The next page of an open session"""
+    _reap_idle()
+    with _sessions_lock:
+        session = _sessions.get(query_id)
+    if session is None:
+        raise SessionNotFound(query_id)
+    with session.busy:
+        if session.closed:
+            raise SessionNotFound(query_id)
+        return _run(session, session.fetch_page)
+
+
+def _stop(session: ConsoleSession) -> None:
+    session.cancelled = True
+    if session.busy.acquire(blocking=False):
+        try:
+            session.close()
+        finally:
+            session.busy.release()
+    elif session.conn is not None:
+        # The request running it gets QueryCanceled and closes the session itself
+        session.conn.cancel()
+
+
+def cancel_query(query_id: str) -> bool:
+    """Stop a session: cancel the statement it is running, or close it if idle
+
+    Returns False if there is no such session.
+    """
+    with _sessions_lock:
+        session = _sessions.get(query_id)
+    if session is None:
+        return False
+    _stop(session)
+    return True
+
+
+def open_sessions() -> int:
+    with _sessions_lock:
+        return len(_sessions)
+
+
+def pool_usage() -> Dict[str, int]:
+    """Checked-out connections and open console sessions, against POSTGRES_POOL_MAX"""
+    with _in_use_lock:
+        in_use = _in_use
+    return {
+        'connections_in_use': in_use,
+        'open_sessions': open_sessions(),
+        'pool_max': POSTGRES_POOL_MAX,
+    }
@@ -0,0 +1,114 @@
+# Reader for the summary-statistics store written by ../build_summary_stats.py.
+# The dashboard pages only look values up here, never in the datasets
+# themselves, so render time does not grow with them. The store file is
+# re-read when its mtime or size changes (i.e. after the ETL step reruns).
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+SUMMARY_STORE_PATH = os.getenv(
+    'SUMMARY_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dataset', 'summary_stats.json')
+)
+# Seconds between stat() checks for a rebuilt store
+SUMMARY_STORE_CHECK_INTERVAL = float(os.getenv('SUMMARY_STORE_CHECK_INTERVAL', '2'))
+
+Signature = Tuple[int, int]
+
+
+def _signature(path: str) -> Signature:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _sp500_overview(sp500: Dict[str, Any]) -> Dict[str, Any]:
+    latest_close = sp500['latest']['Close_^GSPC']
+    start_close = sp500['first']['Close_^GSPC']
+    return {
+        'latest_close': latest_close,
+        'total_return': (latest_close - start_close) / start_close * 100,
+        'avg_daily_return': sp500['stats']['Return']['mean'] * 100,
+        'avg_volatility': sp500['stats']['Volatility_7']['mean'] * 100,
+    }
+
+
+class SummaryStore:
+    """The parsed store plus the overview derived from it, invalidated by file mtime/size"""
+
+    def __init__(self, path: str = SUMMARY_STORE_PATH, check_interval: float = SUMMARY_STORE_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # (signature, store, overview)
+        self._entry: Optional[Tuple[Signature, Dict[str, Any], Dict[str, Any]]] = None
+        self._checked_at = 0.0
+
+    def _load(self):
+        entry = self._entry
+        now = time.monotonic()
+        if entry is not None and now - self._checked_at < self.check_interval:
+            return entry
+        signature = _signature(self.path)
+        if entry is not None and entry[0] == signature:
+            self._checked_at = now
+            return entry
+        with self._lock:
+            # Another thread may have reloaded it while we waited
+            entry = self._entry
+            if entry is None or entry[0] != signature:
+                with open(self.path) as f:
+                    store = json.load(f)
+                entry = (signature, store, self._overview(store))
+                self._entry = entry
+            self._checked_at = now
+        return entry
+
+    @staticmethod
+    def _overview(store: Dict[str, Any]) -> Dict[str, Any]:
+        datasets = store['datasets']
+        sp500 = datasets['sp500']
+        overview = _sp500_overview(sp500)
+        overview.update({
+            'sp500_count': sp500['rows'],
+            'sp500_start': sp500['coverage']['start'],
+            'sp500_end': sp500['coverage']['end'],
+            'depression_count': datasets['depression_index']['rows'],
+            'rainfall_count': datasets['rainfall']['rows'],
+            'built_at': store['built_at'],
+            'datasets': datasets,
+        })
+        return overview
+
+    def dataset(self, name: str) -> Dict[str, Any]:
+        """Store entry of one dataset (file stem, e.g. 'merged_analysis_data'); treat it as read-only"""
+        return self._load()[1]['datasets'][name]
+
+    def built_at(self) -> str:
+        return self._load()[1]['built_at']
+
+    def overview(self) -> Dict[str, Any]:
+        """Everything the data overview page renders"""
+        return self._load()[2]
+
+
+summary_store = SummaryStore()
+
+
+def cached_overview() -> Optional[Dict[str, Any]]:
+    """Overview statistics, or None when the store is missing or unreadable"""
+    try:
+        return summary_store.overview()
+    except Exception as e:
+        print(f"Error loading summary store: {e}")
+        return None
+
+
+def cached_summary(name: str) -> Optional[Dict[str, Any]]:
+    """Store entry of one dataset, or None when it is not available"""
+    try:
+        return summary_store.dataset(name)
+    except Exception as e:
+        print(f"Error loading summary for {name}: {e}")
+        return None
@@ -8,12 +8,14 @@
 # 4. depression_index.csv (depression index)
 # 5. rainfall.csv (averaged across all states)
 #
-# OUTPUT: merged_analysis_data.csv
+# OUTPUT: merged_analysis_data.csv (and a rebuilt dataset/summary_stats.json)
 # ============================================================================
 
 import pandas as pd
 import numpy as np
 
+from build_summary_stats import SUMMARY_STORE_PATH, build_summary_store
+
 print("=" * 80)
 print("MERGING ALL DATASETS")
 print("=" * 80)
@@ -173,7 +175,17 @@ print(f"   ✓ Rows: {len(merged):,}")
 print(f"   ✓ Columns: {len(merged.columns)}")
 
 # ============================================================================
-# STEP 7: DISPLAY SUMMARY
+# STEP 7: REBUILD SUMMARY STATISTICS STORE (read by the Flask dashboard)
+# ============================================================================
+print("\n7. Rebuilding summary statistics store...")
+
+store = build_summary_store()
+
+print(f"   ✓ Saved to: {SUMMARY_STORE_PATH}")
+print(f"   ✓ Datasets: {len(store['datasets'])}")
+
+# ============================================================================
+# STEP 8: DISPLAY SUMMARY
 # ============================================================================
 print("\n" + "=" * 80)
 print("MERGE COMPLETE!")